@@ -20,8 +20,17 @@
 
 '''A python environment exploration interface.'''
 
-from .utils.app import run_app, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_THREADS
+from .utils.settings import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_THREADS
 
 __author__ = ('Seth M. Nelson <github.com/nelsonseth>')
 
 __version__ = '0.1.0'
+
+
+# The app is only imported when asked for. Importing it discovers the whole
+# environment, which has to wait until the cli has read its settings.
+def __getattr__(name):
+    if name == 'run_app':
+        from .utils.app import run_app
+        return run_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
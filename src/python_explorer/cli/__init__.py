@@ -1,8 +1,13 @@
 from inspect import cleandoc
 import click
-from python_explorer import run_app, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_THREADS
+from python_explorer import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_THREADS
+from python_explorer.utils.settings import configure
 
-@click.command("python-explorer", short_help="Launch Python Explorer in browser.")
+@click.group(
+    "python-explorer",
+    short_help="Launch Python Explorer in browser.",
+    invoke_without_command=True,
+)
 @click.option(
     "--host", "-h",
     default=DEFAULT_HOST,
@@ -21,23 +26,238 @@ from python_explorer import run_app, DEFAULT_HOST, DEFAULT_PORT, DEFAULT_THREADS
     show_default=True,
     help='Number of waitress threads.'
 )
+@click.option(
+    '--workers', '-w',
+    default=1,
+    show_default=True,
+    help='Number of worker processes (prefork, needs os.fork).'
+)
+@click.option(
+    '--expensive-jobs',
+    type=int,
+    default=None,
+    help='Imports and other expensive jobs run at once.  [default: threads/4]'
+)
+@click.option(
+    '--expensive-queue',
+    type=int,
+    default=None,
+    help='Expensive jobs that may wait before new ones are turned away.  [default: threads/2]'
+)
+@click.option(
+    '--expensive-wait',
+    type=float,
+    default=60.0,
+    show_default=True,
+    help='Seconds an expensive job may wait for its turn before it gives up.'
+)
+@click.option(
+    '--memory-budget',
+    type=int,
+    default=None,
+    help='Megabytes explored packages may use before unused ones are unloaded.'
+)
+@click.option(
+    '--slow-log',
+    type=float,
+    default=None,
+    help='Log callbacks taking at least this many seconds, with their trace.'
+)
+@click.option(
+    '--profiler',
+    is_flag=True,
+    default=False,
+    help='Serve a sampling profiler at /admin/profile?seconds=N.'
+)
+@click.option(
+    '--denylist-admin',
+    is_flag=True,
+    default=False,
+    help='Serve POST /admin/denylist to clear the calls skipped after timing out.'
+)
+@click.option(
+    '--compression/--no-compression',
+    default=True,
+    show_default=True,
+    help='Compress responses (gzip, or brotli if installed).'
+)
+@click.option(
+    '--env-cache',
+    type=click.Path(file_okay=False, writable=True),
+    default=None,
+    help='Directory for results kept between runs.  [default: user cache dir]'
+)
+@click.option(
+    '--members-timeout',
+    type=float,
+    default=20.0,
+    show_default=True,
+    help='Seconds listing members may take before the listing is cut short, 0 for no limit.'
+)
+@click.option(
+    '--inspect-timeout',
+    type=float,
+    default=5.0,
+    show_default=True,
+    help='Seconds reading a signature or docstring may take, 0 for no limit.'
+)
+@click.option(
+    '--watch-interval',
+    type=float,
+    default=5.0,
+    show_default=True,
+    help='Seconds between checks for installed or removed packages, 0 turns it off.'
+)
+@click.option(
+    '--catalog',
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help='Serve read-only from a catalog file instead of the current environment.'
+)
+@click.option(
+    '--python',
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help='Explore the environment of another python interpreter (3.10 or newer).'
+)
+@click.option(
+    '--build-catalog',
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help='Write a catalog of the current environment to this file and exit.'
+)
+@click.option(
+    '--catalog-depth',
+    default=3,
+    show_default=True,
+    help='Levels to explore into each package when building a catalog.'
+)
+@click.pass_context
 def run_explore(
+    ctx,
     host,
     port,
     threads,
+    workers,
+    expensive_jobs,
+    expensive_queue,
+    expensive_wait,
+    memory_budget,
+    slow_log,
+    profiler,
+    denylist_admin,
+    compression,
+    env_cache,
+    members_timeout,
+    inspect_timeout,
+    watch_interval,
+    catalog,
+    python,
+    build_catalog,
+    catalog_depth,
 ):
     """Launch Python Explorer in browser."""
-    
+
+    if ctx.invoked_subcommand is not None:
+        return
+
+    if build_catalog:
+        from python_explorer.utils.catalog import build_catalog as build
+
+        click.echo(f'Exploring: Building catalog {build_catalog}...')
+        count = build(build_catalog, max_depth=catalog_depth)
+        click.echo(f'Exploring: Wrote {count} records to {build_catalog}')
+        return
+
+    configure(
+        catalog=catalog,
+        python=python,
+        memory_budget=memory_budget,
+        slow_request=slow_log,
+        profiler=profiler,
+        denylist_admin=denylist_admin,
+        compression=compression,
+        env_cache=env_cache,
+        watch_interval=watch_interval or None,
+        members_timeout=members_timeout or None,
+        inspect_timeout=inspect_timeout or None,
+        # leave threads free for cheap callbacks
+        expensive_jobs=expensive_jobs or max(1, threads // 4),
+        expensive_queue=expensive_queue if expensive_queue is not None else max(1, threads // 2),
+        expensive_wait=expensive_wait,
+    )
+
+    from python_explorer import run_app
+
     msg=  f"""
       Exploring: Python Explorer started on 'http://{host}:{port}/
       Exploring: Number of threads: {threads}
+      Exploring: Number of workers: {workers}
       Exploring: Press Ctrl+C to terminate
     """
 
     click.echo(cleandoc(msg))
-    
+    if catalog:
+        click.echo(f'Exploring: Serving from catalog {catalog}')
+    elif python:
+        click.echo(f'Exploring: Environment of {python}')
+    if profiler:
+        click.echo(f"Exploring: Profiler at 'http://{host}:{port}/admin/profile?seconds=10'")
+    if denylist_admin:
+        click.echo(f"Exploring: Clear the denylist with POST 'http://{host}:{port}/admin/denylist'")
+
     run_app(
         host,
         port,
         threads,
-    )
\ No newline at end of file
+        workers,
+    )
+
+
+@run_explore.command('bench', short_help='Run the benchmark suite.')
+@click.option(
+    '--output', '-o',
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help='Save results as json to this file.'
+)
+@click.option(
+    '--compare', '-c',
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help='Compare against results saved by an earlier run.'
+)
+@click.option(
+    '--select', '-k',
+    default=None,
+    help='Only run benchmarks whose name contains this text.'
+)
+@click.option(
+    '--rounds', '-r',
+    default=5,
+    show_default=True,
+    help='Minimum timed rounds per benchmark.'
+)
+def run_bench(
+    output,
+    compare,
+    select,
+    rounds,
+):
+    """Run the benchmark suite."""
+    import json
+    from python_explorer.utils.bench import run_benchmarks, compare_results
+
+    results = run_benchmarks(select=select, rounds=rounds, echo=click.echo)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+        click.echo(f'Exploring: Results saved to {output}')
+
+    if compare:
+        with open(compare) as f:
+            old = json.load(f)
+        click.echo(f'\n{"benchmark":<48} {"old ms":>10} {"new ms":>10} {"ratio":>7}')
+        for name, o, n, ratio in compare_results(old, results):
+            click.echo(f'{name:<48} {o*1000:10.3f} {n*1000:10.3f} {ratio:7.2f}')
@@ -1,9 +1,26 @@
 
 # easier accessibility from app.py
 from .layout_utils import *
-from .main_page import page_layout
-from .stores import stores
-from .body_left import body_left
-from .body_right_members import body_right_member_info
-from .body_right_cyto import body_right_cyto
-from .header import header_content
+
+# The page pieces are built when first asked for. Some of them show the
+# environment data, and discovering the environment is the slow part of
+# starting up.
+_lazy = {
+    'page_layout': '.main_page',
+    'stores': '.stores',
+    'body_left': '.body_left',
+    'body_right_member_info': '.body_right_members',
+    'body_right_cyto': '.body_right_cyto',
+    'body_right_import_cost': '.body_right_imports',
+    'header_content': '.header',
+}
+
+def __getattr__(name):
+    if name in _lazy:
+        from importlib import import_module
+        value = getattr(import_module(_lazy[name], __name__), name)
+        # importing the submodule sets an attribute of the same name for
+        # some of these, the component has to win like a plain import would
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -31,6 +31,7 @@ body_left = dmc.Card([
         dmc.RadioGroup([
             dmc.Radio('Starts With', value='startswith'),
             dmc.Radio('Contains', value='contains'),
+            dmc.Radio('Fuzzy', value='fuzzy'),
             ],
             value='startswith',
             orientation='horizontal',
@@ -78,6 +79,23 @@ body_left = dmc.Card([
         }
     ),
     dmc.Group([
+        dmc.Text(
+            'Sort by Size ',
+            italic=True,
+            color='#5a5a5a',
+            style={
+                'font-size':'0.8em',
+                'font-weight':'400',
+                'padding':'0 0 2px 0',
+            }
+        ),
+        dmc.Switch(
+            id=comp_id('size-switch', 'tabs', 0),
+            size='sm',
+            radius='lg',
+            checked=False,
+        ),
+        dmc.Space(w=8),
         dmc.Text(
             'Include Private Members ',
             italic=True,
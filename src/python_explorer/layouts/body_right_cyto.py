@@ -35,6 +35,16 @@ body_right_cyto = dbc.Container([
                                 ),
                                 cyto_layout_dropdown,
                                 dmc.Space(h=8),
+                                dmc.Text(
+                                    'Show Subclasses: '
+                                ),
+                                dmc.Switch(
+                                    id=comp_id('subclass-switch', 'cyto', 0),
+                                    radius='lg',
+                                    size='sm',
+                                    checked=False,
+                                ),
+                                dmc.Space(h=8),
                                 dmc.Text(
                                     'Show Legend: '
                                 ),
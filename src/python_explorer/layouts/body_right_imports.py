@@ -0,0 +1,66 @@
+from dash import dcc
+import dash_mantine_components as dmc
+import dash_bootstrap_components as dbc
+
+# local
+from .layout_utils import (
+    comp_id,
+    placeholder_text,
+    PAPER_BCOLOR,
+    BORDER_COLOR,
+)
+
+# body right imports is the contents of the main body right column when the
+# Import Cost tab is selected. Shows how long importing the current package
+# takes, as a tree of submodules, and its heaviest dependencies.
+body_right_import_cost = dbc.Container([
+        dmc.Card([
+            dmc.CardSection(
+                dcc.Markdown(
+                    'Import Cost',
+                    id=comp_id('import-cost-title', 'imports', 0),
+                    style={
+                        'margin':'0.6em 0 0 0'
+                    }
+                ),
+                style={
+                    'height':'3em',
+                    'width':'100%',
+                    'margin':'0',
+                    'padding':'0 10px 0 10px',
+                    'border-bottom':f'1px solid {BORDER_COLOR}'
+                }
+            ),
+            dmc.CardSection(
+                placeholder_text('Import Cost'),
+                id=comp_id('import-cost-content', 'imports', 0),
+                style={
+                    'height':r'calc(100% - 3em)',
+                    'width':'100%',
+                    'margin':'0',
+                    'padding':'4px 10px 4px 10px',
+                    'overflow':'auto',
+                }
+            ),
+            ],
+            radius=10,
+            shadow='sm',
+            style={
+                'border':f'1px solid {BORDER_COLOR}',
+                'height':'100%',
+                'width':'100%',
+                'margin':'0',
+                'padding':'0',
+                'background-color':PAPER_BCOLOR,
+            }
+        ),
+    ],
+    fluid=True,
+    style={
+        'height':'100%',
+        'width':'100%',
+        'margin':'0',
+        'padding':'2px',
+        'background-color':PAPER_BCOLOR,
+    }
+)
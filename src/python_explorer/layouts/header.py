@@ -13,18 +13,12 @@ from .layout_utils import (
     HEADER_COLOR_LIGHT,
 )
 
-from python_explorer.utils.envdata import (
-    env_site_packages,
-    env_std_modules,
-    all_packages,
-)
-
 # 'border':f'1px solid {BORDER_COLOR}',
 
 # list of dbc.Col() items to place in children of header row
 header_content = [
     dbc.Col(
-        get_package_accordion(all_packages, env_std_modules, env_site_packages),
+        get_package_accordion(),
         width=3,
         style={
             'height':'100%',
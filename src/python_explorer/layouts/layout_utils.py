@@ -1,4 +1,6 @@
 
+import re
+from hashlib import sha1
 from typing import Union
 
 from dash import html
@@ -9,6 +11,7 @@ from dash_iconify import DashIconify
 from pypandoc import convert_text
 
 from python_explorer.utils.explore import AttributeDict
+from python_explorer.utils.cache import get_cache
 
 # Common Settings--------------------------------------------------------------
 
@@ -55,37 +58,37 @@ def get_notification(
         
 
 def get_package_buttons(
-    namelist: list
+    names: list,
+    group: str,
     ) -> list:
     '''Return list of buttons for packages.
     
-    * namelist - flattened list of (group, package) tuples
+    * names - package names, which double as the button index
+    * group - 'standard' or 'site'
     '''
     return [
         dmc.Button(
-            children = n[1],
-            id = comp_id('p-button', n[0], namelist.index(n)),
+            children = n,
+            id = comp_id('p-button', group, n),
             color='blue',
             n_clicks=0,
             size='sm',
             radius='md',
             compact=True,
             variant='subtle',
-        ) for n in namelist
+        ) for n in names
     ]
 
 
 def get_package_button_stack(
-    button_list: list,
+    names: list,
     package_info: dict,
     group: str
     ) -> dmc.Stack:
-    '''Return stack of package buttons based on group.'''
-
-    button_list_group = [b for b in button_list if b.id['group'] == group]
+    '''Return stack of package buttons with their summaries.'''
 
     stack_list=[]
-    for bb in button_list_group:
+    for bb in get_package_buttons(names, group):
         stack_list.append(
             dbc.Row([
                 dbc.Col(
@@ -120,6 +123,9 @@ def get_package_button_stack(
             )
         )
 
+    if not stack_list:
+        return placeholder_text('No matching packages')
+
     return dmc.Stack(
         children = stack_list,
         align='flex-start',
@@ -128,14 +134,56 @@ def get_package_button_stack(
     )
 
 
-def get_package_accordion(
-    packages: list,
-    std_package_info: dict,
-    site_package_info: dict,
-    )-> dmc.Accordion:
-    '''Get package accordion structure.'''
+# packages shown per page of the accordion panels
+PACKAGE_PAGE_SIZE = 50
+
+def get_package_panel(group: str)-> list:
+    '''Return the empty contents of an accordion panel.
+
+    The package list itself is filled in by a callback once the panel is
+    opened, one page at a time, so the initial page doesn't grow with the
+    environment.
+    '''
+    return [
+        dmc.TextInput(
+            placeholder='Search Packages',
+            type='text',
+            size='sm',
+            debounce=300,
+            id=comp_id('p-search', group, 0),
+            style={
+                'padding':'0 0 0.5em 0',
+            }
+        ),
+        dmc.Paper(
+            children=[],
+            id=comp_id('p-list', group, 0),
+            style={
+                'height':'calc(100% - 5.5em)',
+                'overflow':'auto',
+                'padding-top':'0.5em',
+                'padding-bottom':'0.5em',
+                'border':f'1px solid {BORDER_COLOR}',
+                'background-color':PAPER_BCOLOR,
+            }
+        ),
+        dmc.Center(
+            dmc.Pagination(
+                id=comp_id('p-pages', group, 0),
+                total=1,
+                page=1,
+                size='sm',
+                siblings=1,
+            ),
+            style={
+                'padding':'0.5em 0 0 0',
+            }
+        ),
+    ]
+
 
-    button_list = get_package_buttons(packages)
+def get_package_accordion()-> dmc.Accordion:
+    '''Get package accordion structure.'''
 
     return dmc.Accordion([
         dmc.AccordionItem(
@@ -150,27 +198,14 @@ def get_package_accordion(
                 
                 ),
                 dmc.AccordionPanel(
-                    dmc.Paper(
-                        children=get_package_button_stack(
-                            button_list,
-                            std_package_info,
-                            group='standard',
-                            ),
-                        style={
-                            'height':'100%',
-                            'padding-top':'0.5em',
-                            'padding-bottom':'0.5em',
-                            'border':f'1px solid {BORDER_COLOR}',
-                            'background-color':PAPER_BCOLOR,
-                        }
-                    ),
+                    get_package_panel('standard'),
                     style={
                         'height':'70vh',
                         'max-height':'70vh',
                         'width':'60vw',
                         'min-width':'600px',
                         'margin':'auto',
-                        'overflow':'auto',
+                        'overflow':'hidden',
                         'background-image':f'linear-gradient({ACCORDION_LIGHT} 20%, {ACCORDION_DARK} 80%)',
                         'border':f'1px solid {BORDER_COLOR}',
                         'border-bottom-right-radius':'6px',
@@ -191,27 +226,14 @@ def get_package_accordion(
                     },
                 ),
                 dmc.AccordionPanel(
-                    dmc.Paper(
-                        children=get_package_button_stack(
-                            button_list,
-                            site_package_info,
-                            group='site',
-                            ),
-                        style={
-                            'height':'100%',
-                            'padding-top':'0.5em',
-                            'padding-bottom':'0.5em',
-                            'border':f'1px solid {BORDER_COLOR}',
-                            'background-color':PAPER_BCOLOR,
-                        }
-                    ),
+                    get_package_panel('site'),
                     style={
                         'height':'70vh',
                         'max-height':'70vh',
                         'width':'60vw',
                         'min-width':'600px',
                         'margin':'auto',
-                        'overflow':'auto',
+                        'overflow':'hidden',
                         'background-image':f'linear-gradient({ACCORDION_LIGHT} 20%, {ACCORDION_DARK} 80%)',
                         'border':f'1px solid {BORDER_COLOR}',
                         'border-bottom-right-radius':'6px',
@@ -296,12 +318,159 @@ def publish_package_info(
             position='left',
             noWrap=True,
             spacing=4,
-        )
+        ),
+        # filled in by a callback once the statistics are ready
+        html.Div(
+            id=comp_id('package-overview', 'package', 0),
+        ),
         ],
         spacing=6,
     )
 
 
+def publish_package_overview(
+    stats: Union[dict, None],
+    error: Union[str, None] = None,
+    )-> dmc.Group:
+    '''Return the package overview line, with the biggest submodules on hover.'''
+
+    style = {
+        'font-size':'0.8em',
+        'font-weight':'500',
+    }
+
+    if stats is None:
+        text = f'Overview unavailable ({error}), try again in a few minutes.' if error else 'Computing overview...'
+        return dmc.Text(text, italic=True, color='dimmed', style=style)
+
+    totals = stats['totals']
+    visited = stats['visited']
+    more = '+' if stats['truncated'] else ''
+    summary = (
+        f"{visited['modules']:,}{more} modules · "
+        f"{visited['classes']:,}{more} classes · "
+        f"{totals['functions']:,}{more} functions · "
+        f"{stats['depth']} levels deep"
+    )
+
+    if stats['largest']:
+        biggest = dmc.Stack(
+            [dmc.Text('Biggest submodules', weight=600, size='sm')]
+            + [
+                dmc.Text(f'{trace} ({total:,} members)', size='sm')
+                for trace, total in stats['largest']
+            ],
+            spacing=2,
+        )
+    else:
+        biggest = dmc.Text('No submodules', size='sm')
+
+    return dmc.HoverCard(
+        [
+            dmc.HoverCardTarget(
+                dmc.Text(summary, italic=True, style=style),
+            ),
+            dmc.HoverCardDropdown(biggest),
+        ],
+        withArrow=True,
+        shadow='md',
+        position='bottom-start',
+    )
+
+
+def _ms(us: int) -> str:
+    return f'{us/1000:,.1f} ms'
+
+
+def _mb(nbytes: int) -> str:
+    return f'{nbytes/2**20:,.1f} MB'
+
+
+def _import_row(node: list, total: int) -> html.Div:
+    '''Internal helper function. Return one import tree line with its bar.'''
+    name, self_us, cum_us, _ = node
+    return html.Div([
+        dmc.Text(name, size='sm', weight=500, style={'min-width':'16em'}),
+        dmc.Progress(
+            value=100*cum_us/total if total else 0,
+            size='sm',
+            style={'width':'8em'},
+        ),
+        dmc.Text(f'{_ms(cum_us)} ({_ms(self_us)} self)', size='sm', color='dimmed'),
+        ],
+        style={
+            'display':'inline-flex',
+            'align-items':'center',
+            'gap':'0.8em',
+        }
+    )
+
+
+def _import_tree(node: list, total: int) -> html.Div:
+    '''Internal helper function. Return a collapsible import tree node.'''
+    if not node[3]:
+        return html.Div(_import_row(node, total), style={'padding-left':'1.2em'})
+    return html.Details([
+        html.Summary(_import_row(node, total)),
+        html.Div(
+            [_import_tree(c, total) for c in node[3]],
+            style={'padding-left':'1.2em'},
+        ),
+        ],
+        # the expensive top of the tree starts open
+        open=node[2] >= total/4,
+    )
+
+
+def publish_import_cost(
+    cost: Union[dict, None],
+    error: Union[str, None] = None,
+    )-> dmc.Stack:
+    '''Return the import cost view of a package (see importcost.measure_import).'''
+    if cost is None:
+        if error:
+            return placeholder_text(f'Measuring failed ({error}), try again in a few minutes.')
+        return placeholder_text('Importing in a fresh interpreter...')
+
+    total = cost['total_us']
+    summary = (
+        f"{_ms(total)} to import {cost['modules']:,} modules "
+        f"({_ms(cost['own_us'])} in {cost['package']}'s own) · "
+        f"{_mb(cost['traced'])} allocated ({_mb(cost['traced_peak'])} peak) · "
+        f"{_mb(cost['rss'])} resident · "
+        f"python {cost['python']}"
+    )
+    deps = [
+        dmc.Text('Heaviest dependencies', weight=600, size='sm'),
+    ] + [
+        dmc.Text(f'{name}: {_ms(us)} ({n} modules)', size='sm')
+        for name, us, n in cost['dependencies']
+    ]
+    if not cost['dependencies']:
+        deps.append(dmc.Text('None', size='sm', color='dimmed'))
+
+    return dmc.Stack([
+        dmc.Text(summary, size='sm', italic=True),
+        dbc.Row([
+            dbc.Col(
+                [_import_tree(r, total) for r in cost['tree']],
+                width=8,
+                style={'overflow':'auto', 'height':'100%'},
+            ),
+            dbc.Col(
+                dmc.Stack(deps, spacing=2),
+                width=4,
+                style={'overflow':'auto', 'height':'100%'},
+            ),
+            ],
+            style={'height':'calc(100% - 2em)', 'margin':'0'},
+        ),
+        ],
+        spacing=4,
+        style={'height':'100%'},
+    )
+
+
 def get_trace_buttons(
     namelist: list,
     ) -> list:
@@ -327,37 +496,68 @@ def get_trace_buttons(
     ]    
 
 
+def size_label(nbytes: int) -> str:
+    '''Return a short human readable size.'''
+    for unit in ['B', 'KB', 'MB']:
+        if nbytes < 1024:
+            return f'{nbytes:.0f} {unit}' if unit == 'B' else f'{nbytes:.1f} {unit}'
+        nbytes /= 1024
+    return f'{nbytes:.1f} GB'
+
+
 def get_member_buttons(
     namelist: list,
     group: str,
+    sizes: Union[dict, None] = None,
     ) -> list:
     '''Return list of buttons for members.
     
     * namelist - flattened list of (key, member) tuples
     * group - active tab name
+    * sizes - {member: [bytes, truncated]} to label the buttons with and
+      sort them by, biggest first (see memsize.py)
     '''
-    return [
-        dmc.Button(
-            children = n[1],
-            id = comp_id('m-button', n[0], namelist.index(n)),
-            color='blue',
-            n_clicks=0,
-            size='sm',
-            radius='md',
-            compact=True,
-            variant='subtle',
-        ) for n in namelist if group == n[0]
-    ]
+    # ids index into namelist, whatever order the buttons end up in
+    members = [(i, n) for i, n in enumerate(namelist) if group == n[0]]
+    if sizes is not None:
+        members.sort(key=lambda m: sizes.get(m[1][1], [-1])[0], reverse=True)
+
+    buttons = []
+    for i, n in members:
+        label = None
+        if sizes is not None and n[1] in sizes:
+            nbytes, truncated = sizes[n[1]]
+            label = dmc.Text(
+                size_label(nbytes) + ('+' if truncated else ''),
+                size='xs',
+                color='dimmed',
+            )
+        buttons.append(
+            dmc.Button(
+                children = n[1],
+                id = comp_id('m-button', n[0], i),
+                color='blue',
+                n_clicks=0,
+                size='sm',
+                radius='md',
+                compact=True,
+                variant='subtle',
+                rightIcon=label,
+            )
+        )
+    return buttons
 
 
 def get_button_stack(
     buttonlist: list,
-    group: Union[str, None] = None
+    group: Union[str, None] = None,
+    note: Union[str, None] = None,
     ) -> Union[dmc.Center, dmc.Stack]:
     '''Return stack of buttons for respective layout content.
     
     * buttonlist - list of button components
     * group - str corresponding to button id.group (optional if group already determined)
+    * note - small text to put above the buttons (optional)
     '''
     if group == None:
         buttonlist_group = buttonlist
@@ -368,6 +568,10 @@ def get_button_stack(
     if len(buttonlist_group) == 0:
         return placeholder_text(f'No resulting {group}.')
     else:
+        if note:
+            buttonlist_group = [
+                dmc.Text(note, size='xs', italic=True, color='dimmed')
+            ] + buttonlist_group
         return dmc.Stack(
             children = buttonlist_group,
             align='flex-start',
@@ -443,11 +647,13 @@ def placeholder_text(text: str) -> dmc.Center:
     )
 
 
-def get_filtered_dict(filtered_flat: list) -> AttributeDict:
+def get_filtered_dict(filtered_flat: list, ranked: bool = False) -> AttributeDict:
     '''Return dict of members from flattened list of filtered members.
     
     * filtered_flat - list of (key, member) tuples
+    * ranked - keep the order of filtered_flat instead of sorting by name
     '''
+    order = (lambda names: names) if ranked else sorted
     modules = []
     classes = []
     functions = []
@@ -468,25 +674,41 @@ def get_filtered_dict(filtered_flat: list) -> AttributeDict:
 
     return AttributeDict(
         {
-            'modules': sorted(modules),
-            'classes': sorted(classes),
-            'functions': sorted(functions),
-            'properties': sorted(properties),
-            'others': sorted(others)
+            'modules': order(modules),
+            'classes': order(classes),
+            'functions': order(functions),
+            'properties': order(properties),
+            'others': order(others)
         }
     )
 
 
 def publish_signature(sig: Union[str, None]) -> Union[dmc.Center, Purify]:
-    '''Return Purify component for signature string.'''
+    '''Return Purify component for signature html (see explore._sig_format).'''
     if sig == None:
         return placeholder_text('No signature available.')
     else:
-        sig_html = convert_text(sig,
-                                format='md',
-                                to='html5',
-                                )
-        return Purify(sig_html)
+        return Purify(sig)
+
+
+# Purify drops these MathML wrappers but keeps their text, which would show
+# the TeX source next to every formula
+_MATH_ANNOTATION = re.compile(r'<annotation\b.*?</annotation>|</?semantics>', re.S)
+
+
+def _docstring_html(doc: str, format: str) -> str:
+    '''Internal helper function. Convert a docstring to html with MathML math.'''
+    doc_html = convert_text(doc,
+                            format=format,
+                            to='html5',
+                            extra_args=[
+                                    # math is rendered here instead of fetched
+                                    # per formula from a web service
+                                    '--mathml',
+                                    '--wrap=preserve',
+                                ],
+                            )
+    return _MATH_ANNOTATION.sub('', doc_html)
 
 
 def publish_docstring(doc: Union[str, None], format: Union[str, None]=None) -> Union[dmc.Center, Purify]:
@@ -496,14 +718,12 @@ def publish_docstring(doc: Union[str, None], format: Union[str, None]=None) -> U
     else:
         if format == None:
             format = 'rst'
-        doc_html = convert_text(doc,
-                                format=format,
-                                to='html5',
-                                extra_args=[
-                                        '--webtex',
-                                        '--wrap=preserve',
-                                    ],
-                                )
+        # pandoc is the slowest part of showing a member, so rendered html is
+        # cached (and shared between worker processes when there are several)
+        doc_html = get_cache().get_or_set(
+            ('docstring-html', 'mathml', format, sha1(doc.encode('utf-8')).hexdigest()),
+            lambda: _docstring_html(doc, format),
+        )
         return Purify(doc_html)
 
 
@@ -15,6 +15,7 @@ from .header import header_content
 from .body_left import body_left
 from .body_right_members import body_right_member_info
 from .body_right_cyto import body_right_cyto
+from .body_right_imports import body_right_import_cost
 
 
 page_layout = dbc.Container([
@@ -102,6 +103,31 @@ page_layout = dbc.Container([
                                         'background-color':PAPER_BCOLOR,
                                     }
                                 ),
+                                dmc.Tab(
+                                    dmc.Text(
+                                        'Import Cost',
+                                        size='lg',
+                                        weight=600,
+                                        italic=True,
+                                    ),
+                                    value = 'import-cost',
+                                    icon = DashIconify(
+                                        icon='mdi:timer-sand',
+                                        style={
+                                            'height':'1em'
+                                        }
+                                    ),
+                                    style={
+                                        'height':'2.5em',
+                                        'border-top':f'1px solid {BORDER_COLOR}',
+                                        'border-left':f'1px solid {BORDER_COLOR}',
+                                        'border-right':f'1px solid {BORDER_COLOR}',
+                                        'border-top-left-radius':'10px',
+                                        'border-top-right-radius':'10px',
+                                        'margin':'0 2px 0 2px',
+                                        'background-color':PAPER_BCOLOR,
+                                    }
+                                ),
                             ],
                             #grow=True,
                         ),
@@ -126,6 +152,17 @@ page_layout = dbc.Container([
                                 'padding':'4px 0 0 0',
                                 'background-color':PAPER_BCOLOR,
                             }
+                        ),
+                        dmc.TabsPanel(
+                            body_right_import_cost,
+                            value='import-cost',
+                            style={
+                                'height':r'calc(100% - 2.5em)',
+                                'width':'100%',
+                                'margin':'0',
+                                'padding':'4px 0 0 0',
+                                'background-color':PAPER_BCOLOR,
+                            }
                         )
                     ],
                     id=comp_id('body-right-tabs', 'app', 0),
@@ -3,9 +3,7 @@ from dash import dcc, html
 
 # local
 from .layout_utils import comp_id
-from python_explorer.utils.envdata import all_packages
-
-packs = [p[1] for p in all_packages]
+from python_explorer.utils.settings import settings
 
 stores = html.Div(
     [  
@@ -14,11 +12,6 @@ stores = html.Div(
             storage_type='memory',
             data=[]
         ),
-        dcc.Store(
-            id=comp_id('packages', 'accordion', 0),
-            storage_type='memory',
-            data=packs,
-        ),
         dcc.Store(
             id=comp_id('status', 'app', 0),
             storage_type='memory',
@@ -39,6 +32,35 @@ stores = html.Div(
             storage_type='memory',
             data=[]
         ),
+        # polls for package statistics while they're computed
+        dcc.Interval(
+            id=comp_id('overview-poll', 'package', 0),
+            interval=1000,
+            disabled=True,
+        ),
+        # polls for the import cost while it's measured
+        dcc.Interval(
+            id=comp_id('import-cost-poll', 'imports', 0),
+            interval=1000,
+            disabled=True,
+        ),
+        # polls for member sizes while they're measured
+        dcc.Interval(
+            id=comp_id('size-poll', 'tabs', 0),
+            interval=1000,
+            disabled=True,
+        ),
+        # looks for installed or removed packages, see watcher.py
+        dcc.Interval(
+            id=comp_id('env-poll', 'packages', 0),
+            interval=(settings.watch_interval or 5) * 1000,
+            disabled=bool(settings.catalog or settings.python or not settings.watch_interval),
+        ),
+        dcc.Store(
+            id=comp_id('env-generation', 'packages', 0),
+            storage_type='memory',
+            data='',
+        ),
         dcc.Store(
             id=comp_id('filtered-members', 'tabs', 0),
             storage_type='memory',
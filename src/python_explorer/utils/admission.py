@@ -0,0 +1,291 @@
+'''Admission control and fair scheduling for expensive work.
+
+Opening a big package imports it, classifies its members and builds the
+heritage of its classes, which can keep a waitress thread busy for many
+seconds. A few people doing that at once would hold every thread, and
+filtering a member list or reading a cached docstring would wait behind
+them.
+
+Work is expensive only when it actually has to be done: importing a package
+that isn't imported yet, classifying a module the member memo doesn't have,
+building the heritage of a namespace with many classes. Those run through
+scheduler.expensive(), everything else (cache and memo hits included) never
+waits here.
+
+* at most `slots` expensive jobs run at once.
+* the others wait in one queue per session (browser, through a cookie), and
+  a freed slot goes to the sessions in turn, so one person opening ten
+  packages doesn't hold up everyone else.
+* new package opens are turned away with Busy when `max_waiting` jobs are
+  already waiting. Work in the middle of a callback waits, for `max_wait`
+  seconds at most before it gives up with Busy too.
+* a slot holder that hangs (see watchdog.py) is abandoned, its slot goes to
+  the next job and it doesn't give one back when it finally finishes.
+
+A thread already holding a slot doesn't take another one for nested work.
+Helper threads working for a request queue as its session (on_behalf_of),
+and the time they wait doesn't count against their time budget (see
+explore.budget_paused). Queue depth, waits and rejections are in /metrics.
+'''
+
+__all__ = [
+    'Busy',
+    'Scheduler',
+    'current_session',
+    'get_scheduler',
+    'install_sessions',
+    'on_behalf_of',
+]
+
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Union
+
+from .explore import budget_paused
+from .metrics import Histogram, stage
+from .settings import settings
+
+SESSION_COOKIE = 'px-session'
+
+# namespaces with more classes than this build their heritage as expensive work
+HERITAGE_CLASSES = 200
+
+
+class Busy(Exception):
+    '''Too much expensive work is waiting already.'''
+
+
+# session helper threads are working for, see on_behalf_of
+_acting = threading.local()
+
+def current_session() -> str:
+    '''Return who the work on this thread is for.'''
+    session = getattr(_acting, 'session', None)
+    if session is not None:
+        return session
+    from flask import has_request_context, request
+    if not has_request_context():
+        # background jobs share one queue
+        return 'background'
+    return request.cookies.get(SESSION_COOKIE) or request.remote_addr or 'anonymous'
+
+
+@contextmanager
+def on_behalf_of(session: str):
+    '''Queue this thread's expensive work as session's in the block.
+
+    session comes from current_session() on the request thread.
+    '''
+    outer = getattr(_acting, 'session', None)
+    _acting.session = session
+    try:
+        yield
+    finally:
+        _acting.session = outer
+
+
+class Scheduler:
+    '''Limits concurrent expensive jobs and queues the rest fairly.
+
+    Parameters
+    ----------
+    slots: int
+        Expensive jobs running at the same time.
+    max_waiting: int
+        Jobs that may wait for a slot before new ones are turned away.
+    max_wait: float, optional
+        Seconds a job waits for a slot before giving up. Default is no limit.
+    '''
+
+    def __init__(self, slots: int = 2, max_waiting: int = 4, max_wait: Union[float, None] = None) -> None:
+        self.slots = max(1, slots)
+        self.max_waiting = max_waiting
+        self.max_wait = max_wait
+
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.gave_up = 0
+        self.abandoned = 0
+        self.wait_seconds = Histogram(
+            'python_explorer_queue_wait_seconds',
+            'Time expensive jobs waited for a slot.',
+            'kind',
+        )
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._running = 0
+        self._waiting = 0
+        # session -> deque of Events, in turn order
+        self._queues = OrderedDict()
+        # idents of threads holding a slot, and of those abandoned
+        self._holders = set()
+        self._abandoned = set()
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _acquire(self, reject: bool) -> Union[threading.Event, None]:
+        '''Internal helper method. Take a slot, or return the Event to wait on.'''
+        with self._lock:
+            self.admitted += 1
+            if self._running < self.slots and not self._waiting:
+                self._running += 1
+                return None
+            if reject and self._waiting >= self.max_waiting:
+                self.admitted -= 1
+                self.rejected += 1
+                raise Busy(
+                    f'{self._running} expensive jobs running and {self._waiting} '
+                    'waiting, try again in a moment.'
+                )
+            event = threading.Event()
+            self._queues.setdefault(current_session(), deque()).append(event)
+            self._waiting += 1
+            self.queued += 1
+            return event
+
+    def _withdraw(self, event: threading.Event) -> bool:
+        '''Internal helper method. Leave the queue, False when the slot came already.'''
+        with self._lock:
+            for session, waiters in self._queues.items():
+                if event in waiters:
+                    waiters.remove(event)
+                    if not waiters:
+                        del self._queues[session]
+                    self._waiting -= 1
+                    return True
+            return False
+
+    def _release(self) -> None:
+        '''Internal helper method. Hand the slot to the next session in turn.'''
+        with self._lock:
+            if not self._queues:
+                self._running -= 1
+                return
+            session, waiters = next(iter(self._queues.items()))
+            event = waiters.popleft()
+            if waiters:
+                self._queues.move_to_end(session)
+            else:
+                del self._queues[session]
+            self._waiting -= 1
+            # the slot goes straight to the waiter, running stays the same
+            event.set()
+
+    @contextmanager
+    def expensive(self, kind: str, reject: bool = False):
+        '''Run the block in an expensive job slot.
+
+        Parameters
+        ----------
+        kind: str
+            What the work is ('import', 'classify', 'heritage'), for metrics.
+        reject: bool
+            Raise Busy instead of waiting when the queue is full.
+        '''
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            self._local.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._local.depth = depth
+            return
+
+        start = time.perf_counter()
+        event = self._acquire(reject)
+        if event is not None:
+            with stage('queue'), budget_paused():
+                admitted = event.wait(self.max_wait)
+            if not admitted and self._withdraw(event):
+                self.wait_seconds.observe(kind, time.perf_counter() - start)
+                with self._lock:
+                    self.gave_up += 1
+                raise Busy(
+                    f'Waited {self.max_wait:g}s for {self._running} expensive jobs, '
+                    'try again in a moment.'
+                )
+        self.wait_seconds.observe(kind, time.perf_counter() - start)
+
+        ident = threading.get_ident()
+        with self._lock:
+            self._holders.add(ident)
+        self._local.depth = 1
+        try:
+            yield
+        finally:
+            self._local.depth = 0
+            with self._lock:
+                self._holders.discard(ident)
+                abandoned = ident in self._abandoned
+                self._abandoned.discard(ident)
+            # an abandoned holder's slot was handed on already
+            if not abandoned:
+                self._release()
+
+    def abandon(self, ident: int) -> bool:
+        '''Hand on the slot of a thread that's given up on (see watchdog.py).
+
+        Returns whether the thread held one.
+        '''
+        with self._lock:
+            if ident not in self._holders or ident in self._abandoned:
+                return False
+            self._abandoned.add(ident)
+            self.abandoned += 1
+        self._release()
+        return True
+
+    def metrics(self) -> list:
+        '''Return exposition lines for /metrics.'''
+        return self.wait_seconds.render() + [
+            '# HELP python_explorer_expensive_jobs Expensive jobs running and waiting for a slot.',
+            '# TYPE python_explorer_expensive_jobs gauge',
+            f'python_explorer_expensive_jobs{{state="running"}} {self._running}',
+            f'python_explorer_expensive_jobs{{state="waiting"}} {self._waiting}',
+            '# HELP python_explorer_expensive_sessions_waiting Sessions with jobs waiting for a slot.',
+            '# TYPE python_explorer_expensive_sessions_waiting gauge',
+            f'python_explorer_expensive_sessions_waiting {len(self._queues)}',
+            '# HELP python_explorer_admission_total Expensive jobs by how they were admitted.',
+            '# TYPE python_explorer_admission_total counter',
+            f'python_explorer_admission_total{{result="immediate"}} {self.admitted - self.queued}',
+            f'python_explorer_admission_total{{result="queued"}} {self.queued}',
+            f'python_explorer_admission_total{{result="rejected"}} {self.rejected}',
+            f'python_explorer_admission_total{{result="gave_up"}} {self.gave_up}',
+            '# HELP python_explorer_expensive_abandoned_total Slots handed on from holders that hung.',
+            '# TYPE python_explorer_expensive_abandoned_total counter',
+            f'python_explorer_expensive_abandoned_total {self.abandoned}',
+        ]
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> Scheduler:
+    '''Return the scheduler of this process, sized by the settings.'''
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = Scheduler(settings.expensive_jobs, settings.expensive_queue, settings.expensive_wait)
+        return _scheduler
+
+
+def install_sessions(server) -> None:
+    '''Give every browser a session cookie, for fair queueing.'''
+    from flask import request
+
+    @server.after_request
+    def _session_cookie(response):
+        if SESSION_COOKIE not in request.cookies:
+            response.set_cookie(SESSION_COOKIE, uuid.uuid4().hex, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,462 @@
+'''Remote introspection agent for exploring another interpreter.
+
+The agent runs inside the target interpreter (e.g. some virtualenv's python)
+and only needs the standard library plus explore.py and envdata.py. Those are
+copied to a temporary directory holding nothing but this package, which goes
+first on the agent's sys.path. Putting the directory this package is
+installed in there instead would put the UI's site-packages in front of the
+target's own packages. It answers package listing and Explore
+queries over its stdin/stdout pipes, so the UI process with the full Dash
+stack never imports anything from the target environment.
+
+Framing
+-------
+Every message in either direction is a fixed 9 byte header followed by a
+utf-8 json payload::
+
+    request id (uint32) | op or status (uint8) | payload length (uint32)
+
+Requests are answered in order but the client doesn't wait for an answer
+before sending the next request, so several requests can be in flight over
+the same pipe (pipelining). Responses are matched back up by request id.
+
+Before anything else the target sends a hello frame (request id 0) with its
+python version, from a bootstrap that runs on any python 3. The agent itself
+needs MIN_PYTHON, an older target gets a clear error instead of a traceback.
+'''
+
+__all__ = [
+    'AgentClient',
+    'RemoteExplore',
+    'RemoteError',
+    'get_agent',
+]
+
+import atexit
+import importlib
+import json
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Union, Any
+
+from .explore import (
+    AttributeDict,
+    Explore,
+    ExploreFromStatus,
+    _getmember_counts,
+    _flat_members,
+)
+
+_HEADER = struct.Struct('!IBI')
+
+# request ops
+OP_PACKAGES = 1
+OP_EXPLORE = 2
+OP_INFO = 3
+OP_SHUTDOWN = 255
+
+# response status
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# oldest target interpreter the agent runs on
+MIN_PYTHON = (3, 10)
+
+# started with python -c, says hello before importing anything of the agent
+_BOOTSTRAP = '''\
+import json, struct, sys
+hello = json.dumps({{'python': sys.version, 'version': list(sys.version_info[:3])}}).encode('utf-8')
+sys.stdout.buffer.write(struct.pack({header!r}, 0, {status!r}, len(hello)) + hello)
+sys.stdout.buffer.flush()
+if sys.version_info >= {minimum!r}:
+    sys.path[0:1] = [{path!r}]
+    from python_explorer.utils.agent import main
+    main()
+'''
+
+# the python_explorer package
+_PACKAGE = Path(__file__).resolve().parents[1]
+
+_agent_dir = None
+_agent_dir_lock = threading.Lock()
+
+def _agent_path() -> str:
+    '''Internal helper function.
+
+    Return a directory containing only the parts of the python_explorer
+    package the agent imports, for the agent's sys.path.
+    '''
+    global _agent_dir
+    with _agent_dir_lock:
+        if _agent_dir is None:
+            root = tempfile.mkdtemp(prefix='python-explorer-agent-')
+            atexit.register(shutil.rmtree, root, True)
+            target = Path(root) / 'python_explorer'
+            (target / 'utils').mkdir(parents=True)
+            shutil.copy2(_PACKAGE / '__init__.py', target)
+            for f in (_PACKAGE / 'utils').glob('*.py'):
+                shutil.copy2(f, target / 'utils')
+            _agent_dir = root
+        return _agent_dir
+
+
+class RemoteError(Exception):
+    '''Raised when the agent fails to answer a request.'''
+
+
+def _read_exact(stream, n: int) -> bytes:
+    buf = b''
+    while len(buf) < n:
+        chunk = stream.read(n - len(buf))
+        if not chunk:
+            raise EOFError('agent pipe closed')
+        buf += chunk
+    return buf
+
+
+def read_frame(stream) -> tuple[int, int, Any]:
+    '''Read one frame. Return (request id, op/status, payload).'''
+    rid, code, length = _HEADER.unpack(_read_exact(stream, _HEADER.size))
+    payload = json.loads(_read_exact(stream, length)) if length else None
+    return rid, code, payload
+
+
+def write_frame(stream, rid: int, code: int, payload: Any = None):
+    '''Write one frame and flush it.'''
+    blob = b'' if payload is None else json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    stream.write(_HEADER.pack(rid, code, len(blob)) + blob)
+    stream.flush()
+
+
+# Agent side-------------------------------------------------------------------
+
+class _AgentHandler:
+    '''Internal helper class. Answers requests inside the target interpreter.'''
+
+    def _get_explore(self, root: str, status: Union[dict, None]):
+        mod = importlib.import_module(root)
+        if status:
+            return ExploreFromStatus(mod, status)
+        return Explore(mod)
+
+    def packages(self, payload):
+        # environment discovery only ever happens on the agent side
+        from . import envdata
+        return {
+            'std': envdata.env_std_modules,
+            'site': envdata.env_site_packages,
+            'std_wrong_os': envdata.env_std_wrong_os,
+            'python': sys.version,
+        }
+
+    def explore(self, payload):
+        lexp = self._get_explore(payload['root'], payload.get('status'))
+        ok = True
+        if payload.get('action') == 'stepin':
+            ok = lexp.stepin(payload['arg'])
+        elif payload.get('action') == 'stepout':
+            lexp.stepout(payload['arg'])
+
+        heritage = lexp.get_class_heritage(listify=True)
+        return {
+            'ok': ok,
+            'status': lexp.status,
+            'members': lexp.members,
+            'heritage': [heritage.nodes, heritage.heritage],
+            'error': lexp._error,
+        }
+
+    def info(self, payload):
+        lexp = self._get_explore(payload['root'], payload['status'])
+        member = payload.get('member')
+        ok, sig = lexp.getsignature(member)
+        _, doc = lexp.getdoc(member)
+        _, typ = lexp.gettype(member)
+        return {
+            'ok': ok,
+            'sig': sig,
+            'doc': doc,
+            'type': typ,
+            'error': lexp._error,
+        }
+
+
+def main():
+    '''Agent entry point. Serve requests on stdin/stdout until closed.'''
+
+    # keep the protocol pipe to ourselves. Anything imported packages print,
+    # even from C code, ends up on stderr instead.
+    out = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    inp = sys.stdin.buffer
+
+    handler = _AgentHandler()
+    ops = {
+        OP_PACKAGES: handler.packages,
+        OP_EXPLORE: handler.explore,
+        OP_INFO: handler.info,
+    }
+
+    while True:
+        try:
+            rid, op, payload = read_frame(inp)
+        except EOFError:
+            break
+        if op == OP_SHUTDOWN:
+            break
+        try:
+            write_frame(out, rid, STATUS_OK, ops[op](payload))
+        except Exception as e:
+            write_frame(out, rid, STATUS_ERROR, f'{type(e).__name__}: {e}')
+
+
+# Client side------------------------------------------------------------------
+
+class AgentClient:
+    '''Spawn and talk to an agent running in another interpreter.
+
+    Parameters
+    ----------
+    python: str
+        Path to the target python executable.
+
+    Requests can be submitted from any thread. Each submit returns a Future
+    right away, so callers can keep several requests in flight.
+
+    Raises RemoteError when the interpreter doesn't start or is older than
+    MIN_PYTHON.
+    '''
+
+    def __init__(self, python: str) -> None:
+        self.python = python
+        code = _BOOTSTRAP.format(
+            header=_HEADER.format,
+            status=STATUS_OK,
+            minimum=MIN_PYTHON,
+            path=_agent_path(),
+        )
+        self._proc = subprocess.Popen(
+            [python, '-c', code],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+        # python version of the target, from the hello frame
+        self.version = self._handshake()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._next_id = 0
+
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+
+        self._envdata = None
+
+    def _handshake(self) -> str:
+        '''Internal helper method. Read the hello frame, return the target's sys.version.'''
+        try:
+            _, _, hello = read_frame(self._proc.stdout)
+        except Exception:
+            self._proc.kill()
+            raise RemoteError(f'{self.python} did not start the explorer agent.')
+        if tuple(hello['version'][:2]) < MIN_PYTHON:
+            self._proc.wait(5)
+            have = '.'.join(str(v) for v in hello['version'])
+            need = '.'.join(str(v) for v in MIN_PYTHON)
+            raise RemoteError(
+                f'{self.python} is python {have}, exploring it needs python {need} or newer.'
+            )
+        return hello['python']
+
+    def _read_loop(self):
+        try:
+            while True:
+                rid, status, payload = read_frame(self._proc.stdout)
+                with self._lock:
+                    fut = self._pending.pop(rid, None)
+                if fut is None:
+                    continue
+                if status == STATUS_OK:
+                    fut.set_result(payload)
+                else:
+                    fut.set_exception(RemoteError(payload))
+        except Exception:
+            pass
+
+        # agent went away. Fail whatever is still waiting.
+        with self._lock:
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for fut in pending:
+            fut.set_exception(RemoteError(f'Agent for {self.python} exited.'))
+
+    def submit(self, op: int, payload: Any = None) -> Future:
+        '''Send a request without waiting for the answer.'''
+        fut = Future()
+        with self._lock:
+            if self._proc.poll() is not None:
+                raise RemoteError(f'Agent for {self.python} is not running.')
+            rid = self._next_id
+            self._next_id = (self._next_id + 1) % 2**32
+            self._pending[rid] = fut
+            write_frame(self._proc.stdin, rid, op, payload)
+        return fut
+
+    def call(self, op: int, payload: Any = None, timeout: Union[float, None] = None) -> Any:
+        '''Send a request and wait for the answer.'''
+        return self.submit(op, payload).result(timeout)
+
+    def envdata(self) -> tuple[dict, dict, list]:
+        '''Return (std modules, site packages, std modules unavailable).'''
+        if self._envdata is None:
+            self._envdata = self.call(OP_PACKAGES)
+        env = self._envdata
+        return env['std'], env['site'], env['std_wrong_os']
+
+    def close(self):
+        '''Ask the agent to exit and wait for it.'''
+        try:
+            with self._lock:
+                write_frame(self._proc.stdin, 0, OP_SHUTDOWN)
+            self._proc.wait(5)
+        except Exception:
+            self._proc.kill()
+
+
+_agents = {}
+_agents_lock = threading.Lock()
+
+def get_agent(python: str) -> AgentClient:
+    '''Return the agent for an interpreter, starting it if needed.
+
+    One UI process can keep agents for any number of interpreters.
+    '''
+    with _agents_lock:
+        agent = _agents.get(python)
+        if agent is None or agent._proc.poll() is not None:
+            agent = _agents[python] = AgentClient(python)
+        return agent
+
+
+class RemoteExplore():
+
+    '''Explore look-alike answered by an agent in another interpreter.
+
+    Parameters
+    ----------
+    agent: AgentClient
+        Agent for the target interpreter.
+    root: str
+        Import name of the package to explore.
+    status: dict, optional
+        Existing Explore status to resume from.
+
+    The explore request is sent right away and only waited on when a result
+    is needed, so signature/docstring requests can go out on the same pipe
+    before it comes back.
+    '''
+
+    def __init__(self, agent: AgentClient, root: str, status: Union[dict, None] = None) -> None:
+        self._agent = agent
+        self._root = root
+        self._status = status
+        self._info = {}
+        self._pending = agent.submit(OP_EXPLORE, {'root': root, 'status': status})
+        self._result = None
+
+    def _state(self) -> dict:
+        if self._pending is not None:
+            self._result = self._pending.result()
+            self._pending = None
+        return self._result
+
+    def _action(self, action: str, arg: Any) -> bool:
+        self._pending = self._agent.submit(
+            OP_EXPLORE,
+            {
+                'root': self._root,
+                'status': self._state()['status'],
+                'action': action,
+                'arg': arg,
+            }
+        )
+        self._status = None
+        self._info = {}
+        return self._state()['ok']
+
+    def stepin(self, member: str) -> bool:
+        '''Step in to a member.'''
+        return self._action('stepin', member)
+
+    def stepout(self, levels: int = 1) -> None:
+        '''Step out of current member into a parent object.'''
+        self._action('stepout', levels)
+
+    def _getinfo(self, member: Union[str, None]) -> dict:
+        if member not in self._info:
+            # no need to wait on the explore request if we haven't moved
+            status = self._status if self._status else self._state()['status']
+            self._info[member] = self._agent.submit(
+                OP_INFO, {'root': self._root, 'status': status, 'member': member}
+            )
+        info = self._info[member].result()
+        if not info['ok']:
+            self._state()['error'] = info['error']
+        return info
+
+    def getdoc(self, member: Union[str, None] = None) -> tuple:
+        '''Return docstring of current object or member of object.'''
+        info = self._getinfo(member)
+        return info['ok'], info['doc']
+
+    def getsignature(self, member: Union[str, None] = None) -> tuple:
+        '''Return signature of current object or member of object.'''
+        info = self._getinfo(member)
+        return info['ok'], info['sig']
+
+    def gettype(self, member: Union[str, None] = None) -> tuple:
+        '''Return type of current object or member of object.'''
+        info = self._getinfo(member)
+        return info['ok'], info['type']
+
+    def get_class_heritage(self, classes: Any = None, listify: bool = False) -> dict:
+        '''Return the class heritage of all current classes, as lists.'''
+        heritage = self._state()['heritage']
+        return AttributeDict({'nodes': heritage[0], 'heritage': heritage[1]})
+
+    @property
+    def _error(self):
+        return AttributeDict(self._state()['error'])
+
+    @property
+    def members(self):
+        '''Return member dictionary of current explored object.'''
+        return AttributeDict(self._state()['members'])
+
+    @property
+    def membercounts(self):
+        '''Return member counts of current explored object.'''
+        return _getmember_counts(self.members)
+
+    @property
+    def flatmembers(self):
+        '''Return flattened member list of current explored object.'''
+        return _flat_members(self.members)
+
+    @property
+    def trace(self):
+        '''Return trace path of current explored object.'''
+        return self._state()['status']['trace']
+
+    @property
+    def status(self):
+        '''Return dict of current status.'''
+        return self._state()['status']
+
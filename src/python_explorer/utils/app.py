@@ -1,18 +1,65 @@
 '''Primary app definition and utility.'''
 
+import os
+import shutil
+import signal
+import socket
+import sys
+import threading
+import time
 import webbrowser
+from importlib import import_module
 from pathlib import Path
+from typing import Union
 
 from dash import Dash, html
 import dash_mantine_components as dmc
 import dash_bootstrap_components as dbc
-from waitress import serve
+from waitress import create_server
+from waitress import wasyncore
+from waitress.channel import HTTPChannel
+from waitress.server import BaseWSGIServer
+from waitress.trigger import trigger
 
 # locals
-from python_explorer.layouts import comp_id, page_layout, stores
-from python_explorer.utils import callbacks
+from python_explorer.layouts.layout_utils import comp_id
+from python_explorer.utils.explore import Explore
+from python_explorer.utils import discovery, singleflight
+from python_explorer.utils.cache import get_cache, get_env_cache, reset_cache, shared_cache_dir
+from python_explorer.utils.memo import MemberMemo
+from python_explorer.utils.watchdog import Watchdog, install_denylist
+from python_explorer.utils.metrics import install_metrics, add_collector
+from python_explorer.utils.profiler import install_profiler
+from python_explorer.utils.compress import install_compression
+from python_explorer.utils.admission import install_sessions, get_scheduler
+from python_explorer.utils.settings import (
+    settings,
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_THREADS,
+)
+
+# Startup----------------------------------------------------------------------
+# Discovering the environment, registering the callbacks and building the
+# page all wait until the first request (or until run_app starts them in the
+# background), so importing the app is cheap.
+
+# phase -> seconds it took
+startup_timings = {}
+
+_layout = None
+_setup_lock = threading.Lock()
+
+def _timed(phase: str, func):
+    start = time.perf_counter()
+    result = func()
+    startup_timings[phase] = time.perf_counter() - start
+    return result
+
+
+def _build_layout():
+    from python_explorer.layouts import page_layout, stores
 
-def serve_layout():
     return dmc.NotificationsProvider(
         html.Div(
             [
@@ -31,6 +78,45 @@ def serve_layout():
         autoClose=2200,
     )
 
+
+def setup():
+    '''Discover the environment, register callbacks and build the layout.
+
+    Runs once, any later call returns right away (or waits for the first one
+    to finish). Each phase is timed into startup_timings.
+    '''
+    global _layout
+    if _layout is not None:
+        return
+    with _setup_lock:
+        if _layout is not None:
+            return
+        start = time.perf_counter()
+        _timed('environment', lambda: import_module('python_explorer.utils.envdata'))
+        _timed('callbacks', lambda: import_module('python_explorer.utils.callbacks'))
+        layout = _timed('layout', _build_layout)
+        startup_timings['total'] = time.perf_counter() - start
+        _layout = layout
+
+
+def serve_layout():
+    # dash asks for the layout before it registers the callbacks, so the
+    # first call also sets up everything else
+    setup()
+    return _layout
+
+
+def _startup_metrics()-> list:
+    name = 'python_explorer_startup_seconds'
+    lines = [
+        f'# HELP {name} Time spent in each phase of setting up the app.',
+        f'# TYPE {name} gauge',
+    ]
+    for phase, seconds in startup_timings.items():
+        lines.append(f'{name}{{phase="{phase}"}} {seconds}')
+    return lines
+
+
 app = Dash(
     __name__,
     assets_folder=Path(__file__).parent.parent/'assets',
@@ -38,19 +124,216 @@ app = Dash(
     suppress_callback_exceptions=True,
 )  
 
-app.layout = serve_layout()
+app.layout = serve_layout
 
 server = app.server   
 
-DEFAULT_HOST = '127.0.0.1'
-DEFAULT_PORT = '8080'
-DEFAULT_THREADS = 8
+install_metrics(server)
+add_collector(_startup_metrics)
+
+install_sessions(server)
+add_collector(lambda: get_scheduler().metrics())
+
+if settings.compression:
+    install_compression(server)
+
+if settings.profiler:
+    install_profiler(server)
+
+# listings are memoized in every mode. Only worker processes also share them
+# through the result cache (see run_app), in a single process the local cache
+# would just hold the same listings twice.
+Explore.member_memo = MemberMemo()
+add_collector(lambda: Explore.member_memo.metrics())
+add_collector(discovery.metrics)
+add_collector(singleflight.metrics)
+
+# catalogs hold plain data and other interpreters answer through the agent,
+# only live objects can hang
+if not (settings.catalog or settings.python):
+    Explore.watchdog = Watchdog(
+        {
+            'members': settings.members_timeout,
+            'signature': settings.inspect_timeout,
+            'doc': settings.inspect_timeout,
+            'type': settings.inspect_timeout,
+        },
+        denylist=get_env_cache(),
+    )
+    add_collector(Explore.watchdog.metrics)
+    if settings.denylist_admin:
+        install_denylist(server, Explore.watchdog)
+
+
+def _recycle_events() -> list:
+    '''Internal helper function.
+
+    Return the Events asking this process to recycle, which happens when its
+    imports go over the memory budget and can't be unloaded, or when too
+    many introspection calls are stuck past their time budget.
+    '''
+    from python_explorer.utils.callbacks import imports
+    events = [imports.recycle]
+    if Explore.watchdog is not None:
+        events.append(Explore.watchdog.recycle)
+    return events
+
+
+# seconds requests in flight get to finish when recycling
+DRAIN_SECONDS = 10.0
+
+def _drain(loop: dict) -> None:
+    '''Internal helper function, runs on the server's loop.
+
+    Stop accepting connections and close the open ones once they're idle.
+    '''
+    for d in list(loop.values()):
+        if isinstance(d, HTTPChannel):
+            # closes as soon as what's left is written. Busy ones are
+            # marked once their requests are done, on a later call.
+            if not d.requests:
+                d.close_when_flushed = True
+        elif isinstance(d, BaseWSGIServer):
+            # the listening socket, without the trigger BaseWSGIServer.close takes along
+            wasyncore.dispatcher.close(d)
+
+
+def _close_when_recycled(srv, events: Union[list, None] = None) -> threading.Event:
+    '''Internal helper function.
+
+    Shut srv down once any of events (default _recycle_events()) is set, so
+    srv.run() returns. Requests in flight get DRAIN_SECONDS to finish and
+    keep-alive connections are closed. Returns an Event set when that
+    happened.
+    '''
+    recycled = threading.Event()
+    loop = getattr(srv, 'map', None) or srv._map
+
+    def watch():
+        watched = events if events is not None else _recycle_events()
+        while not any(e.wait(1.0) for e in watched):
+            pass
+        recycled.set()
+        # the channels belong to the loop, only touch them from there
+        wake = next(d for d in list(loop.values()) if isinstance(d, trigger))
+        deadline = time.monotonic() + DRAIN_SECONDS
+        while time.monotonic() < deadline and any(
+                not isinstance(d, trigger) for d in list(loop.values())):
+            wake.pull_trigger(lambda: _drain(loop))
+            time.sleep(0.05)
+        srv.task_dispatcher.shutdown()
+        # closing everything left, the trigger included, ends the loop
+        wake.pull_trigger(lambda: wasyncore.close_all(loop))
+
+    threading.Thread(target=watch, daemon=True).start()
+    return recycled
+
+
+def _run_worker(sock: socket.socket, threads: int):
+    '''Internal helper function.
+
+    Serve on sock until the worker is asked to recycle. The parent then
+    forks a fresh worker in its place.
+    '''
+    srv = create_server(server, sockets=[sock], threads=threads)
+    _close_when_recycled(srv)
+    srv.run()
+
+
+def _serve_workers(
+    host: str,
+    port: str,
+    threads: int,
+    workers: int,
+):
+    '''Internal helper function.
+
+    Prefork workers processes that all accept on one listening socket and
+    share a result cache. Dead workers are restarted until Ctrl+C.
+    '''
+    sock = socket.create_server((host, int(port)))
+    sock.setblocking(False)
+
+    # set everything up before forking, so workers start instantly and share
+    # those pages with the parent until they write to them.
+    setup()
+    settings.cache_dir = shared_cache_dir()
+    reset_cache()
+    Explore.member_memo = MemberMemo(shared=get_cache())
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            try:
+                _run_worker(sock, threads)
+            finally:
+                os._exit(0)
+        return pid
+
+    children = set(spawn() for _ in range(workers))
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    try:
+        while children:
+            try:
+                pid, _ = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            children.discard(pid)
+            if not stopping:
+                children.add(spawn())
+    finally:
+        sock.close()
+        shutil.rmtree(settings.cache_dir, ignore_errors=True)
+
+
+# set for the process run_app starts over in after recycling
+_RESTARTED = 'PYTHON_EXPLORER_RESTARTED'
 
 def run_app(
     host: str = DEFAULT_HOST,
     port: str = DEFAULT_PORT,
     threads: int = DEFAULT_THREADS,
+    workers: int = 1,
 ):
     site = f'http://{host}:{port}/'
-    webbrowser.open(site)
-    serve(server, host=host, port=port, threads=threads)
\ No newline at end of file
+    if workers <= 1 or not hasattr(os, 'fork'):
+        # get going while the browser opens, the first request waits for it
+        threading.Thread(target=setup, daemon=True).start()
+    # a recycled single process already has its page open
+    if not os.environ.pop(_RESTARTED, None):
+        webbrowser.open(site)
+
+    if workers > 1 and hasattr(os, 'fork'):
+        _serve_workers(host, port, threads, workers)
+    else:
+        if workers > 1:
+            print('Exploring: Multiple workers need os.fork(). Using one process.', file=sys.stderr)
+        srv = create_server(server, host=host, port=port, threads=threads)
+        recycled = _close_when_recycled(srv)
+        srv.print_listen('Serving on http://{}:{}')
+        try:
+            srv.run()
+        except KeyboardInterrupt:
+            return
+        if recycled.is_set():
+            # no parent to fork a fresh worker, start over in place instead
+            print('Exploring: Restarting to free memory.', file=sys.stderr)
+            os.environ[_RESTARTED] = '1'
+            os.execv(sys.executable, [sys.executable, *sys.orig_argv[1:]])
@@ -0,0 +1,322 @@
+'''Benchmarks for the introspection and rendering hot paths.
+
+Run with ``python-explorer bench``. Every benchmark only uses the standard
+library and the app itself, so results are reproducible offline. Results
+can be saved as json and compared against an earlier run.
+'''
+
+__all__ = [
+    'benchmark',
+    'run_benchmarks',
+    'compare_results',
+]
+
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Union
+
+# name -> {'func', 'setup'}
+BENCHMARKS = {}
+
+
+def benchmark(name: str, setup: Union[Callable, None] = None) -> Callable:
+    '''Register a benchmark. setup, if given, runs untimed before each round.'''
+    def decorator(func):
+        BENCHMARKS[name] = {'func': func, 'setup': setup}
+        return func
+    return decorator
+
+
+def _clear_caches():
+    from .cache import get_cache
+    from .explore import Explore
+    get_cache().clear()
+    if Explore.member_memo is not None:
+        Explore.member_memo.invalidate()
+
+
+# Introspection----------------------------------------------------------------
+
+_STD_MODULES = ['os', 'collections', 'typing', 'email', 'inspect', 'json']
+
+def _getmembers(name):
+    def run():
+        import importlib
+        from .explore import getmembers_categorized
+        getmembers_categorized(importlib.import_module(name))
+    return run
+
+for _m in _STD_MODULES:
+    benchmark(f'getmembers_categorized[{_m}]', setup=_clear_caches)(_getmembers(_m))
+
+
+_memo = None
+
+def _memo_hit(name):
+    def run():
+        global _memo
+        import importlib
+        from .memo import MemberMemo
+        if _memo is None:
+            _memo = MemberMemo()
+        _memo.get(importlib.import_module(name))
+    return run
+
+for _m in ['typing', 'email']:
+    benchmark(f'member_memo.hit[{_m}]')(_memo_hit(_m))
+
+
+def _heritage(name):
+    def run():
+        import importlib
+        from .explore import Explore
+        Explore(importlib.import_module(name)).get_class_heritage(listify=True)
+    return run
+
+for _m in ['typing', 'collections.abc', 'email.mime.multipart']:
+    benchmark(f'get_class_heritage[{_m}]', setup=_clear_caches)(_heritage(_m))
+
+
+def _walk(name, workers):
+    def run():
+        import importlib
+        from .explore import Explore
+        for _ in Explore(importlib.import_module(name)).walk(max_depth=3, workers=workers):
+            pass
+    return run
+
+for _m in ['email', 'xml']:
+    benchmark(f'walk[{_m}]', setup=_clear_caches)(_walk(_m, 1))
+    benchmark(f'walk[{_m},workers=4]', setup=_clear_caches)(_walk(_m, 4))
+
+
+@benchmark('get_site_packages')
+def _site_packages():
+    from .envdata import get_site_packages
+    get_site_packages()
+
+
+# Rendering--------------------------------------------------------------------
+
+def _docstring(name):
+    def run():
+        import importlib
+        import inspect
+        from python_explorer.layouts.layout_utils import publish_docstring
+        mod, _, attr = name.rpartition('.')
+        publish_docstring(inspect.getdoc(getattr(importlib.import_module(mod), attr)))
+    return run
+
+for _d in ['inspect.signature', 'json.dumps', 'collections.OrderedDict']:
+    benchmark(f'publish_docstring[{_d}]', setup=_clear_caches)(_docstring(_d))
+
+
+def _signature(name):
+    def run():
+        import importlib
+        from python_explorer.layouts.layout_utils import publish_signature
+        from .explore import _get_signature, _signatures
+        mod, _, attr = name.rpartition('.')
+        _signatures.clear()
+        publish_signature(_get_signature(getattr(importlib.import_module(mod), attr)))
+    return run
+
+for _d in ['inspect.signature', 'json.dumps', 'typing.get_type_hints']:
+    benchmark(f'publish_signature[{_d}]')(_signature(_d))
+
+
+def _fake_members(n: int) -> list:
+    kinds = ['modules', 'classes', 'functions', 'properties', 'others']
+    return [(kinds[i % 5], f'member_{i:06d}') for i in range(n)]
+
+for _n in [1000, 10000]:
+    def _buttons(n=_n):
+        from python_explorer.layouts.layout_utils import get_member_buttons
+        get_member_buttons(_fake_members(n), 'functions')
+    benchmark(f'get_member_buttons[{_n}]')(_buttons)
+
+    def _tabs(n=_n):
+        from python_explorer.layouts.layout_utils import get_tabs, get_filtered_dict
+        get_tabs(get_filtered_dict(_fake_members(n)))
+    benchmark(f'get_tabs[{_n}]')(_tabs)
+
+
+# Callback round-trips---------------------------------------------------------
+
+def _post_callback(client, app, output_key: str, inputs: list, state: list, changed: str):
+    '''Internal helper function. POST one callback like the browser would.'''
+    outputs = []
+    for o in output_key.strip('.').split('...'):
+        idpart, prop = o.rsplit('.', 1)
+        outputs.append({'id': json.loads(idpart), 'property': prop.split('@')[0]})
+    r = client.post('/_dash-update-component', json={
+        'output': output_key,
+        'outputs': outputs,
+        'inputs': inputs,
+        'state': state,
+        'changedPropIds': [changed],
+    })
+    if r.status_code not in (200, 204):
+        raise RuntimeError(f'callback failed with status {r.status_code}')
+    return r
+
+
+def _find_output(app, comptype: str) -> str:
+    for k in app.callback_map:
+        if f'"comptype":"{comptype}"' in k:
+            return k
+    raise KeyError(comptype)
+
+
+_client = None
+
+def _get_client():
+    '''Internal helper function. Return a primed Flask test client.'''
+    global _client
+    if _client is None:
+        from python_explorer.utils.app import server
+        _client = server.test_client()
+        # Dash registers its callbacks on the first request
+        _client.get('/_dash-dependencies')
+    return _client
+
+
+def _roundtrip(package: str):
+    def run():
+        from python_explorer.utils.app import app
+        from python_explorer.utils.envdata import env_std_modules
+        from python_explorer.layouts.layout_utils import comp_id
+
+        client = _get_client()
+        group = 'standard' if package in env_std_modules else 'site'
+        pid = comp_id('p-button', group, package)
+
+        _post_callback(
+            client, app,
+            _find_output(app, 'package-info'),
+            inputs=[
+                [{'id': pid, 'property': 'n_clicks', 'value': 1}],
+                {'id': comp_id('explore-button', 'tabs', 0), 'property': 'n_clicks', 'value': 0},
+                [],
+            ],
+            state=[
+                {'id': comp_id('status', 'app', 0), 'property': 'data', 'value': {}},
+                {'id': comp_id('current-member-title', 'tabs', 0), 'property': 'children', 'value': ''},
+            ],
+            changed=json.dumps(pid, sort_keys=True, separators=(',', ':')) + '.n_clicks',
+        )
+    return run
+
+for _p in ['json', 'typing', 'email']:
+    benchmark(f'roundtrip.update_explore[{_p}]', setup=_clear_caches)(_roundtrip(_p))
+
+
+# Startup----------------------------------------------------------------------
+# Each round starts a fresh interpreter, so these include python's own
+# startup and every import.
+
+def _python(code: str):
+    def run():
+        import subprocess
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+    return run
+
+benchmark('startup.help')(_python(
+    'from python_explorer.cli import run_explore; run_explore(["--help"])'
+))
+benchmark('startup.first_response')(_python(
+    'from python_explorer.utils.app import server\n'
+    'assert server.test_client().get("/_dash-layout").status_code == 200'
+))
+
+
+# Running----------------------------------------------------------------------
+
+def _run_one(func: Callable, setup: Union[Callable, None], rounds: int, min_time: float) -> dict:
+    times = []
+    total = 0.0
+    # one warmup round so imports and first-use costs don't skew results
+    if setup:
+        setup()
+    func()
+    gc.collect()
+    while len(times) < rounds or total < min_time:
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        t = time.perf_counter() - start
+        times.append(t)
+        total += t
+        if len(times) >= rounds * 100:
+            break
+    return {
+        'rounds': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'stdev': statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(
+        select: Union[str, None] = None,
+        rounds: int = 5,
+        min_time: float = 0.2,
+        echo: Callable = print,
+        ) -> dict:
+    '''Run registered benchmarks and return the results.
+
+    Parameters
+    ----------
+    select: str, optional
+        Only run benchmarks whose name contains this string.
+    rounds: int
+        Minimum number of timed rounds per benchmark.
+    min_time: float
+        Keep going until the timed rounds add up to at least this many seconds.
+    echo: callable
+        Progress output, one line per benchmark.
+
+    Returns
+    -------
+    results: dict
+        'machine' info plus 'results' of {name: {'rounds', 'min', 'median',
+        'mean', 'stdev'}} in seconds.
+    '''
+    results = {}
+    for name, b in BENCHMARKS.items():
+        if select and select not in name:
+            continue
+        try:
+            r = _run_one(b['func'], b['setup'], rounds, min_time)
+        except Exception as e:
+            echo(f'{name:<48} FAILED {type(e).__name__}: {e}')
+            continue
+        results[name] = r
+        echo(f'{name:<48} median {r["median"]*1000:10.3f} ms  ({r["rounds"]} rounds)')
+
+    return {
+        'machine': {
+            'python': sys.version,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+        },
+        'timestamp': time.time(),
+        'results': results,
+    }
+
+
+def compare_results(old: dict, new: dict) -> list:
+    '''Return (name, old median, new median, ratio) rows for shared benchmarks.'''
+    rows = []
+    for name, r in new['results'].items():
+        o = old['results'].get(name)
+        if o is None:
+            continue
+        rows.append((name, o['median'], r['median'], r['median'] / o['median'] if o['median'] else float('inf')))
+    return rows
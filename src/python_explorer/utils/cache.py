@@ -0,0 +1,248 @@
+'''Result caches for expensive introspection and rendering work.
+
+Two flavors with the same small interface (get, set, get_or_set):
+
+* LocalCache - in-process LRU dict, used when the app runs as one process.
+* SharedCache - a directory of pickled entries that every worker process can
+  read and write. On Linux the directory lives in /dev/shm, so it's shared
+  memory in practice. Writes go to a temp file and are renamed into place, so
+  readers never see half written entries and no locking is needed.
+
+Values should be plain data (dicts, lists, strings...) since they are pickled
+for the shared cache.
+
+The environment cache (get_env_cache) is a SharedCache on disk that outlives
+the process, one directory per python environment, for results that are
+slow to build and only change when the environment does.
+'''
+
+__all__ = [
+    'LocalCache',
+    'SharedCache',
+    'get_cache',
+    'reset_cache',
+    'get_env_cache',
+]
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Union
+
+from .settings import settings
+from .singleflight import SingleFlight
+
+_MISSING = object()
+
+
+def _keystr(key: Any) -> str:
+    '''Internal helper function. Return a stable string for a cache key.'''
+    if isinstance(key, tuple):
+        return '\x1f'.join(str(k) for k in key)
+    return str(key)
+
+
+def _fill(cache: Any, key: Any, func: Callable[[], Any]) -> Any:
+    '''Internal helper function. Compute and store a value unless it just was.'''
+    # a thread that missed right before the last computation finished
+    # shouldn't repeat it
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = func()
+        cache.set(key, value)
+    return value
+
+
+class LocalCache:
+    '''Thread-safe in-process LRU cache.
+
+    Parameters
+    ----------
+    max_entries: int
+        Least recently used entries are dropped past this many.
+    '''
+
+    def __init__(self, max_entries: int = 4096) -> None:
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        k = _keystr(key)
+        with self._lock:
+            if k not in self._data:
+                return default
+            self._data.move_to_end(k)
+            return self._data[k]
+
+    def set(self, key: Any, value: Any) -> None:
+        k = _keystr(key)
+        with self._lock:
+            self._data[k] = value
+            self._data.move_to_end(k)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key: Any, func: Callable[[], Any]) -> Any:
+        '''Return cached value for key, computing and storing it if missing.
+
+        Threads missing the same key at the same time share one computation.
+        '''
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._flights.do(key, lambda: _fill(self, key, func))
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class SharedCache:
+    '''Cross-process cache stored as one file per entry.
+
+    Parameters
+    ----------
+    directory: str
+        Directory shared by all processes using the cache.
+    max_bytes: int
+        When the directory grows past this, the oldest entries are removed.
+    '''
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 2**20) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._written = 0
+        self._flights = SingleFlight()
+
+    def _path(self, key: Any) -> str:
+        digest = hashlib.sha1(_keystr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        try:
+            with open(self._path(key), 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return default
+
+    def set(self, key: Any, value: Any) -> None:
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return # not plain data, just don't share it
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, self._path(key))
+
+        self._written += len(blob)
+        if self._written > self.max_bytes // 16:
+            self._written = 0
+            self.prune()
+
+    def get_or_set(self, key: Any, func: Callable[[], Any]) -> Any:
+        '''Return cached value for key, computing and storing it if missing.
+
+        Threads missing the same key at the same time share one computation.
+        '''
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = self._flights.do(key, lambda: _fill(self, key, func))
+        return value
+
+    def prune(self) -> None:
+        '''Remove oldest entries until the directory is under max_bytes.'''
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for e in it:
+                try:
+                    st = e.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self) -> None:
+        with os.scandir(self.directory) as it:
+            for e in it:
+                try:
+                    os.remove(e.path)
+                except OSError:
+                    pass
+
+
+def shared_cache_dir() -> str:
+    '''Return a new directory for a shared cache, in memory where possible.'''
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    return tempfile.mkdtemp(prefix='python-explorer-', dir=base)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Union[LocalCache, SharedCache]:
+    '''Return the result cache for this process.
+
+    Shared between processes when settings.cache_dir is set (multi-process
+    serving), otherwise a local LRU cache.
+    '''
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if settings.cache_dir:
+                _cache = SharedCache(settings.cache_dir)
+            else:
+                _cache = LocalCache()
+        return _cache
+
+
+def reset_cache() -> None:
+    '''Drop this process's cache so the next get_cache() follows settings.'''
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def env_cache_dir() -> str:
+    '''Return the environment cache directory for this interpreter.'''
+    base = settings.env_cache
+    if not base:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        base = os.path.join(base, 'python-explorer')
+    env = hashlib.sha1(f'{sys.executable}\x1f{sys.version}\x1f{sys.prefix}'.encode('utf-8'))
+    return os.path.join(base, env.hexdigest()[:16])
+
+
+_env_cache = None
+
+def get_env_cache() -> Union[SharedCache, LocalCache]:
+    '''Return the on-disk cache for this environment.
+
+    Falls back to an in-process cache when the directory can't be created.
+    '''
+    global _env_cache
+    with _cache_lock:
+        if _env_cache is None:
+            try:
+                _env_cache = SharedCache(env_cache_dir(), max_bytes=256 * 2**20)
+            except OSError:
+                _env_cache = LocalCache()
+        return _env_cache
+
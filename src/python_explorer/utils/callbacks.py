@@ -1,20 +1,42 @@
 '''callback definitions for Dash app.'''
 
-from typing import Any
+import logging
+import os
+import sys
+from contextlib import nullcontext
 
 from dash import callback, Input, Output, State, ctx, no_update, ALL
 
 # local
-from .explore import Explore, ExploreFromStatus
+from .explore import Explore, ExploreFromStatus, getmembers_categorized
+from .settings import settings
+from .catalog import CatalogExplore, open_catalog
+from .agent import RemoteExplore, get_agent
+from .admission import Busy, get_scheduler, HERITAGE_CLASSES
+from .cache import get_cache, get_env_cache, env_cache_dir, SharedCache
+from .classindex import ClassIndexService
+from .importcost import ImportCostEngine
+from .memo import module_version, forget_versions
+from .memsize import MemberSizeEngine
+from .namespace import ImportedNamespace
+from .search import get_member_index
+from .stats import StatsEngine
+from .watcher import EnvironmentWatcher
+from .metrics import instrumented, stage, annotate, add_collector
 from .envdata import (
     env_std_modules,
     env_site_packages,
+    search_packages,
+    refresh_site_packages,
 )
+from . import discovery
 
 from python_explorer.layouts.layout_utils import (
     comp_id,
     placeholder_text,
     get_notification,
+    get_package_button_stack,
+    PACKAGE_PAGE_SIZE,
     get_member_buttons,
     get_button_stack,
     get_trace_buttons,
@@ -25,53 +47,313 @@ from python_explorer.layouts.layout_utils import (
     publish_signature,
     publish_member_info,
     publish_package_info,
+    publish_package_overview,
+    publish_import_cost,
 )
 from python_explorer.layouts.cyto_utils import get_cytoscape
 
+logger = logging.getLogger('python_explorer')
 
-class ImportedNamespace:
-    '''This is an internally managed list of imported names and objects. 
-    
-    Similar function to globals() or locals() but I needed more control.
-    '''
 
-    def __init__(self):
-        self.active = {}
+imports = ImportedNamespace(
+    memory_budget=settings.memory_budget * 2**20 if settings.memory_budget else None,
+)
 
-    def import_(self, module: str):
-        if module in self.active.keys():
-            pass
-        else:
-            try:
-                exec(f'import {module}')
-                self.active[f'{module}'] = eval(f'{module}')
-            except:
-                raise ImportError(f'Failed to import {module}.')
 
-    def get_module(self, module: str)-> Any:
-        if module in self.active.keys():
-            return self.active[f'{module}']
+def _import_metrics()-> list:
+    '''Exposition lines for /metrics from the imported namespace.'''
+    lines = [
+        '# HELP python_explorer_import_seconds Time each explored import took.',
+        '# TYPE python_explorer_import_seconds gauge',
+    ]
+    stats = imports.metrics()
+    for m, v in stats.items():
+        if v['seconds'] is not None:
+            lines.append(f'python_explorer_import_seconds{{module="{m}"}} {v["seconds"]}')
+    lines.extend([
+        '# HELP python_explorer_import_failures Consecutive failed imports per module.',
+        '# TYPE python_explorer_import_failures gauge',
+    ])
+    for m, v in stats.items():
+        if v['failures']:
+            lines.append(f'python_explorer_import_failures{{module="{m}"}} {v["failures"]}')
+    lines.extend([
+        '# HELP python_explorer_import_memory_bytes Tracked memory of active imports.',
+        '# TYPE python_explorer_import_memory_bytes gauge',
+        f'python_explorer_import_memory_bytes {imports.memory_used()}',
+        '# HELP python_explorer_import_evictions_total Imports unloaded over budget.',
+        '# TYPE python_explorer_import_evictions_total counter',
+        f'python_explorer_import_evictions_total {imports.evictions}',
+    ])
+    return lines
+
+add_collector(_import_metrics)
+
+
+def _members(obj) -> tuple:
+    '''getmembers_categorized through the member memo, if there is one.'''
+    if Explore.member_memo is None:
+        return getmembers_categorized(obj)
+    return Explore.member_memo.get(obj)
+
+
+def _denied(trace: str) -> bool:
+    '''Whether listing the members of trace timed out before (see watchdog.py).'''
+    return Explore.watchdog is not None and Explore.watchdog.denied('members', trace) is not None
+
+# package statistics need the live objects, so there are none for catalogs
+# and other interpreters
+if settings.catalog or settings.python:
+    stats_engine = None
+    class_index = None
+    import_costs = None
+    member_sizes = None
+else:
+    stats_engine = StatsEngine(
+        imports.get_module, get_env_cache(), members=_members, skip=_denied
+    )
+    import_costs = ImportCostEngine(get_env_cache())
+    member_sizes = MemberSizeEngine(get_env_cache())
+    # built the first time someone asks for subclasses
+    class_index = ClassIndexService(
+        get_env_cache(),
+        env_cache_dir() if isinstance(get_env_cache(), SharedCache) else None,
+    )
+
+
+def _environment_changed(names: set) -> None:
+    '''Refresh the package lists and drop what went stale with them.
+
+    Results keyed by distribution version (package statistics, import costs,
+    member sizes, heritage) go stale on their own once the versions are
+    looked up again. Rendered docstrings and search indexes are keyed by
+    their content.
+    '''
+    changes = refresh_site_packages(names)
+    for name in changes.imports:
+        imports.forget(name)
+        if Explore.member_memo is not None:
+            Explore.member_memo.invalidate(name)
         else:
-            self.import_(module)
-            return self.active[f'{module}']
+            forget_versions(name)
+        for directory in sys.path:
+            if isinstance(directory, str) and directory:
+                discovery.forget_listings(os.path.join(directory, name))
+    if changes.imports:
+        for engine in (stats_engine, import_costs, member_sizes):
+            engine.forget()
+        class_index.reset()
+    logger.info(
+        'Packages added: %d, removed: %d, changed: %d',
+        len(changes.added), len(changes.removed), len(changes.changed),
+    )
+
+# the catalog and other interpreters don't change under us
+if settings.catalog or settings.python or not settings.watch_interval:
+    env_watcher = None
+else:
+    env_watcher = EnvironmentWatcher(settings.watch_interval)
+    env_watcher.subscribe(_environment_changed)
+    # take stock now, so changes before the first request count
+    env_watcher.poll()
+    add_collector(env_watcher.metrics)
+
 
-imports = ImportedNamespace()
+def watch_environment() -> None:
+    '''Refresh after environment changes, if it's time to look.'''
+    if env_watcher is not None:
+        env_watcher.poll()
+
+
+def _importing(module: str, reject: bool = False):
+    '''Expensive job slot for importing a module, unless it's imported already.'''
+    if module in imports.active:
+        return nullcontext()
+    return get_scheduler().expensive('import', reject=reject)
+
+
+def newexplore(mod_import: str):
+    '''Return new Explore instance for a package import name.'''
+    annotate(trace=mod_import)
+    if settings.catalog:
+        with stage('classify'):
+            return CatalogExplore(open_catalog(settings.catalog), mod_import)
+    if settings.python:
+        with stage('classify'):
+            return RemoteExplore(get_agent(settings.python), mod_import)
+
+    watch_environment()
+    with _importing(mod_import, reject=True), stage('import'):
+        imports.import_(mod_import)
+        root = imports.get_module(mod_import)
+    with stage('classify'):
+        return Explore(root)
 
 
 def getexplore(status):
     '''Retrieve Explore instance from status.'''
-    root = imports.get_module(status['history'][0])
-    loc_explore = ExploreFromStatus(root, status)
+    annotate(trace=status['trace'])
+    if settings.catalog:
+        with stage('classify'):
+            return CatalogExplore(
+                open_catalog(settings.catalog), status['history'][0], status
+            )
+    if settings.python:
+        with stage('classify'):
+            return RemoteExplore(
+                get_agent(settings.python), status['history'][0], status
+            )
+
+    with _importing(status['history'][0]), stage('import'):
+        root = imports.get_module(status['history'][0])
+    with stage('classify'):
+        loc_explore = ExploreFromStatus(root, status)
     
     return loc_explore
 
 
+def getheritage(lexp)-> list:
+    '''Return [nodes, heritage] of all classes in the current explore space.'''
+    def build():
+        big = len(lexp.members.get('classes', [])) > HERITAGE_CLASSES
+        with get_scheduler().expensive('heritage') if big else nullcontext():
+            lheritage = lexp.get_class_heritage(listify=True)
+        return [list(lheritage.nodes), lheritage.heritage]
+
+    with stage('heritage'):
+        return get_cache().get_or_set(
+            ('heritage', lexp.trace, module_version(lexp.trace)), build
+        )
+
+
+def inspect_member(lexp, trace: str, member=None) -> tuple:
+    '''Return (ok, signature, docstring, type, skipped) of a member.
+
+    Each is read within its time budget (see watchdog.py). skipped lists
+    what took too long, now or on an earlier visit. After one timeout the
+    rest isn't tried, it's likely stuck on the same attribute.
+    '''
+    reads = (
+        ('signature', lexp.getsignature),
+        ('doc', lexp.getdoc),
+        ('type', lexp.gettype),
+    )
+    results = {}
+    skipped = []
+    ok = True
+    for op, read in reads:
+        if skipped:
+            results[op] = None
+            skipped.append(op)
+            continue
+        if Explore.watchdog is None:
+            check, results[op] = read(member)
+        else:
+            (check, results[op]), late = Explore.watchdog.run(
+                op, trace, lambda: read(member), (True, None)
+            )
+            if late:
+                skipped.append(op)
+        if op == 'signature':
+            ok = check
+    return ok, results['signature'], results['doc'], results['type'], skipped
+
+
+def _skipped_note(trace: str, skipped: list) -> list:
+    '''Internal helper function. Return a notification for skipped reads.'''
+    names = {'signature': 'signature', 'doc': 'docstring', 'type': 'type'}
+    what = ', '.join(names[s] for s in skipped)
+    return ['Timed Out.', f'Reading the {what} of {trace} took too long and is skipped.']
+
+
+def _timeout_note(error: TimeoutError) -> list:
+    '''Internal helper function. Return a notification for a listing that timed out.'''
+    return ['Timed Out.', str(error)]
+
+
+def _listing(lexp) -> list:
+    '''Internal helper function. Return the all-members data of an explore space.
+
+    [flat, members, key], the key picks the search index (see search.py).
+    '''
+    partial = getattr(lexp, 'partial', False)
+    key = [lexp.trace, module_version(lexp.trace), partial, len(lexp.flatmembers)]
+    return [lexp.flatmembers, lexp.members, key]
+
+
+def _partial_note(lexp) -> list:
+    '''Internal helper function. Return a notification for a cut short listing.'''
+    return [
+        'Partial Listing.',
+        f'Listing the members of {lexp.trace} took too long, some are missing.',
+    ]
+
+
+SUBCLASS_LIMIT = 150
+
+def getsubclasses(lexp, classes: list)-> tuple:
+    '''Return [nodes, heritage] of the subclasses of classes, and a note.
+
+    Subclasses come from the environment class index, or from the classes
+    imported here while it's being built. Same format as getheritage, so
+    the cytoscape graph takes either.
+    '''
+    index = class_index.get()
+    note = ''
+    if index is None:
+        class_index.start()
+        with stage('heritage'):
+            # stepping into submodules imports without going through imports
+            index = class_index.live((imports.generation, len(sys.modules)))
+        if class_index.error:
+            note = f' Environment class index failed ({class_index.error}), showing imported classes only.'
+        else:
+            note = ' Environment class index is still building, showing imported classes only.'
+
+    # qualified name -> node id, current classes go by their member name
+    ids = {}
+    used = set()
+    def node_id(qualified, short=None):
+        if qualified not in ids:
+            short = short or qualified.rpartition('.')[2]
+            ids[qualified] = short if short not in used else qualified
+            used.add(ids[qualified])
+        return ids[qualified]
+
+    included = []
+    for c in classes:
+        ok, qualified = lexp.getqualname(c)
+        if ok and qualified in index and qualified not in ids:
+            node_id(qualified, c)
+            included.append(qualified)
+    for qualified in list(included):
+        room = SUBCLASS_LIMIT - len(included)
+        if room <= 0:
+            note = f' Showing the first {SUBCLASS_LIMIT} classes.' + note
+            break
+        for d in index.descendants(qualified, limit=room):
+            if d not in ids:
+                node_id(d)
+                included.append(d)
+
+    nodes = []
+    heritage = {}
+    for qualified in included:
+        base = index.bases(qualified) in ([], ['builtins.object'])
+        nodes.append((ids[qualified], qualified.rpartition('.')[0], 'base' if base else 'derived'))
+        subs = [ids[s] for s in index.subclasses(qualified) if s in ids]
+        if subs:
+            heritage[ids[qualified]] = subs
+    return [nodes, heritage], note
+
+
 # display notification
 @callback(
         Output(comp_id('notifier', 'app', 0), 'children'),
         Input(comp_id('notify-data', 'app', 0), 'data'),
         prevent_initial_call=True,
 )
+@instrumented('error_notify')
 def error_notify(data):
     try:
         data[0]
@@ -86,10 +368,62 @@ def error_notify(data):
     Input(comp_id('p-button', ALL, ALL), 'n_clicks'),
     prevent_initial_call=True,
 )
+@instrumented('package_dropdown_close')
 def package_dropdown_close(n):
+    # buttons also show up (with 0 clicks) when a page of packages is drawn
+    if not ctx.triggered or not ctx.triggered[0]['value']:
+        return no_update
     return ''
 
 
+# fill in the open package panel, one page of search results at a time
+@callback(
+    Output(comp_id('p-list', 'standard', 0), 'children'),
+    Output(comp_id('p-pages', 'standard', 0), 'total'),
+    Output(comp_id('p-pages', 'standard', 0), 'page'),
+    Output(comp_id('p-list', 'site', 0), 'children'),
+    Output(comp_id('p-pages', 'site', 0), 'total'),
+    Output(comp_id('p-pages', 'site', 0), 'page'),
+    Output(comp_id('env-generation', 'packages', 0), 'data'),
+    Input(comp_id('p-accordion', 'packages', 0), 'value'),
+    Input(comp_id('p-search', 'standard', 0), 'value'),
+    Input(comp_id('p-pages', 'standard', 0), 'page'),
+    Input(comp_id('p-search', 'site', 0), 'value'),
+    Input(comp_id('p-pages', 'site', 0), 'page'),
+    Input(comp_id('env-poll', 'packages', 0), 'n_intervals'),
+    State(comp_id('env-generation', 'packages', 0), 'data'),
+    prevent_initial_call=True,
+)
+@instrumented('show_packages')
+def show_packages(opened, std_search, std_page, site_search, site_page, n, generation):
+    watch_environment()
+    current = env_watcher.generation if env_watcher is not None else ''
+    # the poll only redraws when packages came or went
+    if ctx.triggered_id and ctx.triggered_id.comptype == 'env-poll' and current == generation:
+        return [no_update]*7
+    if opened not in ('standard', 'site'):
+        return [no_update]*6 + [current]
+
+    search, page = (std_search, std_page) if opened == 'standard' else (site_search, site_page)
+    # new search text starts over at the first page
+    if ctx.triggered_id and ctx.triggered_id.comptype == 'p-search':
+        page = 1
+
+    with stage('search'):
+        names = search_packages(opened, search)
+    pages = max(1, -(-len(names) // PACKAGE_PAGE_SIZE))
+    page = min(max(1, page or 1), pages)
+    shown = names[(page - 1) * PACKAGE_PAGE_SIZE:page * PACKAGE_PAGE_SIZE]
+
+    with stage('render'):
+        info = env_std_modules if opened == 'standard' else env_site_packages
+        stack = get_package_button_stack(shown, info, opened)
+
+    if opened == 'standard':
+        return stack, pages, page, no_update, no_update, no_update, current
+    return no_update, no_update, no_update, stack, pages, page, current
+
+
 # resets current explore space based on package click (in drawer), clicking
 # on the 'explore more' button, or clicking on the trace navigation buttons
 @callback(
@@ -103,19 +437,25 @@ def package_dropdown_close(n):
         Input(comp_id('p-button', ALL, ALL), 'n_clicks'),
         Input(comp_id('explore-button', 'tabs', 0), 'n_clicks'),
         Input(comp_id('t-button', 'trace', ALL), 'n_clicks'),
-        State(comp_id('packages', 'accordion', 0), 'data'),
         State(comp_id('status', 'app', 0), 'data'),
         State(comp_id('current-member-title', 'tabs', 0), 'children'),
         prevent_initial_call=True,
 )
-def update_explore(n1, n2, n3, packages, status, member):
+@instrumented('update_explore')
+def update_explore(n1, n2, n3, status, member):
+
+    if ctx.triggered_id is None:
+        return [no_update]*7
 
     id = ctx.triggered_id.comptype
 
     if id == 'p-button':
 
-        index = ctx.triggered_id.index
-        mod = packages[index]
+        # new pages of package buttons trigger this too, without a click
+        if not ctx.triggered[0]['value']:
+            return [no_update]*7
+
+        mod = ctx.triggered_id.index
         
         try:
             try:
@@ -127,14 +467,19 @@ def update_explore(n1, n2, n3, packages, status, member):
                 doc_link = env_site_packages[mod]['homepage']
                 version = env_site_packages[mod]['version']
 
-            imports.import_(mod_import)
+            lexp = newexplore(mod_import)
 
-            lexp = Explore(imports.get_module(mod_import)) 
+            lheritage = getheritage(lexp)
 
-            lheritage = lexp.get_class_heritage(listify=True)
+            with stage('render'):
+                package_info = publish_package_info(mod, version, doc_link)
+
+        except Busy as e:
+            return [no_update]*6 + [['Server Busy.', str(e)]]
+
+        except TimeoutError as e:
+            return [no_update]*6 + [_timeout_note(e)]
 
-            package_info = publish_package_info(mod, version, doc_link)
-        
         except:
             return (
                 no_update,
@@ -152,28 +497,36 @@ def update_explore(n1, n2, n3, packages, status, member):
         return (
             lexp.status,
             package_info,
-            [lexp.flatmembers, lexp.members],
-            [list(lheritage.nodes), lheritage.heritage],
+            _listing(lexp),
+            lheritage,
             ['package'],
             '',
-            no_update
+            _partial_note(lexp) if getattr(lexp, 'partial', False) else no_update
         )
     
     elif id == 'explore-button':
 
-        lexp = getexplore(status)
-        ok = lexp.stepin(member)
+        try:
+            lexp = getexplore(status)
+            ok = lexp.stepin(member)
+            if ok == True:
+                lheritage = getheritage(lexp)
+
+        except Busy as e:
+            return [no_update]*6 + [['Server Busy.', str(e)]]
+
+        except TimeoutError as e:
+            return [no_update]*6 + [_timeout_note(e)]
 
         if ok == True:
-           lheritage = lexp.get_class_heritage(listify=True)
            return (
                lexp.status,
                no_update,
-               [lexp.flatmembers, lexp.members],
-               [lheritage.nodes, lheritage.heritage],
+               _listing(lexp),
+               lheritage,
                ['explore'],
                '',
-               no_update
+               _partial_note(lexp) if getattr(lexp, 'partial', False) else no_update
             )
 
         elif ok == False:
@@ -198,21 +551,92 @@ def update_explore(n1, n2, n3, packages, status, member):
         index = ctx.triggered_id.index
         levels = len(status['history']) - index - 1
 
-        lexp = getexplore(status)
-        lexp.stepout(levels)
-        lheritage = lexp.get_class_heritage(listify=True)
+        try:
+            lexp = getexplore(status)
+            lexp.stepout(levels)
+            lheritage = getheritage(lexp)
+
+        except Busy as e:
+            return [no_update]*6 + [['Server Busy.', str(e)]]
+
+        except TimeoutError as e:
+            return [no_update]*6 + [_timeout_note(e)]
 
         return (
             lexp.status,
             no_update,
-            [lexp.flatmembers, lexp.members],
-            [lheritage.nodes, lheritage.heritage],
+            _listing(lexp),
+            lheritage,
             ['trace'],
             '',
-            no_update
+            _partial_note(lexp) if getattr(lexp, 'partial', False) else no_update
         )
 
 
+# package overview statistics, polled for until the background walk is done
+@callback(
+    Output(comp_id('package-overview', 'package', 0), 'children'),
+    Output(comp_id('overview-poll', 'package', 0), 'disabled'),
+    Input(comp_id('status', 'app', 0), 'data'),
+    Input(comp_id('overview-poll', 'package', 0), 'n_intervals'),
+    prevent_initial_call=True,
+)
+@instrumented('show_overview')
+def show_overview(status, n):
+    if stats_engine is None or not status:
+        return no_update, True
+
+    package = status['history'][0]
+    annotate(trace=package)
+    with stage('stats'):
+        stats = stats_engine.request(package)
+    if stats is None:
+        error = stats_engine.error(package)
+        return publish_package_overview(None, error), error is not None
+
+    with stage('render'):
+        return publish_package_overview(stats), True
+
+
+# import cost of the current package, measured when its tab is opened
+@callback(
+    Output(comp_id('import-cost-content', 'imports', 0), 'children'),
+    Output(comp_id('import-cost-title', 'imports', 0), 'children'),
+    Output(comp_id('import-cost-poll', 'imports', 0), 'disabled'),
+    Input(comp_id('body-right-tabs', 'app', 0), 'value'),
+    Input(comp_id('status', 'app', 0), 'data'),
+    Input(comp_id('import-cost-poll', 'imports', 0), 'n_intervals'),
+    State(comp_id('import-cost-title', 'imports', 0), 'children'),
+    prevent_initial_call=True,
+)
+@instrumented('show_import_cost')
+def show_import_cost(tab, status, n, shown):
+    if tab != 'import-cost' or not status:
+        return no_update, no_update, True
+
+    package = status['history'][0]
+    title = f'Import cost of **{package}**'
+    # stepping around inside the package doesn't change anything here
+    if title == shown and ctx.triggered_id and ctx.triggered_id.comptype == 'status':
+        return no_update, no_update, no_update
+    if import_costs is None:
+        return (
+            placeholder_text('Import costs are only available for the live environment.'),
+            title,
+            True
+        )
+
+    annotate(trace=package)
+    with stage('import-cost'):
+        cost = import_costs.request(package)
+    if cost is None:
+        error = import_costs.error(package)
+        return publish_import_cost(None, error), title, error is not None
+
+    with stage('render'):
+        return publish_import_cost(cost), title, True
+
+
 # output filtered list of members based on search settings
 @callback(
         Output(comp_id('filtered-members', 'tabs', 0), 'data'),
@@ -222,6 +646,7 @@ def update_explore(n1, n2, n3, packages, status, member):
         Input(comp_id('private-switch', 'tabs', 0), 'checked'),
         prevent_initial_call=True,
 )
+@instrumented('update_members')
 def update_members(all_mems, value, choice, privates):
     if len(all_mems) == 0:
         return all_mems
@@ -234,22 +659,11 @@ def update_members(all_mems, value, choice, privates):
             filtered_dict = get_filtered_dict(filtered_flat)
             return [filtered_flat, filtered_dict]
     else:
-        if privates:
-            mems = all_mems[0]
-        else:
-            mems = [m for m in all_mems[0] if not m[1].startswith('_')]
+        with stage('search'):
+            index = get_member_index(all_mems[0], all_mems[2])
+            filtered_flat = index.search(value, choice, privates)
 
-        filtered_flat = []
-        if choice == 'contains':
-            for flat in mems:
-                if value.lower() in flat[1].lower():
-                    filtered_flat.append(flat)
-        elif choice == 'startswith':
-            for flat in mems:
-                if flat[1].lower().startswith(value):
-                    filtered_flat.append(flat)
-
-        filtered_dict = get_filtered_dict(filtered_flat)
+        filtered_dict = get_filtered_dict(filtered_flat, ranked=choice == 'fuzzy')
 
         return [filtered_flat, filtered_dict]
 
@@ -262,29 +676,56 @@ def update_members(all_mems, value, choice, privates):
         State(comp_id('m-tabs-group', 'tabs', 0), 'value'),
         prevent_intial_call=True
 )
+@instrumented('create_tabs')
 def create_tabs(data, tab):
     try:
-        return get_tabs(data[1]), tab
+        with stage('render'):
+            return get_tabs(data[1]), tab
     except:
         return no_update, no_update
 
 
-# return member tab content (list of member buttons) based on tab selection
+# return member tab content (list of member buttons) based on tab selection,
+# sorted by size when asked and the sizes are measured
 @callback(
     Output(comp_id('m-tabs-content', 'tabs', 0), 'children'),
+    Output(comp_id('size-poll', 'tabs', 0), 'disabled'),
     Input(comp_id('m-tabs-group', 'tabs', 0), 'value'),
+    Input(comp_id('size-switch', 'tabs', 0), 'checked'),
+    Input(comp_id('size-poll', 'tabs', 0), 'n_intervals'),
     State(comp_id('filtered-members', 'tabs', 0), 'data'),
+    State(comp_id('status', 'app', 0), 'data'),
     prevent_intial_call=True
 )
-def get_tab_content(activetab, data):
+@instrumented('get_tab_content')
+def get_tab_content(activetab, by_size, n, data, status):
+    sizes = None
+    note = None
+    poll_off = True
+    if by_size and status:
+        if member_sizes is None:
+            note = 'Sizes are only available for the live environment.'
+        else:
+            with stage('sizes'):
+                result = member_sizes.request(status['trace'])
+            if result is not None:
+                sizes = result['sizes']
+                if not result['complete']:
+                    note = 'Out of time measuring, sizes with + are at least that.'
+            else:
+                error = member_sizes.error(status['trace'])
+                note = f'Measuring failed ({error}), try again in a few minutes.' if error else 'Measuring sizes...'
+                poll_off = error is not None
     try:
-        buttons = get_member_buttons(data[0], activetab)
-        return get_button_stack(
-            buttonlist = buttons,
-            group = activetab
-        )
+        with stage('render'):
+            buttons = get_member_buttons(data[0], activetab, sizes)
+            return get_button_stack(
+                buttonlist = buttons,
+                group = activetab,
+                note = note,
+            ), poll_off
     except:
-        return no_update
+        return no_update, poll_off
     
 
 # create trace navigation buttons
@@ -293,11 +734,13 @@ def get_tab_content(activetab, data):
     Input(comp_id('status', 'app', 0), 'data'),
     prevent_intial_call=True,
 )
+@instrumented('show_navigation')
 def show_navigation(status):
     try:
-        return get_trace_group(
-            get_trace_buttons(status['history'])
-        )
+        with stage('render'):
+            return get_trace_group(
+                get_trace_buttons(status['history'])
+            )
     except:
         return no_update
 
@@ -321,17 +764,22 @@ def show_navigation(status):
     State(comp_id('filtered-members', 'tabs', 0), 'data'),
     prevent_initial_call=True
 )
+@instrumented('show_member_info')
 def show_member_info(n1, status, clicked, filt_mems):
-    
-    lexp = getexplore(status)
+
+    try:
+        lexp = getexplore(status)
+    except Busy as e:
+        return [no_update]*6 + [['Server Busy.', str(e)]]
+    except TimeoutError as e:
+        return [no_update]*6 + [_timeout_note(e)]
 
     if clicked[0] in ['explore', 'trace', 'package']:
 
         member = status['history'][-1]
-        ok, sig = lexp.getsignature()
-        _, doc = lexp.getdoc()
-        _, typ = lexp.gettype()
         trace = status['trace']
+        with stage('inspect'):
+            ok, sig, doc, typ, skipped = inspect_member(lexp, trace)
         disable = True
         clickstate = ['member']
 
@@ -342,24 +790,27 @@ def show_member_info(n1, status, clicked, filt_mems):
 
         index = ctx.triggered_id.index
         member = filt_mems[0][index][1]
-        ok, sig = lexp.getsignature(member)
-        _, doc = lexp.getdoc(member)
-        _, typ = lexp.gettype(member)
         trace = '.'.join([status['trace'], member])
+        with stage('inspect'):
+            ok, sig, doc, typ, skipped = inspect_member(lexp, trace, member)
         disable = False
         clickstate = ['member']
 
     format = 'rst'
 
     if ok:
+        with stage('render'):
+            sig_info = publish_signature(sig)
+            doc_info = publish_docstring(doc, format)
+            member_info = publish_member_info(trace, typ)
         return (
-            publish_signature(sig),
-            publish_docstring(doc, format),
+            sig_info,
+            doc_info,
             member,
-            publish_member_info(trace, typ),
+            member_info,
             disable,
             clickstate,
-            no_update,
+            _skipped_note(trace, skipped) if skipped else no_update,
         )
     else:
         return(
@@ -378,12 +829,17 @@ def show_member_info(n1, status, clicked, filt_mems):
     Output(comp_id('cytoscape-container', 'cyto', 0), 'children'),
     Output(comp_id('current-class-space', 'cyto', 0), 'children'),
     Input(comp_id('all-heritage', 'cyto', 0), 'data'),
+    Input(comp_id('subclass-switch', 'cyto', 0), 'checked'),
     State(comp_id('all-members', 'tabs', 0), 'data'),
     State(comp_id('status', 'app', 0), 'data'),
     prevent_initial_call=True,
 )
-def get_cytoscape_graph(heritage, members, status):
+@instrumented('get_cytoscape_graph')
+def get_cytoscape_graph(heritage, subclasses, members, status):
     
+    if not members or not status:
+        return no_update, no_update
+
     current_classes = members[1]['classes']
     member = status['history'][-1]
 
@@ -393,9 +849,28 @@ def get_cytoscape_graph(heritage, members, status):
             f'Class space for **{member}**.'
         )
 
+    title = f'Class space for **{member}**.'
+    if subclasses:
+        if class_index is None:
+            return (
+                placeholder_text('Subclasses are only available for the live environment.'),
+                f'Subclasses of classes in **{member}**.'
+            )
+        try:
+            heritage, note = getsubclasses(getexplore(status), current_classes)
+        except (Busy, TimeoutError) as e:
+            return (
+                placeholder_text(str(e)),
+                f'Subclasses of classes in **{member}**.'
+            )
+        title = f'Subclasses of classes in **{member}**.{note}'
+
+    with stage('render'):
+        graph = get_cytoscape(heritage, current_classes)
+
     return (
-        get_cytoscape(heritage, current_classes),
-        f'Class space for **{member}**.'
+        graph,
+        title
     )
 
 
@@ -405,6 +880,7 @@ def get_cytoscape_graph(heritage, members, status):
         Input(comp_id('dropdown-cyto-layout', 'cyto', 0), 'value'),
         prevent_initial_call=True,
     )
+@instrumented('update_cytoscape_layout')
 def update_cytoscape_layout(layout):
     return {'name': layout, 'animate':True}
 
@@ -415,6 +891,7 @@ def update_cytoscape_layout(layout):
     Input(comp_id('cytoscape', 'cyto', 0), 'mouseoverNodeData'),
     prevent_initial_call=True,
 )
+@instrumented('getNodeInfo')
 def getNodeInfo(nodedata):
     if not nodedata:
         return ''
@@ -429,5 +906,6 @@ def getNodeInfo(nodedata):
     Input(comp_id('cyto-legend-switch', 'cyto', 0), 'checked'),
     prevent_initial_call=True,
 )
+@instrumented('show_legend')
 def show_legend(checked):
     return not checked
\ No newline at end of file
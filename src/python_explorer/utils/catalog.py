@@ -0,0 +1,492 @@
+'''Precomputed, read-only catalogs of an environment.
+
+A catalog is a single file holding everything the app needs to display an
+environment: the package listings from envdata and, for every explored trace,
+the member listing, class heritage, type, signature and docstring. Once built,
+the app can serve it without importing anything from the environment it was
+built in.
+
+File layout::
+
+    MAGIC | index offset (uint64) | index count (uint64)
+    record | record | ... | index
+
+Records are utf-8 json blobs. The index is a table of fixed size entries
+sorted by key, followed by the keys themselves::
+
+    key offset (uint64) | key length (uint32) | record offset (uint64) | record length (uint32)
+
+Opening a catalog only reads the header, however many records it holds.
+Lookups bisect the table in the memory map and only decode the record found.
+'''
+
+__all__ = [
+    'build_catalog',
+    'open_catalog',
+    'Catalog',
+    'CatalogExplore',
+]
+
+import importlib
+import inspect
+import json
+import mmap
+import struct
+import sys
+from typing import Union, Any
+
+from .discovery import discover_tree
+from .explore import (
+    AttributeDict,
+    getmembers_categorized,
+    _getmember_counts,
+    _flat_members,
+    _get_signature,
+    _build_class_heritage,
+)
+
+# bumped whenever what the records hold changes
+MAGIC = b'PXCAT003'
+_HEADER = struct.Struct('<QQ')
+_HEADER_SIZE = len(MAGIC) + _HEADER.size
+# one index entry, see the module docstring
+_ENTRY = struct.Struct('<QIQI')
+
+# key of the environment record (package listings)
+ENV_KEY = '@env'
+
+DEFAULT_DEPTH = 3
+
+
+# Building---------------------------------------------------------------------
+
+def _member_info(obj) -> dict:
+    '''Internal helper function.
+
+    Return type, signature and docstring of an object, like Explore would.
+    '''
+    sig = _get_signature(obj)
+
+    try:
+        doc = inspect.getdoc(obj)
+    except:
+        doc = None
+
+    return {
+        'type': type(obj).__name__,
+        'sig': sig,
+        'doc': doc,
+    }
+
+
+def _heritage(obj, classes: list) -> list:
+    '''Internal helper function.
+
+    Return listified [nodes, heritage] for the given class members of obj.
+    '''
+    nodes = set()
+    heritage = dict()
+    for c in classes:
+        try:
+            nodes, heritage = _build_class_heritage(getattr(obj, c), nodes, heritage)
+        except:
+            pass
+    return [
+        [list(n) for n in nodes],
+        {k: list(v) for k, v in heritage.items()},
+    ]
+
+
+class _CatalogWriter:
+    '''Internal helper class. Appends records and writes the index on close.'''
+
+    def __init__(self, path: str):
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + _HEADER.pack(0, 0))
+        self._index = {}
+
+    def add(self, key: str, record: dict):
+        blob = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        self._index[key] = [self._file.tell(), len(blob)]
+        self._file.write(blob)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def close(self):
+        # sorted as utf-8 bytes, which is what the reader compares
+        keys = sorted(k.encode('utf-8') for k in self._index)
+        table = bytearray()
+        at = 0
+        for k in keys:
+            offset, length = self._index[k.decode('utf-8')]
+            table += _ENTRY.pack(at, len(k), offset, length)
+            at += len(k)
+        offset = self._file.tell()
+        self._file.write(table)
+        self._file.write(b''.join(keys))
+        self._file.seek(len(MAGIC))
+        self._file.write(_HEADER.pack(offset, len(keys)))
+        self._file.close()
+
+
+def _walk(writer: _CatalogWriter, obj, trace: str, depth: int, seen: dict):
+    '''Internal helper function.
+
+    Record obj (already known to be explorable) and its members, stepping into
+    modules and classes until depth runs out. Objects seen under another
+    trace are stored as an alias to that trace instead of being walked again.
+    '''
+    if id(obj) in seen:
+        writer.add(trace, {'alias': seen[id(obj)]})
+        return
+    seen[id(obj)] = trace
+
+    try:
+        members, inactive = getmembers_categorized(obj)
+    except:
+        members, inactive = AttributeDict({}), set()
+
+    record = _member_info(obj)
+    record['members'] = members
+    record['heritage'] = _heritage(obj, members.get('classes', []))
+    writer.add(trace, record)
+
+    for kind, name in _flat_members(members):
+        child_trace = f'{trace}.{name}'
+        if child_trace in writer:
+            continue
+        try:
+            if name in inactive:
+                importlib.import_module(f'{obj.__name__}.{name}')
+            child = getattr(obj, name)
+        except:
+            writer.add(child_trace, {'type': None, 'sig': None, 'doc': None})
+            continue
+
+        # modules are stored under their own name. Anything imported from
+        # outside the package only resolves if that package is cataloged too.
+        canonical = getattr(child, '__name__', None) if kind == 'modules' else None
+        if isinstance(canonical, str) and canonical != child_trace:
+            writer.add(child_trace, {'alias': canonical})
+        elif depth > 1 and kind in ('modules', 'classes'):
+            _walk(writer, child, child_trace, depth - 1, seen)
+        else:
+            writer.add(child_trace, _member_info(child))
+
+
+def build_catalog(
+        path: str,
+        packages: Union[list, None] = None,
+        max_depth: int = DEFAULT_DEPTH,
+        ) -> int:
+    '''Build a catalog file of the current environment.
+
+    Parameters
+    ----------
+    path: str
+        Output file.
+    packages: list[str], optional
+        Package names (as listed in the app) to include. Default is all of
+        them.
+    max_depth: int, optional
+        Number of levels to walk into each package. Members deeper than this
+        are listed but can't be explored further from the catalog.
+
+    Returns
+    -------
+    count: int
+        Number of records written.
+    '''
+    from .envdata import env_std_modules, env_site_packages, env_std_wrong_os
+
+    std = env_std_modules
+    site = env_site_packages
+    if packages is not None:
+        std = {k: v for k, v in std.items() if k in packages}
+        site = {k: v for k, v in site.items() if k in packages}
+
+    writer = _CatalogWriter(path)
+    writer.add(ENV_KEY, {
+        'std': std,
+        'site': site,
+        'std_wrong_os': env_std_wrong_os,
+        'python': sys.version,
+    })
+
+    seen = {}
+    for info in list(std.values()) + list(site.values()):
+        name = info['import_name']
+        if name is None or name in writer:
+            continue
+        try:
+            mod = importlib.import_module(name)
+        except:
+            continue
+        discover_tree(getattr(mod, '__path__', ()))
+        _walk(writer, mod, name, max_depth, seen)
+
+    count = len(writer._index)
+    writer.close()
+    return count
+
+
+# Reading----------------------------------------------------------------------
+
+class Catalog:
+    '''Read-only view of a catalog file.
+
+    Parameters
+    ----------
+    path: str
+        Catalog file written by build_catalog().
+    '''
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(
+                f"'{path}' is not a python-explorer catalog of this version. "
+                "Build it again with --build-catalog."
+            )
+
+        self._table, self._count = _HEADER.unpack_from(self._mm, len(MAGIC))
+        self._keys = self._table + self._count * _ENTRY.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _find(self, key: str) -> Union[tuple, None]:
+        '''Internal helper method. Return (offset, length) of key's record, or None.'''
+        target = key.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            at, n, offset, length = _ENTRY.unpack_from(self._mm, self._table + mid * _ENTRY.size)
+            found = self._mm[self._keys + at:self._keys + at + n]
+            if found == target:
+                return offset, length
+            if found < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def _read(self, key: str) -> Union[dict, None]:
+        loc = self._find(key)
+        if loc is None:
+            return None
+        return json.loads(self._mm[loc[0]:loc[0] + loc[1]])
+
+    def _resolve(self, key: str) -> tuple:
+        '''Internal helper method.
+
+        Return (key, record) a trace is actually stored under, or
+        (None, None). Objects are walked once, so e.g.
+        'json.decoder.re.compile' lives under wherever the 're' module was
+        first recorded.
+        '''
+        record = self._read(key)
+        if record is not None:
+            if 'alias' in record:
+                return self._resolve(record['alias'])
+            return key, record
+
+        parent, _, name = key.rpartition('.')
+        if not parent:
+            return None, None
+        canonical_parent, _ = self._resolve(parent)
+        if canonical_parent is None or canonical_parent == parent:
+            return None, None
+        return self._resolve(f'{canonical_parent}.{name}')
+
+    def lookup(self, key: str) -> Union[dict, None]:
+        '''Return the record for key, following aliases. None if not found.'''
+        return self._resolve(key)[1]
+
+    def envdata(self) -> tuple[dict, dict, list]:
+        '''Return (std modules, site packages, std modules unavailable).'''
+        env = self.lookup(ENV_KEY)
+        return env['std'], env['site'], env['std_wrong_os']
+
+
+_catalogs = {}
+
+def open_catalog(path: str) -> Catalog:
+    '''Return a Catalog for path, reusing an already opened one.'''
+    if path not in _catalogs:
+        _catalogs[path] = Catalog(path)
+    return _catalogs[path]
+
+
+class CatalogExplore():
+
+    '''Explore look-alike backed by a Catalog instead of live objects.
+
+    Parameters
+    ----------
+    catalog: Catalog
+        The opened catalog.
+    root: str
+        Import name of the package to explore.
+    status: dict, optional
+        Existing Explore status to resume from.
+    '''
+
+    def __init__(self, catalog: Catalog, root: str, status: Union[dict, None] = None) -> None:
+        self._catalog = catalog
+
+        if status:
+            self._history = list(status['history'])
+        else:
+            self._history = [root]
+
+        self._trace = '.'.join(self._history)
+        self._error = AttributeDict({'kind':'', 'msg':''})
+
+        # kind of the member last stepped into
+        self._kind = 'modules'
+
+        if catalog.lookup(self._history[0]) is None:
+            raise ImportError(f"'{root}' is not in the catalog.")
+
+        self._updatemembers()
+
+    def _record(self, member: Union[str, None] = None) -> Union[dict, None]:
+        if member:
+            return self._catalog.lookup(f'{self._trace}.{member}')
+        return self._catalog.lookup(self._trace)
+
+    def _checkmember(self, member: str) -> bool:
+        if member not in self._members.get(self._kind_of(member), []):
+            self._error.kind = 'Invalid Member'
+            self._error.msg = f"'{member}' is not a valid member of '{self._trace}'"
+            return False
+        return True
+
+    def _kind_of(self, member: str) -> str:
+        for kind, name in self._flatmembers:
+            if name == member:
+                return kind
+        return ''
+
+    def _updatemembers(self) -> bool:
+        record = self._record() or {}
+        members = record.get('members')
+
+        if not members or sum(len(v) for v in members.values()) == 0:
+            # only modules and classes are walked when the catalog is built
+            if members is None and self._kind in ('modules', 'classes'):
+                self._error.kind = 'Not Cataloged'
+                self._error.msg = f"'{self._trace}' was not explored when the catalog was built."
+            else:
+                self._error.kind = 'Exploration Complete'
+                self._error.msg = f'{self._trace} has no further members to explore.'
+
+            if len(self._history) > 1:
+                self._history.pop()
+                self._trace = '.'.join(self._history)
+                self._updatemembers()
+            else:
+                # nowhere to go back to, an empty root
+                self._members = AttributeDict(
+                    {k: [] for k in ('modules', 'classes', 'functions', 'properties', 'others')}
+                )
+                self._membercounts = _getmember_counts(self._members)
+                self._flatmembers = _flat_members(self._members)
+                self._heritage = [[], {}]
+            return False
+
+        self._members = AttributeDict(members)
+        self._membercounts = _getmember_counts(self._members)
+        self._flatmembers = _flat_members(self._members)
+        self._heritage = record.get('heritage', [[], {}])
+        return True
+
+    def stepin(self, member: str) -> bool:
+        '''Step in to a member.'''
+        if not self._checkmember(member):
+            return False
+        self._kind = self._kind_of(member)
+        self._history.append(member)
+        self._trace = '.'.join(self._history)
+        return self._updatemembers()
+
+    def stepout(self, levels: int = 1) -> None:
+        '''Step out of current member into a parent object.'''
+        if levels == 0:
+            return
+        levels = min(levels, len(self._history) - 1)
+        if levels > 0:
+            self._history = self._history[0:-levels]
+            self._trace = '.'.join(self._history)
+        self._updatemembers()
+
+    def _info(self, key: str, member: Union[str, None]) -> tuple:
+        if member and not self._checkmember(member):
+            return False, None
+        record = self._record(member) or {}
+        return True, record.get(key)
+
+    def getdoc(self, member: Union[str, None] = None) -> tuple:
+        '''Return docstring of current object or member of object.'''
+        return self._info('doc', member)
+
+    def getsignature(self, member: Union[str, None] = None) -> tuple:
+        '''Return signature of current object or member of object.'''
+        return self._info('sig', member)
+
+    def gettype(self, member: Union[str, None] = None) -> tuple:
+        '''Return type of current object or member of object.'''
+        return self._info('type', member)
+
+    def get_class_heritage(self, classes: Any = None, listify: bool = False) -> dict:
+        '''Return the precomputed class heritage of the current object.
+
+        Only the heritage of all current classes is stored, so ``classes``
+        is ignored. Elements are always lists.
+        '''
+        return AttributeDict(
+            {
+                'nodes': self._heritage[0],
+                'heritage': self._heritage[1],
+            }
+        )
+
+    @property
+    def members(self):
+        '''Return member dictionary of current explored object.'''
+        return self._members
+
+    @property
+    def membercounts(self):
+        '''Return member counts of current explored object.'''
+        return self._membercounts
+
+    @property
+    def flatmembers(self):
+        '''Return flattened member list of current explored object.'''
+        return self._flatmembers
+
+    @property
+    def trace(self):
+        '''Return trace path of current explored object.'''
+        return self._trace
+
+    @property
+    def status(self):
+        '''Return dict of current status. Same shape as Explore.status.'''
+        return {
+            'refhistory': [
+                '.'.join(['self._root'] + self._history[1:i + 1])
+                for i in range(len(self._history))
+            ],
+            'history': self._history,
+            'trace': self._trace,
+        }
@@ -0,0 +1,393 @@
+'''Environment wide class graph, for subclass queries.
+
+get_class_heritage only looks up from the classes in the current namespace.
+Going the other way ("what subclasses Exception") needs every class in the
+environment, which means importing every package. That's done once in a
+separate process, so nothing it imports (or breaks) ends up in the server:
+
+    python -m python_explorer.utils.classindex <environment cache directory>
+
+imports each package of the environment and its submodules, collects every
+class alive through type.__subclasses__, and stores the graph in the
+environment cache (see cache.get_env_cache) under a key that changes
+whenever a distribution is installed, removed or upgraded.
+
+The graph is kept as compact adjacency arrays (CSR: an offsets array and a
+targets array per direction) indexed by class number, with a dict from
+qualified name (module.qualname) to number. Direct bases and subclasses are
+a slice, ancestors and descendants a walk over those slices.
+'''
+
+__all__ = [
+    'ClassIndex',
+    'ClassIndexService',
+    'environment_fingerprint',
+]
+
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+import warnings
+from array import array
+from collections import deque
+from typing import Any, Iterable, Union
+
+logger = logging.getLogger('python_explorer')
+
+# bump when the stored shape changes
+INDEX_VERSION = 1
+
+# seconds after a failed build before start() tries again
+RETRY_SECONDS = 600.0
+
+# seconds the builder spends importing, and how much longer its process may
+# take (indexing, storing) before it's killed
+BUILD_SECONDS = 600.0
+BUILD_MARGIN = 120.0
+
+
+def qualified_name(cls: type) -> str:
+    '''Return module.qualname of a class.'''
+    return f"{getattr(cls, '__module__', None) or '?'}.{getattr(cls, '__qualname__', cls.__name__)}"
+
+
+def environment_fingerprint() -> str:
+    '''Return a hash of the python version and every installed distribution.'''
+    from importlib.metadata import distributions
+    dists = sorted(
+        f"{d.metadata.get('Name', '')}=={d.version}" for d in distributions()
+    )
+    h = hashlib.sha1(sys.version.encode('utf-8'))
+    for d in dists:
+        h.update(d.encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def _all_classes() -> list:
+    '''Internal helper function. Return every class reachable from object.'''
+    seen = {id(object)}
+    found = [object]
+    stack = [object]
+    while stack:
+        cls = stack.pop()
+        try:
+            # type.__subclasses__(type) works where type.__subclasses__() doesn't
+            subs = type.__subclasses__(cls)
+        except TypeError:
+            continue
+        for s in subs:
+            if id(s) not in seen:
+                seen.add(id(s))
+                found.append(s)
+                stack.append(s)
+    return found
+
+
+def _csr(edges: list, count: int) -> tuple:
+    '''Internal helper function. Return (offsets, targets) arrays for [(source, target)].'''
+    edges.sort()
+    offsets = array('I', [0]) * (count + 1)
+    targets = array('I', (t for _, t in edges))
+    for s, _ in edges:
+        offsets[s + 1] += 1
+    for i in range(count):
+        offsets[i + 1] += offsets[i]
+    return offsets, targets
+
+
+class ClassIndex:
+    '''Class graph with direct bases and subclasses by qualified name.
+
+    Build one with from_classes() or from_dict(), not directly.
+    '''
+
+    def __init__(self, names: list, bases: tuple, subs: tuple, fingerprint: str = '') -> None:
+        self.names = names
+        self.fingerprint = fingerprint
+        self._ids = {n: i for i, n in enumerate(names)}
+        self._base_off, self._base_to = bases
+        self._sub_off, self._sub_to = subs
+
+    @classmethod
+    def from_classes(cls, classes: Iterable[type], fingerprint: str = '') -> 'ClassIndex':
+        '''Build the graph of the given classes (and their bases).'''
+        names = []
+        ids = {}
+
+        def number(c):
+            n = qualified_name(c)
+            i = ids.get(n)
+            if i is None:
+                i = ids[n] = len(names)
+                names.append(n)
+            return i
+
+        edges = set()
+        for c in classes:
+            try:
+                child = number(c)
+                for b in c.__bases__:
+                    edges.add((number(b), child))
+            except Exception:
+                continue
+        down = list(edges)
+        up = [(c, p) for p, c in edges]
+        return cls(names, _csr(up, len(names)), _csr(down, len(names)), fingerprint)
+
+    @classmethod
+    def from_live(cls) -> 'ClassIndex':
+        '''Build the graph of every class imported in this process.'''
+        return cls.from_classes(_all_classes())
+
+    def to_dict(self) -> dict:
+        '''Return plain data to pickle, see from_dict.'''
+        return {
+            'version': INDEX_VERSION,
+            'fingerprint': self.fingerprint,
+            'names': self.names,
+            'arrays': [a.tobytes() for a in (self._base_off, self._base_to, self._sub_off, self._sub_to)],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'ClassIndex':
+        arrays = []
+        for b in data['arrays']:
+            a = array('I')
+            a.frombytes(b)
+            arrays.append(a)
+        return cls(data['names'], tuple(arrays[:2]), tuple(arrays[2:]), data['fingerprint'])
+
+    # Queries------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._ids
+
+    def _slice(self, off, to, i) -> list:
+        return [self.names[j] for j in to[off[i]:off[i + 1]]]
+
+    def bases(self, name: str) -> list:
+        '''Return the direct bases of a class.'''
+        i = self._ids.get(name)
+        return [] if i is None else self._slice(self._base_off, self._base_to, i)
+
+    def subclasses(self, name: str) -> list:
+        '''Return the direct subclasses of a class.'''
+        i = self._ids.get(name)
+        return [] if i is None else self._slice(self._sub_off, self._sub_to, i)
+
+    def _walk(self, name, off, to, limit) -> list:
+        start = self._ids.get(name)
+        if start is None:
+            return []
+        seen = {start}
+        out = []
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            for j in to[off[i]:off[i + 1]]:
+                if j not in seen:
+                    seen.add(j)
+                    out.append(self.names[j])
+                    if limit is not None and len(out) >= limit:
+                        return out
+                    queue.append(j)
+        return out
+
+    def ancestors(self, name: str, limit: Union[int, None] = None) -> list:
+        '''Return every class a class inherits from, nearest first.'''
+        return self._walk(name, self._base_off, self._base_to, limit)
+
+    def descendants(self, name: str, limit: Union[int, None] = None) -> list:
+        '''Return every class inheriting from a class, nearest first.'''
+        return self._walk(name, self._sub_off, self._sub_to, limit)
+
+
+# Building---------------------------------------------------------------------
+
+def _modules_only(trace: str, kind: str) -> bool:
+    return kind == 'modules'
+
+
+def build_class_index(
+        packages: Iterable[str],
+        max_depth: int = 3,
+        max_seconds: float = BUILD_SECONDS,
+        ) -> ClassIndex:
+    '''Import packages and their submodules, then index every class alive.
+
+    Meant for a separate process, see the module docstring.
+    '''
+    import importlib
+    from .explore import walk_members
+
+    deadline = time.monotonic() + max_seconds
+    for name in packages:
+        if time.monotonic() > deadline:
+            logger.warning('Class index stopped importing at %s, out of time', name)
+            break
+        try:
+            mod = importlib.import_module(name)
+            # walking modules imports the inactive submodules on the way
+            for _ in walk_members(mod, name, max_depth=max_depth, filter=_modules_only):
+                if time.monotonic() > deadline:
+                    break
+        except BaseException:
+            # packages calling sys.exit on import are a thing
+            continue
+    return ClassIndex.from_classes(_all_classes(), environment_fingerprint())
+
+
+def _cache_key(fingerprint: str) -> tuple:
+    return ('class-index', INDEX_VERSION, fingerprint)
+
+
+class ClassIndexService:
+    '''Loads the class index from the environment cache, building it if needed.
+
+    Parameters
+    ----------
+    cache: object
+        Environment cache with get/set (see cache.get_env_cache).
+    directory: str
+        Its directory, for the builder process. None can't build.
+    retry: float
+        Seconds after a failed build before it's tried again.
+    timeout: float
+        Seconds the builder process may run before it's killed and the
+        build counts as failed.
+    '''
+
+    def __init__(
+        self,
+        cache: Any,
+        directory: Union[str, None],
+        retry: float = RETRY_SECONDS,
+        timeout: float = BUILD_SECONDS + BUILD_MARGIN,
+    ) -> None:
+        self.cache = cache
+        self.directory = directory
+        self.retry = retry
+        self.timeout = timeout
+        self.error = None
+        self._failed_at = None
+        self._index = None
+        self._fingerprint = None
+        self._thread = None
+        self._lock = threading.Lock()
+        # (generation, ClassIndex) of the classes imported here, see live()
+        self._live = None
+
+    def _key(self) -> tuple:
+        if self._fingerprint is None:
+            self._fingerprint = environment_fingerprint()
+        return _cache_key(self._fingerprint)
+
+    def get(self) -> Union[ClassIndex, None]:
+        '''Return the index if it's been built.'''
+        if self._index is None:
+            data = self.cache.get(self._key())
+            if data is not None:
+                self._index = ClassIndex.from_dict(data)
+        return self._index
+
+    @property
+    def building(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        '''Build the index in the background unless it's cached or building.
+
+        After a failed build, only once retry seconds have passed or after
+        reset().
+        '''
+        with self._lock:
+            if self.building or self.directory is None:
+                return
+            if self._failed_at is not None and time.monotonic() - self._failed_at < self.retry:
+                return
+            self._failed_at = None
+            self._thread = threading.Thread(
+                target=self._build, name='px-class-index', daemon=True,
+            )
+            self._thread.start()
+
+    def reset(self) -> None:
+        '''Forget the index after the environment changed.
+
+        The next get() looks for the index of the new environment, which
+        start() builds like the first time.
+        '''
+        with self._lock:
+            self._index = None
+            self._fingerprint = None
+            self.error = None
+            self._failed_at = None
+            self._live = None
+
+    def live(self, generation: Any) -> ClassIndex:
+        '''Return the graph of the classes imported in this process.
+
+        Kept until generation (anything that changes with the imports)
+        changes.
+        '''
+        live = self._live
+        if live is None or live[0] != generation:
+            live = self._live = (generation, ClassIndex.from_live())
+        return live[1]
+
+    def _build(self) -> None:
+        try:
+            if self.get() is not None:
+                return
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, '-m', 'python_explorer.utils.classindex', self.directory],
+                stdin=subprocess.DEVNULL,
+                capture_output=True,
+                text=True,
+                timeout=self.timeout,
+            )
+            if proc.returncode != 0:
+                self._failed((proc.stderr.strip().splitlines() or ['failed'])[-1])
+                return
+            logger.info('Class index built in %.1fs', time.perf_counter() - start)
+            self.get()
+        except subprocess.TimeoutExpired:
+            self._failed(f'builder took over {self.timeout:.0f}s and was stopped')
+        except Exception as e:
+            self._failed(f'{type(e).__name__}: {e}')
+
+    def _failed(self, error: str) -> None:
+        self.error = error
+        self._failed_at = time.monotonic()
+        logger.warning('Class index build failed, retrying in %.0fs: %s', self.retry, error)
+
+
+def _main(argv: list) -> int:
+    from .cache import SharedCache
+    from .envdata import env_std_modules, env_site_packages
+
+    cache = SharedCache(argv[0], max_bytes=256 * 2**20)
+    packages = [
+        info['import_name'] for info in
+        list(env_std_modules.values()) + list(env_site_packages.values())
+        if info['import_name']
+    ]
+    # packages print, warn and even start prompts while importing, keep
+    # that out of the way
+    warnings.simplefilter('ignore')
+    sys.stdout = open(os.devnull, 'w')
+    index = build_class_index(packages)
+    cache.set(_cache_key(index.fingerprint), index.to_dict())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,149 @@
+'''Response compression, ETags and cache headers for the Flask server.
+
+Waitress sends whatever Flask hands it, so without this every member store
+and component tree goes over the wire as plain JSON. After each request:
+
+* compressible responses (JSON, javascript, css, text...) over min_size bytes
+  are compressed with brotli when the client takes it and the brotli package
+  is installed, otherwise gzip.
+* GET responses get a strong ETag (the one Flask already set for static
+  files, or a hash of the body) with the encoding appended, and a matching
+  If-None-Match is answered with 304 Not Modified.
+* assets and Dash component bundles are fingerprinted by Dash (?m=<mtime> or
+  a version in the file name), so they are cached by browsers for a year.
+
+Compressed GET bodies are cached by ETag, so the big static bundles are only
+compressed once per process.
+'''
+
+__all__ = [
+    'install_compression',
+]
+
+import gzip
+import hashlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from .cache import LocalCache
+
+COMPRESSIBLE = (
+    'text/',
+    'application/json',
+    'application/javascript',
+    'application/x-javascript',
+    'image/svg+xml',
+    'image/vnd.microsoft.icon',
+    'image/x-icon',
+)
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _choose_encoding(accept: str) -> str:
+    '''Internal helper function. Return 'br', 'gzip' or '' for Accept-Encoding.'''
+    offered = {}
+    for part in accept.split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip().lower()] = q
+    if brotli is not None and offered.get('br', 0) > 0:
+        return 'br'
+    if offered.get('gzip', 0) > 0:
+        return 'gzip'
+    return ''
+
+
+def _compress(data: bytes, encoding: str, level: int) -> bytes:
+    if encoding == 'br':
+        # brotli quality runs 0-11, gzip levels 1-9
+        return brotli.compress(data, quality=min(11, level + 2))
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _fingerprinted(request) -> bool:
+    '''Internal helper function. True for urls that change with their content.'''
+    if request.path.startswith('/_dash-component-suites/'):
+        return True
+    return request.path.startswith('/assets/') and 'm' in request.args
+
+
+def install_compression(server, min_size: int = 500, level: int = 6) -> None:
+    '''Add compression, ETags and cache headers to a Flask server.
+
+    Parameters
+    ----------
+    server: flask.Flask
+        The server, usually app.server.
+    min_size: int
+        Responses smaller than this many bytes are sent as they are.
+    level: int
+        gzip compression level (1-9). Brotli uses the equivalent quality.
+    '''
+    from flask import request
+
+    # etag -> compressed body
+    compressed = LocalCache(max_entries=256)
+
+    @server.after_request
+    def _compress_response(response):
+        if response.status_code != 200 or 'Content-Encoding' in response.headers:
+            return response
+
+        is_get = request.method in ('GET', 'HEAD')
+        if is_get and _fingerprinted(request):
+            response.headers['Cache-Control'] = IMMUTABLE
+        elif is_get and 'Cache-Control' not in response.headers:
+            # fine to keep, but check the ETag first
+            response.headers['Cache-Control'] = 'no-cache'
+
+        mimetype = response.mimetype or ''
+        compressible = mimetype.startswith(COMPRESSIBLE)
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        if not is_get and not compressible:
+            return response
+
+        # static files are passed through as file wrappers, read them in
+        response.direct_passthrough = False
+        data = response.get_data()
+        encoding = ''
+        if compressible and len(data) >= min_size:
+            encoding = _choose_encoding(request.headers.get('Accept-Encoding', ''))
+
+        if is_get:
+            etag, _ = response.get_etag()
+            if etag is None:
+                etag = hashlib.sha1(data).hexdigest()
+            if encoding:
+                etag = f'{etag}-{encoding}'
+            response.set_etag(etag)
+            if etag in request.if_none_match:
+                response.status_code = 304
+                response.set_data(b'')
+                response.headers.pop('Content-Length', None)
+                return response
+
+        if not encoding:
+            return response
+
+        if is_get:
+            body = compressed.get(etag)
+            if body is None:
+                body = _compress(data, encoding, level)
+                compressed.set(etag, body)
+        else:
+            body = _compress(data, encoding, level)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
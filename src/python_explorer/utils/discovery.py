@@ -0,0 +1,228 @@
+'''Cached submodule discovery.
+
+pkgutil.iter_modules lists a package directory from disk every time it's
+called, and getmembers_categorized calls it for every package it looks at.
+On network mounted site-packages that's a lot of round trips for listings
+that hardly ever change. Here listings are kept per __path__ entry:
+
+* directories are read with os.scandir and kept until their mtime changes,
+  so a repeat lookup is one stat per directory instead of a listing.
+* zip archives (zipimport) are read once and kept until the archive's mtime
+  changes.
+* namespace packages just have several __path__ entries, each cached on
+  its own.
+* anything else (custom importers) goes through pkgutil as before.
+
+Names found are what pkgutil.iter_modules would give: modules by file
+suffix, and subdirectories that hold an __init__ module.
+
+discover_tree reads a whole package tree in one pass, for the background
+walks that are about to look at every subpackage anyway.
+'''
+
+__all__ = [
+    'submodule_names',
+    'discover_tree',
+    'forget_listings',
+]
+
+import os
+import pkgutil
+import threading
+import zipfile
+from importlib.machinery import all_suffixes
+from typing import Iterable, Union
+
+# longest first, so .cpython-311-x86_64-linux-gnu.so wins over .so
+_SUFFIXES = sorted(all_suffixes(), key=len, reverse=True)
+
+_lock = threading.Lock()
+# directory -> (mtime_ns, module names, subdirectory names, has __init__)
+_dirs = {}
+# archive -> (mtime_ns, namelist)
+_zips = {}
+
+hits = 0
+scans = 0
+
+
+def _module_name(filename: str) -> Union[str, None]:
+    '''Internal helper function. Return the module name of a file, like inspect.getmodulename.'''
+    for suffix in _SUFFIXES:
+        if filename.endswith(suffix):
+            return filename[:-len(suffix)]
+    return None
+
+
+def _scan(directory: str, mtime: int) -> tuple:
+    '''Internal helper function. Read a directory and cache what's in it.'''
+    global scans
+    modules = set()
+    subdirs = []
+    has_init = False
+    with os.scandir(directory) as it:
+        for entry in it:
+            name = entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                continue
+            if is_dir:
+                if '.' not in name:
+                    subdirs.append(name)
+                continue
+            modname = _module_name(name)
+            if not modname:
+                continue
+            if modname == '__init__':
+                has_init = True
+            elif '.' not in modname:
+                modules.add(modname)
+    listing = (mtime, frozenset(modules), tuple(subdirs), has_init)
+    with _lock:
+        _dirs[directory] = listing
+        scans += 1
+    return listing
+
+
+def _listing(directory: str) -> Union[tuple, None]:
+    '''Internal helper function. Return the cached listing of a directory if still current.'''
+    global hits
+    try:
+        mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+    listing = _dirs.get(directory)
+    if listing is not None and listing[0] == mtime:
+        hits += 1
+        return listing
+    try:
+        return _scan(directory, mtime)
+    except OSError:
+        return None
+
+
+def _dir_submodules(directory: str) -> set:
+    listing = _listing(directory)
+    if listing is None:
+        return set()
+    names = set(listing[1])
+    for sub in listing[2]:
+        if sub in names:
+            continue
+        sublisting = _listing(os.path.join(directory, sub))
+        if sublisting is not None and sublisting[3]:
+            names.add(sub)
+    return names
+
+
+def _zip_submodules(entry: str) -> Union[set, None]:
+    '''Internal helper function.
+
+    Submodules of a path entry inside a zip archive, None if it isn't one.
+    '''
+    archive, prefix = entry, ''
+    while archive and not os.path.isfile(archive):
+        archive, tail = os.path.split(archive)
+        if not tail:
+            return None
+        prefix = f'{tail}/{prefix}'
+    if not archive or not zipfile.is_zipfile(archive):
+        return None
+
+    mtime = os.stat(archive).st_mtime_ns
+    cached = _zips.get(archive)
+    if cached is None or cached[0] != mtime:
+        with zipfile.ZipFile(archive) as zf:
+            cached = (mtime, tuple(zf.namelist()))
+        with _lock:
+            _zips[archive] = cached
+
+    names = set()
+    for path in cached[1]:
+        if not path.startswith(prefix):
+            continue
+        parts = path[len(prefix):].split('/')
+        if len(parts) == 1:
+            modname = _module_name(parts[0])
+            if modname and modname != '__init__' and '.' not in modname:
+                names.add(modname)
+        elif len(parts) == 2 and '.' not in parts[0] and _module_name(parts[1]) == '__init__':
+            names.add(parts[0])
+    return names
+
+
+def submodule_names(path: Iterable[str]) -> set:
+    '''Return the names of submodules found on a package's __path__.
+
+    Same names as pkgutil.iter_modules(path), from cached listings where
+    possible.
+    '''
+    names = set()
+    for entry in list(path):
+        if not isinstance(entry, str):
+            continue
+        if os.path.isdir(entry):
+            names.update(_dir_submodules(entry))
+            continue
+        try:
+            found = _zip_submodules(entry)
+        except (OSError, zipfile.BadZipFile):
+            found = None
+        if found is None:
+            found = {m.name for m in pkgutil.iter_modules([entry])}
+        names.update(found)
+    return names
+
+
+def discover_tree(path: Iterable[str], max_dirs: int = 10000) -> int:
+    '''Read every directory under a package's __path__ into the cache.
+
+    One os.scandir per directory, breadth first, skipping __pycache__ and
+    anything that isn't a package directory.
+
+    Returns
+    -------
+    count: int
+        Number of directories read.
+    '''
+    pending = [e for e in list(path) if isinstance(e, str) and os.path.isdir(e)]
+    count = 0
+    while pending and count < max_dirs:
+        directory = pending.pop(0)
+        listing = _listing(directory)
+        if listing is None:
+            continue
+        count += 1
+        pending.extend(
+            os.path.join(directory, sub) for sub in listing[2]
+            if sub != '__pycache__' and sub.isidentifier()
+        )
+    return count
+
+
+def forget_listings(prefix: Union[str, None] = None) -> None:
+    '''Drop cached listings under a directory, or all of them.'''
+    with _lock:
+        if prefix is None:
+            _dirs.clear()
+            _zips.clear()
+            return
+        prefix = os.path.join(prefix, '')
+        for d in [d for d in _dirs if d == prefix[:-1] or d.startswith(prefix)]:
+            del _dirs[d]
+        for z in [z for z in _zips if z.startswith(prefix) or z == prefix[:-1]]:
+            del _zips[z]
+
+
+def metrics() -> list:
+    '''Return exposition lines for /metrics.'''
+    return [
+        '# HELP python_explorer_discovery_total Package directory lookups by result.',
+        '# TYPE python_explorer_discovery_total counter',
+        f'python_explorer_discovery_total{{result="hit"}} {hits}',
+        f'python_explorer_discovery_total{{result="scan"}} {scans}',
+        '# HELP python_explorer_discovery_directories Package directory listings held in memory.',
+        '# TYPE python_explorer_discovery_directories gauge',
+        f'python_explorer_discovery_directories {len(_dirs)}',
+    ]
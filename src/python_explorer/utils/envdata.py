@@ -2,9 +2,14 @@
 
 import sys
 import re
-from typing import Union, Any
+import importlib
+import threading
+from typing import Union, Any, Iterable
 from importlib.metadata import Distribution, packages_distributions
 
+from .explore import AttributeDict
+from .settings import settings
+
 # Standard Modules-------------------------------------------------------------
 
 std_modules_exclude = [
@@ -19,16 +24,19 @@ std_modules_exclude = [
     'smtpd',
 ]
 
-std_unavailable = []
-std_valid = []
 
-for m in sys.stdlib_module_names:
-    if m not in std_modules_exclude and not m.startswith('_'):
-        try:
-            exec(f'import {m}')
-            std_valid.append(m)
-        except:
-            std_unavailable.append(m)
+def check_std_modules()-> tuple[list, list]:
+    '''Return (valid, unavailable) lists of importable standard modules.'''
+    std_valid = []
+    std_unavailable = []
+    for m in sys.stdlib_module_names:
+        if m not in std_modules_exclude and not m.startswith('_'):
+            try:
+                exec(f'import {m}')
+                std_valid.append(m)
+            except:
+                std_unavailable.append(m)
+    return std_valid, std_unavailable
 
 
 PYVERSION = f'{sys.version_info.major}.{sys.version_info.minor}'
@@ -38,7 +46,7 @@ def get_std_modules(valid_list: list)-> dict:
     pkgs = {}
     for m in valid_list:
         try:
-            summary = eval(f'{m}.__doc__.splitlines()[0]')
+            summary = sys.modules[m].__doc__.splitlines()[0]
         except:
             summary = ''
         
@@ -50,9 +58,6 @@ def get_std_modules(valid_list: list)-> dict:
     
     return pkgs
 
-env_std_modules = get_std_modules(std_valid)
-env_std_wrong_os = std_unavailable
-
 
 # Site-Packages----------------------------------------------------------------
 
@@ -185,6 +190,19 @@ def _find_website(metadata):
             return ''
 
 
+def _site_package_info(dist: Distribution, pkg_tops: dict)-> dict:
+    '''Internal helper function. Return the package info of a distribution.'''
+    meta = dist.metadata
+    return {
+        'import_name':_get_import_name(dist, pkg_tops),
+        'version':meta['Version'], # required, so always returns
+        'summary':meta['Summary'], # returns none if no entry
+        'homepage':_find_website(meta),
+        'description_content_type':_parse_content_type(meta['Description-Content-Type']),
+        'description':meta['Description'],
+    }
+
+
 def get_site_packages()-> dict:
     pkgs = {}
     pkg_tops = packages_distributions_reverse()
@@ -193,21 +211,9 @@ def get_site_packages()-> dict:
         if dist.name in pkgs_exclude:
             pass
         else:
-            meta = dist.metadata
-
-        
-            pkgs[meta['Name']] = {
-                'import_name':_get_import_name(dist, pkg_tops),
-                'version':meta['Version'], # required, so always returns
-                'summary':meta['Summary'], # returns none if no entry
-                'homepage':_find_website(meta),
-                'description_content_type':_parse_content_type(meta['Description-Content-Type']),
-                'description':meta['Description'],
-            }
+            pkgs[dist.metadata['Name']] = _site_package_info(dist, pkg_tops)
     return pkgs
 
-env_site_packages = get_site_packages()
-
 
 def list_all_packages(standards: dict, site: dict)-> list:
     
@@ -226,4 +232,157 @@ def list_all_packages(standards: dict, site: dict)-> list:
 
     return all_packages
 
-all_packages = list_all_packages(env_std_modules, env_site_packages)
\ No newline at end of file
+
+# Environment------------------------------------------------------------------
+
+# When serving from a catalog, the environment was captured somewhere else and
+# nothing here gets imported. Same for another interpreter, which reports its
+# own environment through the agent.
+if settings.catalog:
+    from .catalog import open_catalog
+
+    env_std_modules, env_site_packages, env_std_wrong_os = (
+        open_catalog(settings.catalog).envdata()
+    )
+elif settings.python:
+    from .agent import get_agent
+
+    env_std_modules, env_site_packages, env_std_wrong_os = (
+        get_agent(settings.python).envdata()
+    )
+else:
+    std_valid, std_unavailable = check_std_modules()
+
+    env_std_modules = get_std_modules(std_valid)
+    env_std_wrong_os = std_unavailable
+    env_site_packages = get_site_packages()
+
+all_packages = list_all_packages(env_std_modules, env_site_packages)
+
+
+# Refreshing-------------------------------------------------------------------
+
+def _dist_tops(dist: Distribution)-> dict:
+    '''Internal helper function.
+
+    packages_distributions_reverse() for a single distribution, without
+    scanning all the others.
+    '''
+    tops = (dist.read_text('top_level.txt') or '').split()
+    if not tops:
+        tops = [
+            f.parts[0] if len(f.parts) > 1 else f.with_suffix('').name
+            for f in dist.files or [] if f.suffix == '.py'
+        ]
+    if not tops:
+        return {}
+    return {dist.name: list({t for t in tops if not t.startswith('_')})}
+
+
+_refresh_lock = threading.Lock()
+
+def refresh_site_packages(names: Iterable[str])-> AttributeDict:
+    '''Look distributions up again after they were installed, upgraded or removed.
+
+    env_site_packages and all_packages are updated in place, so every module
+    that imported them sees the change.
+
+    Parameters
+    ----------
+    names: Iterable[str]
+        Distribution names, in any spelling (they're normalized).
+
+    Returns
+    -------
+    changes: AttributeDict
+        * 'added', 'removed', 'changed': package names
+        * 'imports': import names, before and after, whose cached data is
+          stale now
+    '''
+    # the import system keeps directory listings too
+    importlib.invalidate_caches()
+    wanted = {normalize_name(n) for n in names}
+    changes = AttributeDict({'added': [], 'removed': [], 'changed': [], 'imports': set()})
+
+    with _refresh_lock:
+        old = {k: v for k, v in env_site_packages.items() if normalize_name(k) in wanted}
+        new = {}
+        for n in wanted:
+            # the first one found is the one that gets imported
+            for dist in Distribution.discover(name=n):
+                if dist.name not in pkgs_exclude:
+                    new[dist.metadata['Name']] = _site_package_info(dist, _dist_tops(dist))
+                break
+
+        for k in old.keys() - new.keys():
+            del env_site_packages[k]
+            changes.removed.append(k)
+        for k, info in new.items():
+            if k not in old:
+                changes.added.append(k)
+            elif info != old[k]:
+                changes.changed.append(k)
+            env_site_packages[k] = info
+
+        for k in changes.added + changes.removed + changes.changed:
+            for info in (old.get(k), new.get(k)):
+                if info and info['import_name']:
+                    changes.imports.add(info['import_name'])
+
+        all_packages[:] = list_all_packages(env_std_modules, env_site_packages)
+        _package_index.clear()
+
+    return changes
+
+
+# Package Search---------------------------------------------------------------
+
+# group -> [(name, lowered name, lowered summary)], built on first search
+_package_index = {}
+
+def _get_package_index(group: str)-> list:
+    '''Internal helper function. Return the search index for a group.'''
+    index = _package_index.get(group)
+    if index is None:
+        info = env_std_modules if group == 'standard' else env_site_packages
+        index = _package_index[group] = [
+            (p, p.lower(), (info[p]['summary'] or '').lower())
+            for g, p in all_packages if g == group
+        ]
+    return index
+
+
+def search_packages(group: str, query: str = '')-> list:
+    '''Return package names of a group matching query, best matches first.
+
+    Names equal to the query come first, then names starting with it, then
+    names containing it and last packages that only mention it in their
+    summary. Ties stay in alphabetical order.
+
+    Parameters
+    ----------
+    group: str
+        'standard' or 'site'
+    query: str
+        Case insensitive search text. Empty returns the whole group.
+    '''
+    index = _get_package_index(group)
+    q = (query or '').strip().lower()
+    if not q:
+        return [p[0] for p in index]
+
+    ranked = []
+    for name, lname, lsummary in index:
+        if lname == q:
+            rank = 0
+        elif lname.startswith(q):
+            rank = 1
+        elif q in lname:
+            rank = 2
+        elif q in lsummary:
+            rank = 3
+        else:
+            continue
+        ranked.append((rank, name))
+    ranked.sort(key=lambda r: r[0]) # stable, so alphabetical within a rank
+    return [r[1] for r in ranked]
@@ -27,11 +27,21 @@ __all__ = [
 
 __author__ = ('Seth M. Nelson <github.com/nelsonseth>')
 
+import importlib
 import inspect
-import pkgutil
+import queue
 import sys
+import threading
+import time
+import types
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from html import escape
 # from warnings import warn
-from typing import Union, Any
+from typing import Union, Any, Callable, Iterator
+
+from .discovery import submodule_names
 
 #------------------------------------------------------------------------------
 
@@ -70,6 +80,115 @@ def _get_ignored_listing():
 _ignored_listing = _get_ignored_listing()
 
 
+# Time budgets-----------------------------------------------------------------
+
+# getmembers_categorized calls attribute code of arbitrary objects, which can
+# take forever. A thread can be given a deadline (see watchdog.py), past which
+# the remaining members are listed under others without looking at them and
+# the listing is marked partial.
+_budget = threading.local()
+
+@contextmanager
+def time_budget(seconds: Union[float, None]):
+    '''Give getmembers_categorized calls on this thread a deadline.
+
+    Yields an AttributeDict whose 'partial' is True once a listing ran out
+    of time.
+    '''
+    outer = getattr(_budget, 'state', None)
+    state = AttributeDict(
+        {
+            'deadline': None if seconds is None else time.monotonic() + seconds,
+            'partial': False,
+            # seconds the clock was stopped, and since when if it is now
+            'paused': 0.0,
+            'paused_since': None,
+        }
+    )
+    _budget.state = state
+    try:
+        yield state
+    finally:
+        _budget.state = outer
+
+
+def budget_state() -> Union[AttributeDict, None]:
+    '''Return the time budget of this thread, if it has one.'''
+    return getattr(_budget, 'state', None)
+
+
+@contextmanager
+def budget_paused():
+    '''Stop the clock of this thread's time budget for the block.
+
+    For waiting on other work (like a slot for expensive jobs), which
+    shouldn't count against the budget.
+    '''
+    state = budget_state()
+    if state is None:
+        yield
+        return
+    start = time.monotonic()
+    state.paused_since = start
+    try:
+        yield
+    finally:
+        waited = time.monotonic() - start
+        state.paused += waited
+        state.paused_since = None
+        if state.deadline is not None:
+            state.deadline += waited
+
+
+def _out_of_time() -> bool:
+    '''Internal helper function. Check this thread's deadline, marking it partial.'''
+    state = budget_state()
+    if state is None or state.deadline is None:
+        return False
+    if time.monotonic() > state.deadline:
+        state.partial = True
+        return True
+    return False
+
+
+def _member_names(obj: Any) -> list:
+    '''Internal helper function.
+
+    Return the names inspect.getmembers(obj) would, without keeping their
+    values. Past this thread's deadline the remaining names of dir(obj) are
+    taken as they are.
+    '''
+    names = dir(obj)
+    if inspect.isclass(obj):
+        mro = (obj,) + inspect.getmro(obj)
+        # DynamicClassAttributes (enum's name and value) only show up this way
+        try:
+            for base in obj.__bases__:
+                for k, v in base.__dict__.items():
+                    if isinstance(v, types.DynamicClassAttribute):
+                        names.append(k)
+        except AttributeError:
+            pass
+    else:
+        mro = ()
+
+    found = set()
+    for key in names:
+        if key in found or key in _ignored_listing or key.startswith('__'):
+            continue
+        if _out_of_time():
+            found.add(key)
+            continue
+        try:
+            getattr(obj, key)
+        except AttributeError:
+            # descriptors that don't like __get__, like inspect.getmembers
+            if not any(key in base.__dict__ for base in mro):
+                continue
+        found.add(key)
+    return list(found)
+
+
 def getmembers_categorized(obj: Any)-> tuple[dict, set]:
     '''Return categorized members of a given object.
     
@@ -96,17 +215,13 @@ def getmembers_categorized(obj: Any)-> tuple[dict, set]:
 
     # Ignores dunders but includes private members
     # Displaying private members or not in the interface will be a user option.
-    members = set([
-        m[0] for m in inspect.getmembers(obj) 
-        if m[0] not in _ignored_listing
-        and not m[0].startswith('__')
-    ])
+    members = set(_member_names(obj))
 
     try:
         inactive_mods = set([
-            p.name for p in pkgutil.iter_modules(obj.__path__)
-            if p.name not in _ignored_listing
-            and not p.name.startswith('__')
+            name for name in submodule_names(obj.__path__)
+            if name not in _ignored_listing
+            and not name.startswith('__')
         ])
         # mod_diff is a list of still inactive sub-modules. 
         # Return for use ref use later.
@@ -123,7 +238,12 @@ def getmembers_categorized(obj: Any)-> tuple[dict, set]:
     others = []
 
     for name in members:
-         
+
+        # past the deadline, the rest goes uncategorized
+        if _out_of_time():
+            others.append(name)
+            continue
+
         # eval string built from obj.itemname
         itemstr = f'{objstr}.{name}'
 
@@ -203,29 +323,74 @@ def _flat_members(members: dict) -> list:
     return flat
 
 
-def _sig_format(sig_str: str) -> str:
+def _sig_format(sig: inspect.Signature) -> str:
     '''
     Internal helper function.
     
-    Formats string output from inspect.signature.__str__
+    Formats an inspect.Signature as html, one parameter per line.
     '''
+    params = list(sig.parameters.values())
+    # methods looked up on the class still list self, which isn't helpful
+    if params and params[0].name == 'self':
+        params.pop(0)
+
+    # same markers inspect puts in, for positional-only and keyword-only
+    lines = []
+    kind = inspect.Parameter
+    for i, p in enumerate(params):
+        if (p.kind == kind.KEYWORD_ONLY
+                and (i == 0 or params[i-1].kind not in (kind.KEYWORD_ONLY, kind.VAR_POSITIONAL))):
+            lines.append('*')
+        lines.append(str(p))
+        if (p.kind == kind.POSITIONAL_ONLY
+                and (i == len(params) - 1 or params[i+1].kind != kind.POSITIONAL_ONLY)):
+            lines.append('/')
+
+    if lines:
+        body = '(\n' + ',\n'.join(f'    {escape(l, quote=False)}' for l in lines) + '\n)'
+    else:
+        body = '()'
+
+    if sig.return_annotation is not inspect.Signature.empty:
+        body += f' -&gt; {escape(inspect.formatannotation(sig.return_annotation), quote=False)}'
+
+    return f'<pre class="signature"><code>{body}</code></pre>'
+
+
+# id(callable) -> (weakref to it, formatted signature). Keyed by identity
+# since explored objects can have any __eq__/__hash__. Entries go away with
+# their objects, so a reloaded module gets fresh signatures. Single dict
+# operations are atomic, which is all this needs between threads.
+_signatures = {}
+
+def _forget_signature(key: int, ref: weakref.ref) -> None:
+    entry = _signatures.get(key)
+    if entry is not None and entry[0] is ref:
+        _signatures.pop(key, None)
+
+
+def _get_signature(obj) -> Union[str, None]:
+    '''Internal helper function.
 
-    # this split by ',' also splits a parameter's listing of options, if there
-    # are any, resulting in a weird output. TODO for later.
-    sig_split = sig_str.split(',')
-    
-    if 'self' in sig_split[0]:
-        if len(sig_split) > 1:
-            sig_split.pop(0)
-            sig_split[0] = ''.join(['(', sig_split[0][1:]])
-        else:
-            sig_split[0] = sig_split[0].replace('self:', '')
+    Return the formatted signature of obj, or None if it doesn't have one.
+    '''
+    key = id(obj)
+    entry = _signatures.get(key)
+    if entry is not None and entry[0]() is obj:
+        return entry[1]
 
-    # NOTE: two whitespaces required before \n for markdown to properly parse
-    # new line.        
-    sig_pretty = ''.join([s+',  \n' for s in sig_split])
-    
-    return sig_pretty[0:-2]
+    try:
+        sig = _sig_format(inspect.signature(obj))
+    except:
+        sig = None
+
+    try:
+        ref = weakref.ref(obj, lambda r, key=key: _forget_signature(key, r))
+    except TypeError:
+        # builtins and such can't be weakly referenced, just don't cache
+        return sig
+    _signatures[key] = (ref, sig)
+    return sig
 
 
 def _build_class_heritage(cls, nodes=None, heritage=None):
@@ -269,6 +434,172 @@ def _build_class_heritage(cls, nodes=None, heritage=None):
     return nodes, heritage
 
 
+# Walking----------------------------------------------------------------------
+
+_CATEGORIES = ('modules', 'classes', 'functions', 'properties', 'others')
+
+
+def _package_of(obj: Any) -> str:
+    '''Internal helper function. Return the top level package obj belongs to.'''
+    if inspect.ismodule(obj):
+        name = getattr(obj, '__name__', '')
+    else:
+        name = getattr(obj, '__module__', None) or ''
+    return name.partition('.')[0]
+
+
+def _qualified_name(obj: Any) -> str:
+    '''Internal helper function. Return module name or module.qualname.'''
+    if inspect.ismodule(obj):
+        return obj.__name__
+    return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', '')}"
+
+
+class _Walker:
+    '''Internal helper class. Shared state of one walk (see Explore.walk).'''
+
+    def __init__(self, getmembers, max_depth, filter, include_private, package):
+        self.getmembers = getmembers
+        self.max_depth = max_depth
+        self.filter = filter
+        self.include_private = include_private
+        self.package = package
+        self.stop = threading.Event()
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def claim(self, obj) -> bool:
+        '''First caller for an object gets True, everyone after gets False.'''
+        with self._lock:
+            if id(obj) in self._seen:
+                return False
+            self._seen.add(id(obj))
+            return True
+
+    def children(self, obj, trace, depth, mems, inactive):
+        '''Yield (record, child, child members, child inactive) for obj.
+
+        child is only set for modules and classes that should be walked.
+        '''
+        for kind in _CATEGORIES:
+            for name in mems[kind]:
+                if self.stop.is_set():
+                    return
+                if not self.include_private and name.startswith('_'):
+                    continue
+                child_trace = f'{trace}.{name}'
+                if self.filter is not None and not self.filter(child_trace, kind):
+                    continue
+
+                try:
+                    if name in inactive:
+                        child = importlib.import_module(child_trace)
+                    else:
+                        child = getattr(obj, name)
+                except Exception:
+                    yield child_trace, kind, AttributeDict(
+                        {'depth': depth + 1, 'type': None, 'error': 'unavailable'}
+                    ), None, None, None
+                    continue
+
+                meta = AttributeDict({'depth': depth + 1, 'type': type(child).__name__})
+                walk = None
+                if kind in ('modules', 'classes'):
+                    meta.name = _qualified_name(child)
+                    owned = self.package is None or _package_of(child) == self.package
+                    if not owned:
+                        meta.external = True
+                    elif not self.claim(child):
+                        # already walked via another path
+                        meta.seen = True
+                    else:
+                        try:
+                            cm, ci = self.getmembers(child)
+                        except Exception:
+                            meta.error = 'members'
+                        else:
+                            meta.counts = _getmember_counts(cm)
+                            if self.max_depth is None or depth + 1 < self.max_depth:
+                                walk = (child, cm, ci)
+                            else:
+                                meta.truncated = True
+                if walk is None:
+                    yield child_trace, kind, meta, None, None, None
+                else:
+                    yield (child_trace, kind, meta, *walk)
+
+    def expand(self, obj, trace, depth, mems, inactive):
+        '''Yield records for everything below obj, depth first.'''
+        for trace_, kind, meta, child, cm, ci in self.children(obj, trace, depth, mems, inactive):
+            yield trace_, kind, meta
+            if child is not None:
+                yield from self.expand(child, trace_, depth + 1, cm, ci)
+
+    def drain(self, records, out) -> None:
+        '''Put records on a queue for the consuming thread, then a None.'''
+        try:
+            for r in records:
+                out.put(r)
+        finally:
+            out.put(None)
+
+
+def walk_members(obj: Any,
+                 trace: str,
+                 max_depth: Union[int, None] = None,
+                 filter: Union[Callable[[str, str], bool], None] = None,
+                 include_private: bool = False,
+                 external: bool = False,
+                 workers: int = 1,
+                 members: Union[Callable, None] = None,
+                 ) -> Iterator[tuple]:
+    '''Walk everything below obj. See Explore.walk, which is the usual way in.
+
+    members replaces getmembers_categorized (e.g. MemberMemo.get).
+    '''
+    walker = _Walker(
+        members or getmembers_categorized,
+        max_depth,
+        filter,
+        include_private,
+        None if external else _package_of(obj),
+    )
+    walker.claim(obj)
+    try:
+        mems, inactive = walker.getmembers(obj)
+    except Exception:
+        return
+    if max_depth is not None and max_depth < 1:
+        return
+
+    if workers <= 1:
+        yield from walker.expand(obj, trace, 0, mems, inactive)
+        return
+
+    # top level members come from here, everything below each top level
+    # module or class is walked by the pool and streamed back in whatever
+    # order it finishes
+    out = queue.Queue()
+    pool = ThreadPoolExecutor(workers, thread_name_prefix='px-walk')
+    pending = 0
+    try:
+        for trace_, kind, meta, child, cm, ci in walker.children(obj, trace, 0, mems, inactive):
+            yield trace_, kind, meta
+            if child is not None:
+                pool.submit(walker.drain, walker.expand(child, trace_, 1, cm, ci), out)
+                pending += 1
+        while pending:
+            record = out.get()
+            if record is None:
+                pending -= 1
+            else:
+                yield record
+    finally:
+        # consumer may have stopped early, let the workers wind down
+        walker.stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 #------------------------------------------------------------------------------
 
 
@@ -282,6 +613,15 @@ class Explore():
         The object you want to explore. Typically a module or package.
     '''
 
+    # Optional memo of member listings, shared by all instances. Anything
+    # with a get(obj) method returning what getmembers_categorized does works
+    # (see memo.py).
+    member_memo = None
+
+    # Optional time limit on member listings, anything with a
+    # run(op, key, func) method like watchdog.Watchdog works.
+    watchdog = None
+
     def __init__(self, obj) -> None:
 
         self._root = obj
@@ -298,6 +638,9 @@ class Explore():
         # error tracking (kind, msg)
         self._error = AttributeDict({'kind':'', 'msg':''})
 
+        # whether the current member listing ran out of time
+        self._partial = False
+
         # grab intial member set of inputed object.
         self._updatemembers()
 
@@ -337,8 +680,23 @@ class Explore():
         
         # some objects fail to retrieve any members. This could be because the
         # code is faulty or the module is deprecated or other reasons.
+        def fetch():
+            if self.member_memo is None:
+                return getmembers_categorized(eval(obj_str))
+            # inactive set comes back as a copy, _checkmember changes it
+            return self.member_memo.get(eval(obj_str))
+
         try:
-            self._members, self._inactive_mods = getmembers_categorized(eval(obj_str))
+            if self.watchdog is None:
+                self._members, self._inactive_mods = fetch()
+                self._partial = False
+            else:
+                listing, self._partial = self.watchdog.run('members', self._trace, fetch)
+                if listing is None:
+                    raise TimeoutError(
+                        f"Member retrieval took too long for '{self._trace}', skipped for a while."
+                    )
+                self._members, self._inactive_mods = listing
             self._membercounts = _getmember_counts(self._members)
             self._flatmembers = _flat_members(self._members)
         
@@ -356,6 +714,21 @@ class Explore():
 
             return True
 
+        except TimeoutError as e:
+
+            # nowhere to go back to
+            if len(self._refhistory) == 1:
+                raise
+
+            self._error.kind = 'Timed Out'
+            self._error.msg = str(e)
+
+            # recursive return to previous.
+            self._updatehistory('out')
+            self._updatemembers()
+
+            return False
+
         except AttributeError:
 
             self._error.kind = 'Attribute Error'
@@ -459,12 +832,11 @@ class Explore():
                 obj_str = f'{self._refhistory[-1]}.{member}'
 
         try:
-            sig = inspect.signature(eval(obj_str)).__str__()
+            obj = eval(obj_str)
         except:
-             #return 'No signature available.'
              return check, None
 
-        return check, _sig_format(sig)
+        return check, _get_signature(obj)
         
 
     def gettype(self, member: Union[str,None] = None)-> tuple:
@@ -486,6 +858,23 @@ class Explore():
         return check, member_type
         
 
+    def getqualname(self, member: Union[str,None] = None)-> tuple:
+        '''Return module.qualname of current object or member of object.'''
+        
+        check = True
+        obj_str = self._refhistory[-1]
+        
+        if member:
+            check = self._checkmember(member)
+            if check:
+                obj_str = f'{self._refhistory[-1]}.{member}'
+
+        try:
+            return check, _qualified_name(eval(obj_str))
+        except:
+             return check, None
+
+
     def get_class_heritage(self,
                            classes: Union[str, list[str], None] = None,
                            listify: bool = False,
@@ -575,6 +964,63 @@ class Explore():
             }
         )
         
+    def walk(self,
+             max_depth: Union[int, None] = None,
+             filter: Union[Callable[[str, str], bool], None] = None,
+             include_private: bool = False,
+             external: bool = False,
+             workers: int = 1,
+             ) -> Iterator[tuple]:
+        '''Walk every member below the current object, depth first.
+
+        Modules and classes are stepped into, each one only once no matter
+        how many paths lead to it, so modules importing each other and
+        classes pointing back at themselves don't loop. Member listings go
+        through member_memo when it is set. The current position doesn't
+        change.
+
+        Parameters
+        ----------
+        max_depth: int or None
+            Levels below the current object to list. Default is no limit.
+        filter: callable, optional
+            filter(trace, kind) -> bool. Members it returns False for are
+            neither listed nor stepped into.
+        include_private: bool, optional
+            Include _private members. Default is False.
+        external: bool, optional
+            Also step into modules and classes from other packages. Default
+            is False, so json.decoder.re is listed but not walked.
+        workers: int, optional
+            Walk top level modules and classes on this many threads. Records
+            are then in the order they finish. Default is 1.
+
+        Yields
+        ------
+        record: tuple
+            (trace, kind, metadata) where kind is the member category and
+            metadata an AttributeDict of:
+                * 'depth': levels below the current object
+                * 'type': type name, None if the member couldn't be accessed
+                * 'name': qualified name (modules and classes)
+                * 'counts': membercounts (modules and classes that are walked)
+                * 'seen': True if walked already via another path
+                * 'external': True if from another package and not walked
+                * 'truncated': True if max_depth kept it from being walked
+                * 'error': set if the member or its members couldn't be read
+        '''
+        members = self.member_memo.get if self.member_memo is not None else None
+        return walk_members(
+            eval(self._refhistory[-1]),
+            self._trace,
+            max_depth=max_depth,
+            filter=filter,
+            include_private=include_private,
+            external=external,
+            workers=workers,
+            members=members,
+        )
+
     # Public property calls for current members, membercounts, flatmembers, 
     # and trace. No setter is defined, thus these can only be written internally
     # via the class methods. 
@@ -585,6 +1031,12 @@ class Explore():
         return self._members
     
 
+    @property
+    def partial(self):
+        '''Return whether the member listing is incomplete (ran out of time).'''
+        return self._partial
+
+
     @property
     def membercounts(self):
         '''Return member counts of current explored object.'''
@@ -652,6 +1104,8 @@ class ExploreFromStatus(Explore):
 
         self._error = AttributeDict({'kind':'', 'msg':''})
 
+        self._partial = False
+
         self._updatemembers()
 
 
@@ -0,0 +1,243 @@
+'''What importing a package costs, measured in a fresh interpreter.
+
+Each package is imported in its own subprocess, twice:
+
+* with ``-X importtime``, for the time every module took to import (self and
+  cumulative, in microseconds) and the tree of who imported what. Only
+  imports after interpreter startup count, so modules python loads anyway
+  (os, site...) don't.
+* with tracemalloc on, for the memory allocated by the import. That run
+  isn't timed since tracing slows everything down.
+
+The RSS growth is recorded by both. Results are kept in the environment
+cache per distribution version, so each package is measured once.
+'''
+
+__all__ = [
+    'measure_import',
+    'parse_importtime',
+    'ImportCostEngine',
+]
+
+import json
+import subprocess
+import sys
+from typing import Any
+
+from .jobs import CachedJobs
+from .memo import module_version
+
+# bump when the shape of the results changes
+COST_VERSION = 1
+
+# tree nodes under this share of the total are left out
+MIN_SHARE = 0.005
+MAX_NODES = 300
+
+_MARKER = '@@python-explorer-import@@'
+
+# runs in the subprocess, argv is [mode, package]
+_CHILD = r'''
+import json, os, sys, time
+
+def rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+mode, name = sys.argv[1], sys.argv[2]
+if mode == 'memory':
+    import tracemalloc
+    tracemalloc.start()
+before = rss()
+sys.stderr.write('@@python-explorer-import@@\n')
+sys.stderr.flush()
+start = time.perf_counter()
+# importlib.import_module skips the top level line in -X importtime
+__import__(name)
+out = {
+    'wall': time.perf_counter() - start,
+    'rss': rss() - before,
+    'modules': len(sys.modules),
+}
+if mode == 'memory':
+    out['traced'], out['traced_peak'] = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+# versions as this interpreter sees them, like memo.module_version
+out['python'] = sys.version.split()[0]
+top = name.partition('.')[0]
+if top in getattr(sys, 'stdlib_module_names', ()) or top in sys.builtin_module_names:
+    out['version'] = out['python']
+else:
+    try:
+        from importlib.metadata import packages_distributions, version
+        out['version'] = ','.join(version(d) for d in packages_distributions().get(top, []))
+    except Exception:
+        out['version'] = ''
+sys.stdout.write('\n@@python-explorer-import@@' + json.dumps(out))
+'''
+
+
+def parse_importtime(stderr: str) -> list:
+    '''Return the import tree from ``-X importtime`` output.
+
+    Only lines after the marker the subprocess writes are used.
+
+    Returns
+    -------
+    roots: list
+        [name, self us, cumulative us, children] nodes, children the same.
+    '''
+    _, found, after = stderr.partition(_MARKER)
+    if not found:
+        after = stderr
+
+    # python prints children before their parent, one level deeper
+    pending = {}
+    for line in after.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cum_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            # the header line
+            continue
+        raw = parts[2].rstrip()
+        depth = (len(raw) - len(raw.lstrip()) - 1) // 2
+        node = [raw.strip(), self_us, cum_us, pending.pop(depth + 1, [])]
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def _run(python: str, mode: str, package: str, timeout: float) -> tuple:
+    '''Internal helper function. Run one measurement, return (stats, stderr).'''
+    args = [python]
+    if mode == 'time':
+        args += ['-X', 'importtime']
+    proc = subprocess.run(
+        args + ['-c', _CHILD, mode, package],
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+    _, found, result = proc.stdout.rpartition(_MARKER)
+    if proc.returncode != 0 or not found:
+        lines = [l for l in proc.stderr.splitlines() if not l.startswith('import time:')]
+        raise RuntimeError(lines[-1] if lines else f'exit status {proc.returncode}')
+    return json.loads(result), proc.stderr
+
+
+def _prune(node: list, min_us: int, budget: list) -> list:
+    '''Internal helper function. Drop small nodes, biggest children first.'''
+    children = []
+    for c in sorted(node[3], key=lambda c: c[2], reverse=True):
+        if c[2] < min_us or budget[0] <= 0:
+            break
+        budget[0] -= 1
+        children.append(_prune(c, min_us, budget))
+    return [node[0], node[1], node[2], children]
+
+
+def measure_import(
+        package: str,
+        python: str = sys.executable,
+        timeout: float = 120.0,
+        ) -> dict:
+    '''Measure importing a package in fresh interpreters.
+
+    Parameters
+    ----------
+    package: str
+        Import name.
+    python: str
+        Interpreter to use.
+    timeout: float
+        Seconds each of the two runs may take.
+
+    Returns
+    -------
+    cost: dict
+        * 'version', 'python': of the package and the interpreter measured
+        * 'total_us': cumulative import time of everything imported
+        * 'wall': seconds the import statement took
+        * 'modules': number of modules imported
+        * 'tree': [name, self us, cumulative us, children] roots, small
+          modules left out
+        * 'dependencies': [(top level package, self us, modules)] of other
+          packages imported on the way, most expensive first
+        * 'own_us': self time of the package's own modules
+        * 'rss': resident memory growth in bytes
+        * 'traced', 'traced_peak': bytes allocated by the import, still held
+          and at most (tracemalloc)
+    '''
+    timing, stderr = _run(python, 'time', package, timeout)
+    memory, _ = _run(python, 'memory', package, timeout)
+    roots = parse_importtime(stderr)
+
+    top = package.partition('.')[0]
+    by_package = {}
+    count = 0
+    stack = list(roots)
+    while stack:
+        name, self_us, _, children = stack.pop()
+        count += 1
+        t = name.partition('.')[0]
+        us, n = by_package.get(t, (0, 0))
+        by_package[t] = (us + self_us, n + 1)
+        stack.extend(children)
+
+    total = sum(r[2] for r in roots)
+    budget = [MAX_NODES]
+    tree = [
+        _prune(r, int(total * MIN_SHARE), budget)
+        for r in sorted(roots, key=lambda r: r[2], reverse=True)
+    ]
+    deps = sorted(
+        ((t, us, n) for t, (us, n) in by_package.items() if t != top),
+        key=lambda d: d[1],
+        reverse=True,
+    )
+
+    return {
+        'package': package,
+        'version': timing['version'],
+        'python': timing['python'],
+        'total_us': total,
+        'wall': timing['wall'],
+        'modules': count,
+        'tree': tree,
+        'dependencies': deps[:15],
+        'own_us': by_package.get(top, (0, 0))[0],
+        'rss': timing['rss'],
+        'traced': memory.get('traced', 0),
+        'traced_peak': memory.get('traced_peak', 0),
+    }
+
+
+class ImportCostEngine(CachedJobs):
+    '''Measures import costs on a background thread and keeps them.
+
+    Parameters
+    ----------
+    cache: object
+        Cache with get/set (see cache.get_env_cache).
+    python: str
+        Interpreter to measure with.
+    '''
+
+    def __init__(self, cache: Any, python: str = sys.executable) -> None:
+        super().__init__(cache, workers=1, name='import-cost')
+        self.python = python
+
+    def _key(self, package: str) -> tuple:
+        return ('import-cost', COST_VERSION, package, module_version(package))
+
+    def _compute(self, package: str) -> dict:
+        return measure_import(package, self.python)
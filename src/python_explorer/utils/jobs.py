@@ -0,0 +1,104 @@
+'''Background jobs whose results are kept in a cache.
+
+The pattern behind package statistics, import costs and member sizes: the
+first request for an item starts computing it on a worker thread and returns
+None, the page polls until get() has it. Results go to a cache (usually the
+environment cache) under a key that changes whenever the result would, so
+they're computed once. Failures are remembered for a while so a broken item
+isn't retried on every poll, and tried again after that (a timeout or a
+busy machine shouldn't disable an item for good).
+'''
+
+__all__ = [
+    'CachedJobs',
+]
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Hashable, Union
+
+logger = logging.getLogger('python_explorer')
+
+
+class CachedJobs(ABC):
+    '''Computes results on background threads and keeps them in a cache.
+
+    Subclasses define _key(item) and _compute(item).
+
+    Parameters
+    ----------
+    cache: object
+        Cache with get/set to keep results in (see cache.get_env_cache).
+    workers: int
+        Items computed at the same time.
+    name: str
+        What's computed, for thread names and log messages.
+    retry: float
+        Seconds a failed item is left alone before it's tried again.
+    '''
+
+    def __init__(self, cache: Any, workers: int = 1, name: str = 'jobs', retry: float = 300.0) -> None:
+        self.cache = cache
+        self.name = name
+        self.retry = retry
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix=f'px-{name}')
+        self._lock = threading.Lock()
+        # item -> Future while queued or running
+        self._pending = {}
+        # item -> (error message, time.monotonic()) of the last failed run
+        self._failed = {}
+
+    @abstractmethod
+    def _key(self, item: Hashable) -> tuple:
+        '''Return the cache key of an item's result.'''
+
+    @abstractmethod
+    def _compute(self, item: Hashable) -> Any:
+        '''Compute an item's result, on a worker thread.'''
+
+    def get(self, item: Hashable) -> Any:
+        '''Return the result for an item if it's ready.'''
+        return self.cache.get(self._key(item))
+
+    def request(self, item: Hashable) -> Any:
+        '''Return the result for an item, or start computing it.
+
+        Returns None while it's being computed, or if that failed (see
+        error()).
+        '''
+        result = self.get(item)
+        if result is not None:
+            return result
+        with self._lock:
+            if item not in self._pending and self.error(item) is None:
+                self._failed.pop(item, None)
+                self._pending[item] = self._pool.submit(self._run, item)
+        return None
+
+    def error(self, item: Hashable) -> Union[str, None]:
+        '''Return why computing an item failed, if it did within retry seconds.'''
+        failed = self._failed.get(item)
+        if failed is None or time.monotonic() - failed[1] >= self.retry:
+            return None
+        return failed[0]
+
+    def forget(self, item: Union[Hashable, None] = None) -> None:
+        '''Allow a failed item to be tried again, or all of them.'''
+        if item is None:
+            self._failed.clear()
+        else:
+            self._failed.pop(item, None)
+
+    def _run(self, item: Hashable) -> None:
+        try:
+            result = self._compute(item)
+            self.cache.set(self._key(item), result)
+        except Exception as e:
+            logger.warning('Computing %s failed for %s: %s', self.name, item, e)
+            self._failed[item] = (f'{type(e).__name__}: {e}', time.monotonic())
+        finally:
+            with self._lock:
+                self._pending.pop(item, None)
@@ -0,0 +1,279 @@
+'''Memoized member listings for modules and classes.
+
+getmembers_categorized only depends on the object for modules and classes,
+so its result is kept and reused by every session. An entry is only used
+when all of these still match:
+
+* the qualified name (module name, or module.qualname for classes)
+* the object itself, through a weak reference. A reloaded class is a new
+  object, and entries die with their objects.
+* the version of the distribution the module belongs to, plus the mtime and
+  size of its source file. That catches reloads and upgrades in place.
+
+With a shared cache (multi-process serving), results are also shared between
+workers, keyed by name and fingerprint since object identity means nothing
+across processes.
+'''
+
+__all__ = [
+    'MemberMemo',
+    'module_version',
+]
+
+import inspect
+import os
+import sys
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Union
+
+from .admission import get_scheduler
+from .explore import AttributeDict, budget_state, getmembers_categorized
+from .singleflight import SingleFlight
+
+
+# Versions---------------------------------------------------------------------
+
+# top level module -> distribution version(s)
+_versions = {}
+_dists = None
+
+def module_version(module: str) -> str:
+    '''Return the version of the distribution a module belongs to.
+
+    The python version for the standard library, '' when unknown.
+    '''
+    global _dists
+    top = module.partition('.')[0]
+    version = _versions.get(top)
+    if version is None:
+        if top in sys.stdlib_module_names or top in sys.builtin_module_names:
+            version = sys.version.split()[0]
+        else:
+            from importlib.metadata import packages_distributions, version as dist_version
+            if _dists is None:
+                _dists = packages_distributions()
+            try:
+                version = ','.join(dist_version(d) for d in _dists.get(top, []))
+            except Exception:
+                version = ''
+        _versions[top] = version
+    return version
+
+
+def forget_versions(prefix: Union[str, None] = None) -> None:
+    '''Look versions up again, for one top level module or all of them.'''
+    global _dists
+    if prefix is None:
+        _versions.clear()
+    else:
+        _versions.pop(prefix.partition('.')[0], None)
+    _dists = None
+
+
+# Memo-------------------------------------------------------------------------
+
+class MemberMemo:
+    '''LRU memo of getmembers_categorized results.
+
+    Parameters
+    ----------
+    shared: object, optional
+        Cache with get/set (see cache.py) to share results between processes.
+    max_entries: int
+        Least recently used listings are dropped past this many.
+    max_names: int
+        ...or past this many member names in total, whichever comes first.
+    '''
+
+    def __init__(self,
+                 shared: Any = None,
+                 max_entries: int = 2048,
+                 max_names: int = 500_000,
+                 ) -> None:
+        self.shared = shared
+        self.max_entries = max_entries
+        self.max_names = max_names
+
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.partials = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+        # name -> AttributeDict(ref, oid, fingerprint, members, inactive, size)
+        self._entries = OrderedDict()
+        self._names = 0
+        # sessions opening the same namespace at once classify it once
+        self._flights = SingleFlight('members')
+
+    # Keys---------------------------------------------------------------------
+
+    def _key(self, obj: Any) -> Union[tuple, None]:
+        '''Internal helper method.
+
+        Return (name, fingerprint) for modules and classes, otherwise None.
+        '''
+        if inspect.ismodule(obj):
+            name = module = obj.__name__
+            mod = obj
+        elif inspect.isclass(obj):
+            module = getattr(obj, '__module__', None) or ''
+            name = f'{module}.{obj.__qualname__}'
+            mod = sys.modules.get(module)
+        else:
+            return None
+
+        path = getattr(mod, '__file__', None) if mod is not None else None
+        mtime = size = 0
+        if path:
+            try:
+                st = os.stat(path)
+                mtime, size = st.st_mtime_ns, st.st_size
+            except OSError:
+                pass
+        return name, (module_version(module), mtime, size)
+
+    # Lookup-------------------------------------------------------------------
+
+    def get(self, obj: Any) -> tuple:
+        '''Return (members, inactive modules) for obj, like getmembers_categorized.
+
+        The inactive set is a copy the caller may change.
+        '''
+        try:
+            key = self._key(obj)
+        except Exception:
+            # odd metaclasses and module proxies, don't bother memoizing
+            key = None
+        if key is None:
+            return getmembers_categorized(obj)
+        name, fingerprint = key
+
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                alive = entry.ref() if entry.ref is not None else None
+                same = alive is obj if entry.ref is not None else entry.oid == id(obj)
+                if same and entry.fingerprint == fingerprint:
+                    self._entries.move_to_end(name)
+                    self.hits += 1
+                    return entry.members, set(entry.inactive)
+                self.invalidations += 1
+                self._drop(name)
+
+        shared_key = ('members', name, *fingerprint)
+        found = self.shared.get(shared_key) if self.shared is not None else None
+        if found is not None:
+            members, inactive = found
+            members = AttributeDict(members)
+            with self._lock:
+                self.shared_hits += 1
+        else:
+            members, inactive, partial = self._flights.do(
+                ('members', name, id(obj), fingerprint),
+                lambda: self._classify(obj),
+            )
+            with self._lock:
+                self.misses += 1
+            if partial:
+                # cut short by a time budget, maybe another thread's. Keep
+                # it out of the memo, nobody should get it as complete.
+                with self._lock:
+                    self.partials += 1
+                state = budget_state()
+                if state is not None:
+                    state.partial = True
+                    return members, set(inactive)
+                members, inactive, _ = self._classify(obj)
+            if self.shared is not None:
+                self.shared.set(shared_key, (dict(members), set(inactive)))
+
+        self._store(name, obj, fingerprint, members, inactive)
+        return members, set(inactive)
+
+    def _classify(self, obj: Any) -> tuple:
+        '''Internal helper method.
+
+        Return getmembers_categorized and whether the listing ran out of
+        time, modules as expensive work.
+        '''
+        if not inspect.ismodule(obj):
+            members, inactive = getmembers_categorized(obj)
+        else:
+            with get_scheduler().expensive('classify'):
+                members, inactive = getmembers_categorized(obj)
+        state = budget_state()
+        return members, inactive, state is not None and state.partial
+
+    def _store(self, name, obj, fingerprint, members, inactive) -> None:
+        try:
+            ref = weakref.ref(obj)
+        except TypeError:
+            ref = None
+        entry = AttributeDict(
+            {
+                'ref': ref,
+                'oid': id(obj),
+                'fingerprint': fingerprint,
+                'members': members,
+                'inactive': frozenset(inactive),
+                'size': sum(len(v) for v in members.values()),
+            }
+        )
+        with self._lock:
+            self._drop(name)
+            self._entries[name] = entry
+            self._names += entry.size
+            while self._entries and (
+                    len(self._entries) > self.max_entries or self._names > self.max_names):
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, name: str) -> None:
+        '''Internal helper method. Remove an entry, lock held by the caller.'''
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._names -= entry.size
+
+    # Maintenance--------------------------------------------------------------
+
+    def invalidate(self, prefix: Union[str, None] = None) -> int:
+        '''Forget listings under a module prefix, or all of them.
+
+        Distribution versions are looked up again too.
+
+        Returns
+        -------
+        count: int
+            Number of listings dropped.
+        '''
+        forget_versions(prefix)
+        with self._lock:
+            if prefix is None:
+                names = list(self._entries)
+            else:
+                names = [
+                    n for n in self._entries
+                    if n == prefix or n.startswith(f'{prefix}.')
+                ]
+            for n in names:
+                self._drop(n)
+        return len(names)
+
+    def metrics(self) -> list:
+        '''Return exposition lines for /metrics.'''
+        return [
+            '# HELP python_explorer_member_memo_total Member listing lookups by result.',
+            '# TYPE python_explorer_member_memo_total counter',
+            f'python_explorer_member_memo_total{{result="hit"}} {self.hits}',
+            f'python_explorer_member_memo_total{{result="shared_hit"}} {self.shared_hits}',
+            f'python_explorer_member_memo_total{{result="miss"}} {self.misses}',
+            f'python_explorer_member_memo_total{{result="stale"}} {self.invalidations}',
+            # misses that ran out of time and weren't kept
+            f'python_explorer_member_memo_total{{result="partial"}} {self.partials}',
+            '# HELP python_explorer_member_memo_entries Member listings held in memory.',
+            '# TYPE python_explorer_member_memo_entries gauge',
+            f'python_explorer_member_memo_entries {len(self._entries)}',
+        ]
@@ -0,0 +1,185 @@
+'''Deep memory size of the members of a namespace.
+
+The deep size of a member is the size of every object reachable from it
+(gc.get_referents), each object counted once. The walk doesn't go into
+modules, other classes or module globals, so a function isn't charged for
+the whole module it lives in and an instance isn't charged for its class.
+
+Importing and walking a namespace can take a lot of memory and time, so
+it's done in a separate process with a time budget:
+
+    python -m python_explorer.utils.memsize <trace> [seconds]
+
+prints {'sizes': {member: [bytes, truncated]}, 'complete': bool} as json.
+Members that ran out of budget are truncated (their size is a lower bound),
+members left when time is up aren't listed at all.
+'''
+
+__all__ = [
+    'deep_size',
+    'namespace_sizes',
+    'MemberSizeEngine',
+]
+
+import gc
+import importlib
+import inspect
+import json
+import subprocess
+import sys
+import time
+from typing import Any
+
+from .jobs import CachedJobs
+from .memo import module_version
+
+# bump when the shape of the results changes
+SIZE_VERSION = 1
+
+MAX_OBJECTS = 1_000_000
+
+
+def _boundaries() -> set:
+    '''Internal helper function. Return ids of objects the walk shouldn't enter.'''
+    stop = set()
+    for m in list(sys.modules.values()):
+        stop.add(id(m))
+        d = getattr(m, '__dict__', None)
+        if d is not None:
+            stop.add(id(d))
+    return stop
+
+
+def deep_size(obj: Any, deadline: float, stop: set, max_objects: int = MAX_OBJECTS) -> tuple:
+    '''Return (bytes, truncated) of everything reachable from obj.
+
+    Parameters
+    ----------
+    obj: object
+        Where to start.
+    deadline: float
+        time.monotonic() to give up at.
+    stop: set
+        ids of objects not to count or enter (see _boundaries).
+    max_objects: int
+        Give up after this many objects.
+    '''
+    seen = {id(obj)}
+    total = 0
+    pending = [obj]
+    count = 0
+    while pending:
+        o = pending.pop()
+        try:
+            total += sys.getsizeof(o)
+        except Exception:
+            pass
+        count += 1
+        if count >= max_objects or (count % 1000 == 0 and time.monotonic() > deadline):
+            return total, True
+        for r in gc.get_referents(o):
+            if id(r) in seen or id(r) in stop:
+                continue
+            # other classes and modules belong to themselves
+            if isinstance(r, type) or inspect.ismodule(r):
+                continue
+            seen.add(id(r))
+            pending.append(r)
+    return total, False
+
+
+def _resolve(trace: str) -> Any:
+    '''Internal helper function. Import and return the object at a trace.'''
+    parts = trace.split('.')
+    obj = importlib.import_module(parts[0])
+    for i, name in enumerate(parts[1:], start=1):
+        try:
+            obj = getattr(obj, name)
+        except AttributeError:
+            obj = importlib.import_module('.'.join(parts[:i+1]))
+    return obj
+
+
+def namespace_sizes(trace: str, seconds: float = 20.0) -> dict:
+    '''Return deep sizes of the members of the object at trace.
+
+    Run it in a separate process (see the module docstring), it imports
+    whatever the namespace needs.
+    '''
+    from .explore import getmembers_categorized
+
+    obj = _resolve(trace)
+    members, inactive = getmembers_categorized(obj)
+    stop = _boundaries()
+    # importing and listing don't count, the budget is for measuring
+    deadline = time.monotonic() + seconds
+
+    sizes = {}
+    complete = True
+    for kind, names in members.items():
+        # modules are their own namespaces
+        if kind == 'modules':
+            continue
+        for name in names:
+            if time.monotonic() > deadline:
+                complete = False
+                break
+            try:
+                member = getattr(obj, name)
+            except Exception:
+                continue
+            size, truncated = deep_size(member, deadline, stop)
+            sizes[name] = [size, truncated]
+            complete = complete and not truncated
+    return {'sizes': sizes, 'complete': complete}
+
+
+class MemberSizeEngine(CachedJobs):
+    '''Measures member sizes in a subprocess and keeps them.
+
+    Parameters
+    ----------
+    cache: object
+        Cache with get/set (see cache.get_env_cache).
+    seconds: float
+        Time budget of each namespace.
+    python: str
+        Interpreter to measure with.
+    '''
+
+    def __init__(self, cache: Any, seconds: float = 20.0, python: str = sys.executable) -> None:
+        super().__init__(cache, workers=1, name='member-sizes')
+        self.seconds = seconds
+        self.python = python
+
+    def _key(self, trace: str) -> tuple:
+        return ('member-sizes', SIZE_VERSION, trace, module_version(trace))
+
+    def _compute(self, trace: str) -> dict:
+        proc = subprocess.run(
+            [self.python, '-m', 'python_explorer.utils.memsize', trace, str(self.seconds)],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            text=True,
+            # importing counts too, the budget only starts after
+            timeout=self.seconds + 120,
+        )
+        if proc.returncode != 0:
+            lines = proc.stderr.strip().splitlines()
+            raise RuntimeError(lines[-1] if lines else f'exit status {proc.returncode}')
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def _main(argv: list) -> int:
+    trace = argv[0]
+    seconds = float(argv[1]) if len(argv) > 1 else 20.0
+    # whatever the namespace prints while importing stays out of the result
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    result = namespace_sizes(trace, seconds)
+    stdout.write('\n' + json.dumps(result) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(_main(sys.argv[1:]))
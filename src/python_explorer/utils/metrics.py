@@ -0,0 +1,261 @@
+'''Latency instrumentation for the Dash callbacks.
+
+Each callback is timed as a whole and split into stages (import, classify,
+heritage, render...). Timings go into histograms that are served in the
+Prometheus text format at /metrics. Requests slower than
+settings.slow_request are logged together with the trace they were working
+on and their stage breakdown.
+
+Usage::
+
+    @callback(...)
+    @instrumented('update_explore')
+    def update_explore(...):
+        with stage('import'):
+            ...
+'''
+
+__all__ = [
+    'Histogram',
+    'instrumented',
+    'stage',
+    'annotate',
+    'attached',
+    'running_callbacks',
+    'render_metrics',
+    'install_metrics',
+]
+
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Union
+
+from .explore import AttributeDict
+from .settings import settings
+
+logger = logging.getLogger('python_explorer')
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+    '''Thread-safe histogram family with one label.
+
+    Parameters
+    ----------
+    name: str
+        Metric name.
+    doc: str
+        Help text.
+    label: str
+        Name of the label distinguishing the series.
+    buckets: tuple
+        Upper bounds in seconds.
+    '''
+
+    def __init__(self, name: str, doc: str, label: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.doc = doc
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labelvalue: str, value: float) -> None:
+        with self._lock:
+            series = self._series.get(labelvalue)
+            if series is None:
+                series = self._series[labelvalue] = AttributeDict(
+                    {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+                )
+            series.counts[bisect_left(self.buckets, value)] += 1
+            series.sum += value
+            series.count += 1
+
+    def snapshot(self) -> dict:
+        '''Return {labelvalue: {'counts', 'sum', 'count'}} copies.'''
+        with self._lock:
+            return {
+                k: {'counts': list(v.counts), 'sum': v.sum, 'count': v.count}
+                for k, v in self._series.items()
+            }
+
+    def render(self) -> list:
+        '''Return lines in the Prometheus text format.'''
+        lines = [
+            f'# HELP {self.name} {self.doc}',
+            f'# TYPE {self.name} histogram',
+        ]
+        for lv, series in sorted(self.snapshot().items()):
+            lab = f'{self.label}="{_escape(lv)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, series['counts']):
+                cumulative += n
+                lines.append(f'{self.name}_bucket{{{lab},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{lab},le="+Inf"}} {series["count"]}')
+            lines.append(f'{self.name}_sum{{{lab}}} {series["sum"]}')
+            lines.append(f'{self.name}_count{{{lab}}} {series["count"]}')
+        return lines
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+callback_seconds = Histogram(
+    'python_explorer_callback_seconds',
+    'Time spent in each Dash callback.',
+    'callback',
+)
+stage_seconds = Histogram(
+    'python_explorer_stage_seconds',
+    'Time spent in each stage of a callback.',
+    'stage',
+)
+request_seconds = Histogram(
+    'python_explorer_request_seconds',
+    'Time spent serving each http route, including json serialization.',
+    'route',
+)
+
+# extra metric sources: functions returning lists of exposition lines
+_collectors = []
+
+_local = threading.local()
+
+# thread ident -> record of the callback running on it, so other threads
+# (the sampling profiler) can see what each thread is working on
+_running = {}
+
+
+def current() -> Union[AttributeDict, None]:
+    '''Return the record of the callback running on this thread, if any.'''
+    return getattr(_local, 'record', None)
+
+
+def running_callbacks() -> dict:
+    '''Return {thread ident: record} of the callbacks running right now.'''
+    return dict(_running)
+
+
+def annotate(**kwargs) -> None:
+    '''Attach info (e.g. trace=...) to the callback running on this thread.'''
+    record = current()
+    if record is not None:
+        record.update(kwargs)
+
+
+@contextmanager
+def attached(record: Union[AttributeDict, None]):
+    '''Count this thread's work in the block towards a callback's record.
+
+    For helper threads doing part of a callback (see watchdog.py), so their
+    stages and samples end up with the callback. record comes from current()
+    on the callback's thread.
+    '''
+    if record is None:
+        yield
+        return
+    outer = current()
+    ident = threading.get_ident()
+    _local.record = _running[ident] = record
+    try:
+        yield
+    finally:
+        _local.record = outer
+        if outer is None:
+            _running.pop(ident, None)
+        else:
+            _running[ident] = outer
+
+
+@contextmanager
+def stage(name: str):
+    '''Time a stage of the current callback.'''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        stage_seconds.observe(name, seconds)
+        record = current()
+        if record is not None:
+            record.stages.append((name, seconds))
+
+
+def instrumented(name: str) -> Callable:
+    '''Decorator timing a callback and logging it when slow.'''
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            outer = current()
+            ident = threading.get_ident()
+            _local.record = _running[ident] = AttributeDict(
+                {'callback': name, 'trace': None, 'stages': []}
+            )
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                record = _local.record
+                _local.record = outer
+                if outer is None:
+                    _running.pop(ident, None)
+                else:
+                    _running[ident] = outer
+                callback_seconds.observe(name, seconds)
+                if settings.slow_request is not None and seconds >= settings.slow_request:
+                    breakdown = ', '.join(f'{s}={t*1000:.1f}ms' for s, t in record.stages)
+                    logger.warning(
+                        'Slow callback %s: %.1fms trace=%s stages=[%s]',
+                        name, seconds * 1000, record.trace, breakdown,
+                    )
+        return wrapper
+    return decorator
+
+
+def add_collector(func: Callable[[], list]) -> None:
+    '''Register a function returning extra exposition lines for /metrics.'''
+    _collectors.append(func)
+
+
+def render_metrics() -> str:
+    '''Return all metrics in the Prometheus text format.'''
+    lines = []
+    for h in (callback_seconds, stage_seconds, request_seconds):
+        lines.extend(h.render())
+    for c in _collectors:
+        try:
+            lines.extend(c())
+        except Exception:
+            logger.exception('metrics collector failed')
+    return '\n'.join(lines) + '\n'
+
+
+def install_metrics(server) -> None:
+    '''Add request timing and the /metrics route to a Flask server.'''
+    from flask import Response, g, request
+
+    @server.before_request
+    def _start_timer():
+        g._px_start = time.perf_counter()
+
+    @server.after_request
+    def _stop_timer(response):
+        start = getattr(g, '_px_start', None)
+        if start is not None:
+            # route rules keep the label set small, unlike raw paths
+            rule = request.url_rule.rule if request.url_rule else 'other'
+            request_seconds.observe(rule, time.perf_counter() - start)
+        return response
+
+    @server.route('/metrics')
+    def _metrics():
+        return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
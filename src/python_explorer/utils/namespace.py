@@ -0,0 +1,415 @@
+'''Thread-safe registry of the packages imported for exploration.'''
+
+__all__ = [
+    'ImportedNamespace',
+]
+
+import _imp
+import gc
+import importlib
+import os
+import sys
+import threading
+import time
+import types
+import weakref
+from typing import Any, Union
+
+from .explore import AttributeDict
+
+
+def _rss() -> int:
+    '''Internal helper function.
+
+    Return resident memory of this process in bytes, or peak resident memory
+    where the current value isn't available.
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (ImportError, OSError):
+        return 0
+
+
+def _unloadable(names: set) -> bool:
+    '''Internal helper function.
+
+    Only pure python modules can be dropped from sys.modules and imported
+    again later. Extension modules generally can't be initialized twice.
+    '''
+    for n in names:
+        mod = sys.modules.get(n)
+        if mod is None:
+            continue
+        f = getattr(mod, '__file__', None)
+        if f is None:
+            # namespace packages are fine, builtins are not
+            if not hasattr(mod, '__path__'):
+                return False
+        elif not f.endswith(('.py', '.pyc')):
+            return False
+    return True
+
+
+def _in_use(names: set) -> bool:
+    '''Internal helper function.
+
+    Whether modules other than names hold on to any of them: the modules
+    themselves, or classes, functions and instances from them. Unloading
+    those and importing them again later would leave two copies of every
+    class around.
+    '''
+    for other, mod in list(sys.modules.items()):
+        if other in names or mod is None:
+            continue
+        try:
+            values = list(vars(mod).values())
+        except TypeError:
+            continue
+        for v in values:
+            if isinstance(v, types.ModuleType):
+                owner = v.__name__
+            elif isinstance(v, (type, types.FunctionType, types.BuiltinFunctionType)):
+                owner = getattr(v, '__module__', None)
+            else:
+                owner = type(v).__module__
+            if owner in names:
+                return True
+    return False
+
+
+class ImportedNamespace:
+    '''This is an internally managed list of imported names and objects.
+
+    Similar function to globals() or locals() but I needed more control.
+
+    Safe to use from many threads at once (waitress serves each request on
+    its own thread):
+
+    * single-flight: when several threads ask for a module that is still
+      being imported, one does the import and the rest wait for its result.
+    * failures are remembered. Asking again before the retry backoff is up
+      fails right away instead of retrying a broken import on every click.
+      The backoff doubles with each failure up to max_backoff seconds.
+    * import times and waits are recorded, see metrics().
+
+    With a memory budget, the memory each import added and the modules it
+    brought into sys.modules are tracked along with when it was last used.
+    Once the total goes over budget, the least recently used imports are
+    unloaded from sys.modules where that is safe: pure python only, and only
+    when no other module uses them and nothing else (like an Explore
+    session) still holds them. Only memory that comes back after unloading
+    is taken off the total, what doesn't stays counted. If that isn't
+    enough, the recycle event is set so the process can be replaced by a
+    fresh one (see app.py). Cached results are plain data and stay warm
+    either way.
+
+    Parameters
+    ----------
+    backoff: float
+        Seconds before a failed import may be retried the first time.
+    max_backoff: float
+        Upper limit for the retry backoff.
+    memory_budget: int, optional
+        Bytes the tracked imports may add up to. Default is no limit.
+    '''
+
+    def __init__(self,
+                 backoff: float = 5.0,
+                 max_backoff: float = 600.0,
+                 memory_budget: Union[int, None] = None,
+                 ):
+        self.active = {}
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.memory_budget = memory_budget
+
+        # bumped whenever modules are imported or unloaded
+        self.generation = 0
+
+        # set when over budget and unloading can't fix it
+        self.recycle = threading.Event()
+        self.evictions = 0
+        # bytes of unloaded imports that didn't come back
+        self.retained = 0
+
+        self._lock = threading.Lock()
+        # module -> threading.Event set once its import is done
+        self._inflight = {}
+        # module -> AttributeDict(attempts, error, failed_at, retry_at)
+        self._failures = {}
+        # module -> AttributeDict(seconds, imported_at, waiters)
+        self._timings = {}
+        # module -> AttributeDict(cost, modules, last_access, unloadable)
+        self._groups = {}
+
+    def _claim(self, module: str) -> Any:
+        '''Internal helper method.
+
+        Return None when module is already imported, otherwise the Event of
+        the import in flight and whether the caller has to do the import.
+        '''
+        with self._lock:
+            if module in self.active:
+                return None
+
+            failure = self._failures.get(module)
+            if failure and time.monotonic() < failure.retry_at:
+                wait = failure.retry_at - time.monotonic()
+                raise ImportError(
+                    f'Failed to import {module} ({failure.error}). '
+                    f'Retrying in {wait:.1f}s.'
+                )
+
+            event = self._inflight.get(module)
+            if event is None:
+                event = self._inflight[module] = threading.Event()
+                return event, True
+
+            timing = self._timings.setdefault(
+                module, AttributeDict({'seconds': None, 'imported_at': None, 'waiters': 0})
+            )
+            timing.waiters += 1
+            return event, False
+
+    def import_(self, module: str):
+        while True:
+            claim = self._claim(module)
+            if claim is None:
+                return
+            event, leader = claim
+            if leader:
+                break
+            # someone else is importing it. Wait and look again.
+            event.wait()
+
+        start = time.perf_counter()
+        rss_before = _rss()
+        mods_before = set(sys.modules)
+        try:
+            mod = importlib.import_module(module)
+        except BaseException as e:
+            with self._lock:
+                failure = self._failures.get(module)
+                attempts = failure.attempts + 1 if failure else 1
+                delay = min(self.backoff * 2**(attempts - 1), self.max_backoff)
+                self._failures[module] = AttributeDict(
+                    {
+                        'attempts': attempts,
+                        'error': f'{type(e).__name__}: {e}',
+                        'failed_at': time.time(),
+                        'retry_at': time.monotonic() + delay,
+                    }
+                )
+            raise ImportError(f'Failed to import {module}.') from e
+        else:
+            seconds = time.perf_counter() - start
+            # other threads may import at the same time, so this is only an
+            # estimate of what this import added
+            added = set(sys.modules) - mods_before
+            group = AttributeDict(
+                {
+                    'cost': max(0, _rss() - rss_before),
+                    'modules': added,
+                    'last_access': time.monotonic(),
+                    'unloadable': _unloadable(added),
+                }
+            )
+            with self._lock:
+                self.active[module] = mod
+                self._groups[module] = group
+                self.generation += 1
+                self._failures.pop(module, None)
+                timing = self._timings.setdefault(
+                    module, AttributeDict({'seconds': None, 'imported_at': None, 'waiters': 0})
+                )
+                timing.seconds = seconds
+                timing.imported_at = time.time()
+        finally:
+            with self._lock:
+                self._inflight.pop(module, None)
+            event.set()
+
+        self.enforce_budget(keep=module)
+
+    def get_module(self, module: str)-> Any:
+        try:
+            mod = self.active[module]
+        except KeyError:
+            self.import_(module)
+            mod = self.active[module]
+        group = self._groups.get(module)
+        if group:
+            group.last_access = time.monotonic()
+        return mod
+
+    def forget(self, module: str) -> bool:
+        '''Drop an import so the next import_ loads it again.
+
+        For packages upgraded or removed while serving. A remembered failure
+        is dropped too, the package may import fine now.
+
+        Returns
+        -------
+        unloaded: bool
+            Whether it was removed from sys.modules. Like with the memory
+            budget that's only done for pure python modules, others stay as
+            they were imported until the process restarts.
+        '''
+        with self._lock:
+            self._failures.pop(module, None)
+            if module not in self.active or module in self._inflight:
+                return False
+            names = {
+                n for n in list(sys.modules) if n == module or n.startswith(f'{module}.')
+            }
+            if not _unloadable(names):
+                return False
+            del self.active[module]
+            self._groups.pop(module, None)
+            for name in names:
+                sys.modules.pop(name, None)
+            self.generation += 1
+        return True
+
+    def memory_used(self) -> int:
+        '''Return the tracked memory cost of all imports in bytes.
+
+        Active imports plus what unloaded ones didn't give back.
+        '''
+        with self._lock:
+            return self._used()
+
+    def _used(self) -> int:
+        '''Internal helper method. memory_used, lock held by the caller.'''
+        return self.retained + sum(self._groups[m].cost for m in self.active if m in self._groups)
+
+    def _unload(self, names: set) -> Union[int, None]:
+        '''Internal helper method.
+
+        Drop names from sys.modules if nothing else keeps them alive. Return
+        the bytes that came back, or None (and put them back) when some are
+        still held. Lock held by the caller.
+        '''
+        # nobody may import these while they're out of sys.modules
+        _imp.acquire_lock()
+        try:
+            rss = _rss()
+            refs = {}
+            for name in names:
+                mod = sys.modules.pop(name, None)
+                if mod is not None:
+                    refs[name] = weakref.ref(mod)
+            mod = None
+            gc.collect()
+            alive = {name: ref() for name, ref in refs.items() if ref() is not None}
+            if alive:
+                sys.modules.update(alive)
+                return None
+            return max(0, rss - _rss())
+        finally:
+            _imp.release_lock()
+
+    def enforce_budget(self, keep: Union[str, None] = None) -> list:
+        '''Unload least recently used imports until under the memory budget.
+
+        Parameters
+        ----------
+        keep: str, optional
+            Module that must stay (usually the one just imported).
+
+        Returns
+        -------
+        evicted: list
+            Modules that were unloaded.
+        '''
+        if self.memory_budget is None:
+            return []
+
+        evicted = []
+        with self._lock:
+            used = self._used()
+            if used <= self.memory_budget:
+                return []
+
+            cold = sorted(
+                (m for m in self.active if m in self._groups and m != keep),
+                key=lambda m: self._groups[m].last_access,
+            )
+            for m in cold:
+                if used <= self.memory_budget:
+                    break
+                group = self._groups[m]
+                # submodules stepped into while exploring go along with it
+                names = group.modules | {
+                    n for n in list(sys.modules) if n.startswith(f'{m}.')
+                }
+                if group.cost == 0 or not group.unloadable or not _unloadable(names):
+                    continue
+                # imported before us, or still used by other modules
+                if m not in names or _in_use(names):
+                    continue
+                del self.active[m]
+                freed = self._unload(names)
+                if freed is None:
+                    self.active[m] = sys.modules[m]
+                    continue
+                del self._groups[m]
+                freed = min(freed, group.cost)
+                self.retained += group.cost - freed
+                used -= freed
+                evicted.append(m)
+                self.generation += 1
+
+            self.evictions += len(evicted)
+
+            if used > self.memory_budget:
+                self.recycle.set()
+
+        return evicted
+
+    def metrics(self) -> dict:
+        '''Return a snapshot of import timings and failures per module.
+
+        Returns
+        -------
+        metrics: dict
+            * Keys are module names, values are dicts of:
+                * 'active': True while the module is imported and tracked
+                * 'cost': memory the import added in bytes
+                * 'idle': seconds since the module was last used
+                * 'seconds': time the import took (None if not imported)
+                * 'imported_at': epoch time of the import
+                * 'waiters': requests that waited on another thread's import
+                * 'importing': True while an import is in flight
+                * 'failures': number of consecutive failed attempts
+                * 'error': last error message, if any
+                * 'retry_in': seconds until the import may be retried
+        '''
+        now = time.monotonic()
+        out = {}
+        with self._lock:
+            names = set(self._timings) | set(self._failures) | set(self._inflight)
+            for m in sorted(names):
+                timing = self._timings.get(m, {})
+                failure = self._failures.get(m)
+                group = self._groups.get(m)
+                out[m] = {
+                    'active': m in self.active,
+                    'cost': group.cost if group else None,
+                    'idle': now - group.last_access if group else None,
+                    'seconds': timing.get('seconds'),
+                    'imported_at': timing.get('imported_at'),
+                    'waiters': timing.get('waiters', 0),
+                    'importing': m in self._inflight,
+                    'failures': failure.attempts if failure else 0,
+                    'error': failure.error if failure else None,
+                    'retry_in': max(0.0, failure.retry_at - now) if failure else 0.0,
+                }
+        return out
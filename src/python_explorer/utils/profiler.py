@@ -0,0 +1,148 @@
+'''Sampling profiler for a live server.
+
+Every few milliseconds the stack of each thread that is running a callback
+is sampled (sys._current_frames) and counted. Nothing is hooked into the
+interpreter, so overhead is just the sampling thread and it goes away when
+the profile is done.
+
+Stacks are attributed to the callback and the trace it was working on (see
+metrics.py) and written in the collapsed format, one stack per line::
+
+    callback:update_explore;trace:json;python_explorer.utils.explore:getmembers_categorized;... 42
+
+which flamegraph.pl, speedscope and inferno all read.
+
+The server route is opt-in (``python-explorer --profiler``)::
+
+    curl 'http://127.0.0.1:8080/admin/profile?seconds=30' > profile.txt
+
+With several workers each request lands on one of them, so that worker is
+the one profiled.
+'''
+
+__all__ = [
+    'SamplingProfiler',
+    'install_profiler',
+]
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Union
+
+from .metrics import running_callbacks
+
+MAX_SECONDS = 300
+
+
+def _frame_name(frame) -> str:
+    '''Internal helper function. Return module:function for a frame.'''
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}:{frame.f_code.co_name}'
+
+
+def _sanitize(value) -> str:
+    # ';' separates frames and the last space separates the count
+    return str(value).replace(';', ',').replace(' ', '_').replace('\n', '_')
+
+
+class SamplingProfiler:
+    '''Sample the stacks of callback threads and count collapsed stacks.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between samples.
+    all_threads: bool
+        Also sample threads that aren't running a callback (labeled with
+        the thread name instead). Mostly idle waitress threads.
+    '''
+
+    def __init__(self, interval: float = 0.005, all_threads: bool = False) -> None:
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples = 0
+        self.stacks = Counter()
+
+    def sample(self, skip: Union[int, None] = None) -> None:
+        '''Take one sample of every thread but skip.'''
+        running = running_callbacks()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            record = running.get(ident)
+            if record is not None:
+                prefix = [
+                    f'callback:{_sanitize(record.callback)}',
+                    f'trace:{_sanitize(record.trace)}',
+                ]
+            elif self.all_threads:
+                prefix = [f'thread:{_sanitize(names.get(ident, ident))}']
+            else:
+                continue
+
+            frames = []
+            while frame is not None:
+                frames.append(_sanitize(_frame_name(frame)))
+                frame = frame.f_back
+            frames.reverse()
+            self.stacks[';'.join(prefix + frames)] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> 'SamplingProfiler':
+        '''Sample from the calling thread for the given number of seconds.'''
+        me = threading.get_ident()
+        end = time.monotonic() + seconds
+        while True:
+            now = time.monotonic()
+            if now >= end:
+                break
+            self.sample(skip=me)
+            time.sleep(min(self.interval, end - now))
+        return self
+
+    def collapsed(self) -> str:
+        '''Return the counted stacks in the collapsed stack format.'''
+        return ''.join(f'{stack} {n}\n' for stack, n in self.stacks.most_common())
+
+
+# only one profile at a time, they'd sample each other otherwise
+_profile_lock = threading.Lock()
+
+def install_profiler(server) -> None:
+    '''Add the /admin/profile route to a Flask server.
+
+    Query parameters are seconds (default 10, at most MAX_SECONDS), interval
+    in milliseconds (default 5) and all=1 to include idle threads. The
+    request blocks for the duration and returns the collapsed stacks.
+    '''
+    from flask import Response, request
+
+    @server.route('/admin/profile')
+    def _profile():
+        try:
+            seconds = float(request.args.get('seconds', 10))
+            interval = float(request.args.get('interval', 5)) / 1000
+        except ValueError:
+            return Response('seconds and interval must be numbers\n', status=400, mimetype='text/plain')
+        if not 0 < seconds <= MAX_SECONDS or interval <= 0:
+            return Response(f'seconds must be in (0, {MAX_SECONDS}], interval > 0\n', status=400, mimetype='text/plain')
+
+        if not _profile_lock.acquire(blocking=False):
+            return Response('a profile is already running\n', status=409, mimetype='text/plain')
+        try:
+            prof = SamplingProfiler(interval, all_threads=request.args.get('all') == '1')
+            prof.run(seconds)
+        finally:
+            _profile_lock.release()
+
+        return Response(
+            prof.collapsed(),
+            mimetype='text/plain',
+            headers={
+                'Content-Disposition': f'attachment; filename=python-explorer-{int(time.time())}.collapsed',
+                'X-Samples': str(prof.samples),
+            },
+        )
@@ -0,0 +1,190 @@
+'''Member search over a prebuilt index.
+
+The member search runs on every keystroke, against namespaces that can hold
+tens of thousands of names. An index is built once per member listing, with
+the names lowered up front and a sorted copy for bisect prefix lookups, and
+kept for the next keystrokes, found by a key of the listing rather than the
+listing itself.
+
+Fuzzy matches are ranked:
+
+0. exact (case insensitive)
+1. prefix
+2. starts at a word boundary (after _ or ., or a camelCase hump)
+3. contains
+4. subsequence, the letters in order with gaps, tighter spans first
+
+and ties go to the shorter name, then alphabetically.
+'''
+
+__all__ = [
+    'MemberIndex',
+    'get_member_index',
+]
+
+import heapq
+import re
+from bisect import bisect_left
+from typing import Union
+
+from .cache import LocalCache
+
+FUZZY_LIMIT = 200
+
+
+def _boundaries(name: str) -> set:
+    '''Internal helper function. Return the positions where words start in name.'''
+    starts = {0}
+    for i in range(1, len(name)):
+        c, prev = name[i], name[i-1]
+        if prev in '_.' and c not in '_.':
+            starts.add(i)
+        elif c.isupper() and prev.islower():
+            starts.add(i)
+    return starts
+
+
+class MemberIndex:
+    '''Search index of a flattened member list.
+
+    Parameters
+    ----------
+    flat: list
+        (kind, name) pairs, as in the all-members store.
+    '''
+
+    def __init__(self, flat: list) -> None:
+        self.flat = [tuple(m) for m in flat]
+        self.lower = [m[1].lower() for m in self.flat]
+        order = sorted(range(len(self.lower)), key=self.lower.__getitem__)
+        self._sorted = [self.lower[i] for i in order]
+        self._order = order
+        # one string to run substring and subsequence scans in C
+        self._blob = '\n'.join(self.lower)
+        self._starts = []
+        pos = 0
+        for n in self.lower:
+            self._starts.append(pos)
+            pos += len(n) + 1
+
+    def __len__(self) -> int:
+        return len(self.flat)
+
+    # Lookups------------------------------------------------------------------
+
+    def _line(self, pos: int) -> int:
+        '''Internal helper method. Return the member index at a blob position.'''
+        return bisect_left(self._starts, pos + 1) - 1
+
+    def prefix(self, query: str) -> list:
+        '''Return indices of names starting with query, in listing order.'''
+        q = query.lower()
+        lo = bisect_left(self._sorted, q)
+        hi = bisect_left(self._sorted, q + '\uffff', lo)
+        return sorted(self._order[lo:hi])
+
+    def contains(self, query: str) -> list:
+        '''Return indices of names containing query, in listing order.'''
+        q = query.lower()
+        if '\n' in q:
+            return []
+        found = []
+        blob, pos = self._blob, self._blob.find(q)
+        while pos != -1:
+            i = self._line(pos)
+            found.append(i)
+            # next name
+            nxt = self._starts[i + 1] if i + 1 < len(self._starts) else len(blob)
+            pos = blob.find(q, nxt)
+        return found
+
+    def fuzzy(self, query: str, limit: int = FUZZY_LIMIT, privates: bool = True) -> list:
+        '''Return indices of the best matches for query, best first.'''
+        q = query.lower()
+        if not q or '\n' in q:
+            return []
+        pattern = re.compile('[^\n]*?'.join(re.escape(c) for c in q))
+
+        ranked = []
+        blob = self._blob
+        pos = 0
+        # leftmost shortest match per name, good enough for ranking spans
+        while True:
+            m = pattern.search(blob, pos)
+            if m is None:
+                break
+            i = self._line(m.start())
+            pos = self._starts[i + 1] if i + 1 < len(self._starts) else len(blob)
+            lname = self.lower[i]
+            if not privates and lname.startswith('_'):
+                continue
+            if lname == q:
+                rank = (0, 0)
+            elif lname.startswith(q):
+                rank = (1, 0)
+            else:
+                at = lname.find(q)
+                if at == -1:
+                    rank = (4, m.end() - m.start())
+                elif any(lname.startswith(q, b) for b in _boundaries(self.flat[i][1]) if b >= at):
+                    rank = (2, 0)
+                else:
+                    rank = (3, at)
+            ranked.append((rank, len(lname), lname, i))
+        return [r[-1] for r in heapq.nsmallest(limit, ranked)]
+
+    def search(self,
+               query: str,
+               mode: str = 'startswith',
+               privates: bool = True,
+               limit: int = FUZZY_LIMIT,
+               ) -> list:
+        '''Return matching (kind, name) pairs.
+
+        Parameters
+        ----------
+        query: str
+            Case insensitive search text.
+        mode: str
+            'startswith', 'contains' or 'fuzzy'. Fuzzy results are best first
+            and at most limit of them, the others keep listing order.
+        privates: bool
+            Include names starting with _.
+        '''
+        if mode == 'fuzzy':
+            return [self.flat[i] for i in self.fuzzy(query, limit, privates)]
+        if mode == 'contains':
+            found = self.contains(query)
+        else:
+            found = self.prefix(query)
+        return [self.flat[i] for i in found if privates or not self.flat[i][1].startswith('_')]
+
+
+# listing key or fingerprint -> MemberIndex
+_indexes = LocalCache(max_entries=16)
+
+def get_member_index(flat: list, key: Union[list, tuple, None] = None) -> MemberIndex:
+    '''Return the (cached) index of a member listing.
+
+    Parameters
+    ----------
+    flat: list
+        The listing, [(kind, name)].
+    key: list or tuple, optional
+        Identifies the listing (e.g. trace and module version), so finding
+        its index doesn't look at the listing at all. Without one the
+        listing is hashed.
+    '''
+    if key is not None:
+        return _indexes.get_or_set(
+            ('listing', *key), lambda: MemberIndex([tuple(m) for m in flat])
+        )
+    flat = [tuple(m) for m in flat]
+    # kinds count too, the same names can be sorted differently
+    key = (len(flat), hash(tuple(flat)))
+    index = _indexes.get_or_set(key, lambda: MemberIndex(flat))
+    if index.flat != flat:
+        # hash collision
+        index = MemberIndex(flat)
+        _indexes.set(key, index)
+    return index
@@ -0,0 +1,68 @@
+'''Runtime settings shared between the cli and the app.
+
+The cli fills these in before the app (and with it the environment data) is
+imported, so anything that changes where the data comes from has to be set
+here first.
+'''
+
+from .explore import AttributeDict
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = '8080'
+DEFAULT_THREADS = 8
+
+settings = AttributeDict(
+    {
+        # path to a catalog file built with catalog.build_catalog(). When set,
+        # nothing from the environment is imported and all data is read from
+        # the catalog instead.
+        'catalog': None,
+        # path to another python interpreter. When set, its environment is
+        # explored through an agent process (see agent.py) instead of ours.
+        'python': None,
+        # directory of the cache shared between worker processes. Set by
+        # run_app when there is more than one worker.
+        'cache_dir': None,
+        # megabytes the explored imports may use before the least recently
+        # used ones are unloaded (see namespace.py). None means no limit.
+        'memory_budget': None,
+        # callbacks taking at least this many seconds are logged with their
+        # trace and stage timings (see metrics.py). None turns it off.
+        'slow_request': None,
+        # serve the sampling profiler at /admin/profile (see profiler.py).
+        # Off by default since anyone who can reach the server could use it.
+        'profiler': False,
+        # serve POST /admin/denylist to clear the calls skipped after timing
+        # out (see watchdog.py). Off by default for the same reason.
+        'denylist_admin': False,
+        # compress responses and add ETags/cache headers (see compress.py)
+        'compression': True,
+        # directory for results worth keeping between runs, like package
+        # statistics. None uses the user cache directory (see cache.py).
+        'env_cache': None,
+        # seconds between looks for distributions installed, upgraded or
+        # removed while serving (see watcher.py). None or 0 turns it off.
+        'watch_interval': 5.0,
+        # expensive jobs (imports, classifying, big heritage) run at once, and
+        # how many may wait before new package opens are turned away (see
+        # admission.py). The cli sizes them from the number of threads.
+        'expensive_jobs': 2,
+        'expensive_queue': 4,
+        # seconds a job may wait for its turn before it's given up on
+        'expensive_wait': 60.0,
+        # seconds a member listing, and reading a signature or docstring, may
+        # take before it's given up on and skipped from then on (see
+        # watchdog.py). None turns the limit off.
+        'members_timeout': 20.0,
+        'inspect_timeout': 5.0,
+    }
+)
+
+
+def configure(**kwargs) -> AttributeDict:
+    '''Update runtime settings. Unknown keys raise a KeyError.'''
+    for k, v in kwargs.items():
+        if k not in settings.keys():
+            raise KeyError(f"'{k}' is not a python-explorer setting.")
+        settings[k] = v
+    return settings
@@ -0,0 +1,129 @@
+'''Request coalescing for expensive work.
+
+When several users open the same package at the same moment, every waitress
+thread would classify its members, build its heritage and run pandoc on the
+same docstrings. A SingleFlight runs one call per key at a time: the first
+thread (the leader) computes, threads asking for the same key meanwhile wait
+for it and get its result (or its exception).
+
+It only coalesces within a process. With several workers, the shared cache
+still saves the second worker the work once the first one is done.
+
+How much was coalesced is counted per operation, the first element of a
+tuple key ('heritage', 'docstring-html', 'members'...), see metrics().
+'''
+
+__all__ = [
+    'SingleFlight',
+    'metrics',
+]
+
+import threading
+import time
+import weakref
+from typing import Any, Callable, Hashable
+
+from .explore import AttributeDict
+
+# every SingleFlight, for metrics()
+_flights = weakref.WeakSet()
+
+
+class SingleFlight:
+    '''Shares one call between the threads asking for the same key.
+
+    Parameters
+    ----------
+    name: str
+        Operation name for keys that aren't tuples.
+    '''
+
+    def __init__(self, name: str = 'other') -> None:
+        self.name = name
+        self._lock = threading.Lock()
+        # key -> AttributeDict(event, result, error, seconds)
+        self._calls = {}
+        # operation -> [leaders, shared, seconds saved]
+        self._counts = {}
+        _flights.add(self)
+
+    def _operation(self, key: Hashable) -> str:
+        if isinstance(key, tuple) and key and isinstance(key[0], str):
+            return key[0]
+        return self.name
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Any:
+        '''Return func(), or the result of the call already running for key.'''
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = AttributeDict(
+                    {'event': threading.Event(), 'result': None, 'error': None, 'seconds': 0.0}
+                )
+
+        if not leader:
+            call.event.wait()
+            with self._lock:
+                counts = self._counts.setdefault(self._operation(key), [0, 0, 0.0])
+                counts[1] += 1
+                counts[2] += call.seconds
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        start = time.perf_counter()
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.seconds = time.perf_counter() - start
+            with self._lock:
+                del self._calls[key]
+                self._counts.setdefault(self._operation(key), [0, 0, 0.0])[0] += 1
+            call.event.set()
+
+    @property
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    def counts(self) -> dict:
+        '''Return {operation: (leaders, shared, seconds saved)}.'''
+        with self._lock:
+            return {op: tuple(c) for op, c in self._counts.items()}
+
+
+def metrics() -> list:
+    '''Return exposition lines for /metrics, summed over every SingleFlight.'''
+    totals = {}
+    inflight = 0
+    for flight in list(_flights):
+        inflight += flight.inflight
+        for op, (leaders, shared, saved) in flight.counts().items():
+            t = totals.setdefault(op, [0, 0, 0.0])
+            t[0] += leaders
+            t[1] += shared
+            t[2] += saved
+
+    lines = [
+        '# HELP python_explorer_coalesced_total Expensive calls by operation, run (leader) or shared with a call already running.',
+        '# TYPE python_explorer_coalesced_total counter',
+    ]
+    for op, (leaders, shared, _) in sorted(totals.items()):
+        lines.append(f'python_explorer_coalesced_total{{operation="{op}",role="leader"}} {leaders}')
+        lines.append(f'python_explorer_coalesced_total{{operation="{op}",role="shared"}} {shared}')
+    lines.extend([
+        '# HELP python_explorer_coalesced_seconds_saved_total Compute time not spent thanks to shared calls.',
+        '# TYPE python_explorer_coalesced_seconds_saved_total counter',
+    ])
+    for op, (_, _, saved) in sorted(totals.items()):
+        lines.append(f'python_explorer_coalesced_seconds_saved_total{{operation="{op}"}} {saved:.6f}')
+    lines.extend([
+        '# HELP python_explorer_coalesced_inflight Expensive calls running right now.',
+        '# TYPE python_explorer_coalesced_inflight gauge',
+        f'python_explorer_coalesced_inflight {inflight}',
+    ])
+    return lines
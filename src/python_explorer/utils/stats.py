@@ -0,0 +1,200 @@
+'''Package overview statistics, computed in the background.
+
+A package is walked once with walk_members (see Explore.walk), modules and
+classes that belong to it only, down to a depth limit. Every node gets
+membercounts-style totals of itself and everything under it. The result is
+small and plain, and is kept in the environment cache (see
+cache.get_env_cache) keyed by package version, so it's only ever computed
+once per version.
+
+The walk runs the package's own attribute code like the member listings of
+a request do. Each listing gets what's left of the walk's time (see
+explore.time_budget) and stops looking at members past it, and modules or
+classes whose listing timed out for a request before (see watchdog.py) are
+left out.
+'''
+
+__all__ = [
+    'compute_stats',
+    'StatsEngine',
+]
+
+import threading
+import time
+from typing import Any, Callable, Union
+
+from .discovery import discover_tree
+from .explore import getmembers_categorized, time_budget, walk_members
+from .jobs import CachedJobs
+from .memo import module_version
+
+# bump when the shape of the results changes
+STATS_VERSION = 2
+
+_CATEGORIES = ('modules', 'classes', 'functions', 'properties', 'others')
+
+
+def _containers(trace: str, kind: str) -> bool:
+    # only modules and classes hold anything to count
+    return kind in ('modules', 'classes')
+
+
+def compute_stats(
+        root: Any,
+        package: str,
+        max_depth: int = 4,
+        max_nodes: int = 20000,
+        max_seconds: float = 60.0,
+        members: Union[Callable, None] = None,
+        workers: int = 1,
+        skip: Union[Callable[[str], bool], None] = None,
+        ) -> dict:
+    '''Walk a package and return its overview statistics.
+
+    Parameters
+    ----------
+    root: module
+        The imported package.
+    package: str
+        Its import name.
+    max_depth: int
+        Levels below the root to walk.
+    max_nodes: int
+        Stop after visiting this many modules and classes.
+    max_seconds: float
+        Stop after this long.
+    members: callable, optional
+        Replacement for getmembers_categorized (e.g. MemberMemo.get).
+    workers: int
+        Threads to walk top level submodules on (see Explore.walk).
+    skip: callable, optional
+        Returns True for traces not to list (e.g. denylisted ones).
+
+    Returns
+    -------
+    stats: dict
+        * 'totals': member counts per category summed over every node
+        * 'visited': distinct modules and classes walked
+        * 'depth': deepest level reached below the root
+        * 'largest': [(name, total members)] of the biggest submodules
+        * 'truncated': True if a limit stopped the walk early
+        * 'seconds': time the walk took
+    '''
+    start = time.perf_counter()
+    deadline = start + max_seconds
+    skip = skip or (lambda trace: False)
+    cut_short = threading.Event()
+
+    def getmembers(obj):
+        # on whichever thread lists it, walk workers included
+        with time_budget(max(0.0, deadline - time.perf_counter())) as state:
+            result = (members or getmembers_categorized)(obj)
+        if state.partial:
+            cut_short.set()
+        return result
+
+    mems = dict.fromkeys(_CATEGORIES, [])
+    if not skip(package):
+        try:
+            mems, _ = getmembers(root)
+        except Exception:
+            pass
+    totals = {k: len(mems[k]) for k in _CATEGORIES}
+    visited = {'modules': 1, 'classes': 0}
+    deepest = 0
+    truncated = skip(package)
+    # trace -> (qualified name, own member count) of walked submodules
+    modules = {}
+    # trace -> own member count of every walked node
+    nodes = {}
+
+    records = iter(()) if truncated else walk_members(
+        root, package,
+        max_depth=max_depth,
+        filter=lambda trace, kind: _containers(trace, kind) and not skip(trace),
+        include_private=True,
+        members=getmembers,
+        workers=workers,
+    )
+    for trace, kind, meta in records:
+        if meta.get('truncated'):
+            truncated = True
+        counts = meta.get('counts')
+        if counts is None:
+            continue
+        visited[kind] += 1
+        deepest = max(deepest, meta.depth)
+        for k in _CATEGORIES:
+            totals[k] += counts[k]
+        nodes[trace] = counts.total
+        if kind == 'modules':
+            modules[trace] = meta.name
+        if sum(visited.values()) >= max_nodes or time.perf_counter() > deadline:
+            truncated = True
+            records.close()
+            break
+    if cut_short.is_set():
+        truncated = True
+
+    # a submodule's size is its own members plus everything walked below it
+    sizes = dict.fromkeys(modules, 0)
+    for trace, n in nodes.items():
+        parts = trace.split('.')
+        for i in range(2, len(parts) + 1):
+            prefix = '.'.join(parts[:i])
+            if prefix in sizes:
+                sizes[prefix] += n
+    largest = sorted(
+        ((modules[t], n) for t, n in sizes.items()),
+        key=lambda s: s[1],
+        reverse=True,
+    )[:5]
+
+    return {
+        'totals': totals,
+        'visited': visited,
+        'depth': deepest,
+        'largest': largest,
+        'truncated': truncated,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+class StatsEngine(CachedJobs):
+    '''Computes package statistics on background threads and keeps them.
+
+    Parameters
+    ----------
+    loader: callable
+        Returns the imported package for an import name.
+    cache: object
+        Cache with get/set to keep results in (see cache.get_env_cache).
+    members: callable, optional
+        Replacement for getmembers_categorized.
+    workers: int
+        Packages walked at the same time.
+    skip: callable, optional
+        Returns True for traces not to list (see compute_stats).
+    '''
+
+    def __init__(self,
+                 loader: Callable[[str], Any],
+                 cache: Any,
+                 members: Union[Callable, None] = None,
+                 workers: int = 1,
+                 skip: Union[Callable[[str], bool], None] = None,
+                 ) -> None:
+        super().__init__(cache, workers, name='stats')
+        self.loader = loader
+        self.members = members
+        self.skip = skip
+
+    def _key(self, package: str) -> tuple:
+        return ('package-stats', STATS_VERSION, package, module_version(package))
+
+    def _compute(self, package: str) -> dict:
+        root = self.loader(package)
+        # one pass over the package directories up front, the walk then
+        # finds every listing cached
+        discover_tree(getattr(root, '__path__', ()))
+        return compute_stats(root, package, members=self.members, skip=self.skip)
@@ -0,0 +1,259 @@
+'''Time limits for introspection calls that may never return.
+
+Listing members, reading signatures and docstrings runs whatever __getattr__,
+__dir__ and property code an object has, and some of it hangs or loops for
+minutes. Each such call runs on a helper thread with a time budget per
+operation:
+
+* member listings get a deadline at three quarters of the budget, past which
+  getmembers_categorized stops looking at members and lists the rest under
+  others (see explore.time_budget). The listing comes back marked partial.
+* when the call doesn't come back within the budget at all, the request
+  stops waiting and goes on without it. Python threads can't be killed, so
+  the call keeps running in the background. When too many of those pile up
+  the recycle event is set and the process is replaced by a fresh one (see
+  app.py).
+
+Calls that timed out are kept in a denylist (the environment cache, per
+distribution version) and skipped on the next visits without trying them
+again, until the entry expires or the denylist is cleared (forget(), or
+POST /admin/denylist with --denylist-admin, see install_denylist).
+
+The helper thread works on behalf of the request: it queues for expensive
+job slots as the request's session, its stages and samples count towards
+the request's callback, and time spent waiting for a slot doesn't count
+against the budget (it's bounded by the scheduler's max_wait). A helper left
+behind while holding a slot gives it back right away, so the requests queued
+behind it don't hang with it.
+'''
+
+__all__ = [
+    'Watchdog',
+    'install_denylist',
+]
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Union
+
+from .admission import current_session, get_scheduler, on_behalf_of
+from .explore import AttributeDict, time_budget
+from .memo import module_version
+from .metrics import attached, current
+
+logger = logging.getLogger('python_explorer')
+
+# share of the budget a member listing may use before it's cut short
+COOPERATIVE_SHARE = 0.75
+
+# seconds a call that timed out is skipped before it's tried again
+DENY_SECONDS = 3600.0
+
+
+def _paused(state: Union[AttributeDict, None]) -> float:
+    '''Internal helper function. Return seconds a time budget's clock was stopped.'''
+    if state is None:
+        return 0.0
+    since = state.paused_since
+    return state.paused + (time.monotonic() - since if since is not None else 0.0)
+
+
+class Watchdog:
+    '''Runs calls on helper threads with a time budget.
+
+    Parameters
+    ----------
+    budgets: dict
+        Seconds per operation ('members', 'signature', 'doc', 'type').
+        Operations without a budget run on the calling thread.
+    denylist: object, optional
+        Cache with get/set to remember calls that timed out in (see
+        cache.get_env_cache). Default is this process only.
+    max_stuck: int
+        Calls still running past their budget before recycle is set.
+    expire: float
+        Seconds a call that timed out is skipped before it's tried again.
+    scheduler: Scheduler, optional
+        Expensive job slots a call left behind gives back. Default is
+        admission.get_scheduler().
+    '''
+
+    def __init__(
+        self,
+        budgets: dict,
+        denylist: Any = None,
+        max_stuck: int = 4,
+        expire: float = DENY_SECONDS,
+        scheduler: Any = None,
+    ) -> None:
+        self.budgets = budgets
+        self.denylist = denylist
+        self.max_stuck = max_stuck
+        self.expire = expire
+        self.scheduler = scheduler
+        self.recycle = threading.Event()
+
+        self.timeouts = 0
+        self.partials = 0
+        self.skipped = 0
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stuck = 0
+        self._denied = {}
+
+    # Denylist-----------------------------------------------------------------
+
+    # entries can't be listed in a cache, so clearing moves every process on
+    # to a new epoch of keys instead
+    _EPOCH = ('watchdog-epoch',)
+
+    def _key(self, op: str, key: str) -> tuple:
+        epoch = self.denylist.get(self._EPOCH, 0) if self.denylist is not None else 0
+        return ('watchdog', epoch, op, key, module_version(key))
+
+    def denied(self, op: str, key: str) -> Union[dict, None]:
+        '''Return why a call is on the denylist, if it is and hasn't expired.'''
+        k = self._key(op, key)
+        if self.denylist is not None:
+            entry = self.denylist.get(k)
+        else:
+            entry = self._denied.get(k)
+        if entry is None or entry.get('until', 0) <= time.time():
+            return None
+        return entry
+
+    def _deny(self, op: str, key: str, seconds: float) -> None:
+        now = time.time()
+        entry = {'op': op, 'key': key, 'seconds': seconds, 'when': now, 'until': now + self.expire}
+        k = self._key(op, key)
+        if self.denylist is not None:
+            self.denylist.set(k, entry)
+        else:
+            self._denied[k] = entry
+
+    def forget(self) -> None:
+        '''Clear the denylist, in every process sharing it.'''
+        if self.denylist is not None:
+            self.denylist.set(self._EPOCH, self.denylist.get(self._EPOCH, 0) + 1)
+        self._denied.clear()
+
+    # Running------------------------------------------------------------------
+
+    def run(self, op: str, key: str, func: Callable[[], Any], default: Any = None) -> tuple:
+        '''Run func within the budget of op.
+
+        Parameters
+        ----------
+        op: str
+            Operation, picks the budget.
+        key: str
+            What it's run on (usually the trace), for the denylist.
+        func: callable
+            The call.
+        default: object
+            Result when it timed out now or before.
+
+        Returns
+        -------
+        (result, partial): tuple
+            partial is True when the result is default or an incomplete
+            member listing.
+        '''
+        budget = self.budgets.get(op)
+        # already on a helper thread, its budget covers this too
+        if budget is None or getattr(self._local, 'inside', False):
+            return func(), False
+
+        if self.denied(op, key) is not None:
+            with self._lock:
+                self.skipped += 1
+            return default, True
+
+        box = {}
+        done = threading.Event()
+        session = current_session()
+        record = current()
+
+        def target():
+            self._local.inside = True
+            box['ident'] = threading.get_ident()
+            try:
+                with on_behalf_of(session), attached(record), \
+                        time_budget(budget * COOPERATIVE_SHARE if op == 'members' else None) as state:
+                    box['state'] = state
+                    box['result'] = func()
+                box['partial'] = state.partial
+            except BaseException as e:
+                box['error'] = e
+            finally:
+                with self._lock:
+                    done.set()
+                    if box.get('abandoned'):
+                        self._stuck -= 1
+                        logger.info('%s of %s finished after its budget', op, key)
+
+        start = time.monotonic()
+        threading.Thread(target=target, name=f'px-watchdog-{op}', daemon=True).start()
+
+        # waiting for an expensive job slot stops the clock
+        while not done.wait(max(0.0, start + budget + _paused(box.get('state')) - time.monotonic())):
+            if time.monotonic() < start + budget + _paused(box.get('state')):
+                continue
+            with self._lock:
+                # finished just now after all
+                if not done.is_set():
+                    box['abandoned'] = True
+                    self._stuck += 1
+                    self.timeouts += 1
+                    stuck = self._stuck
+            if box.get('abandoned'):
+                logger.warning('%s of %s took over %.1fs, skipped for now', op, key, budget)
+                self._deny(op, key, budget)
+                (self.scheduler or get_scheduler()).abandon(box.get('ident'))
+                if stuck >= self.max_stuck:
+                    logger.error('%d introspection calls are stuck, asking for a fresh worker', stuck)
+                    self.recycle.set()
+                return default, True
+            break
+
+        if 'error' in box:
+            raise box['error']
+
+        partial = box.get('partial', False)
+        if partial:
+            with self._lock:
+                self.partials += 1
+        return box['result'], partial
+
+    @property
+    def stuck(self) -> int:
+        return self._stuck
+
+    def metrics(self) -> list:
+        '''Return exposition lines for /metrics.'''
+        return [
+            '# HELP python_explorer_watchdog_total Introspection calls cut short by their time budget.',
+            '# TYPE python_explorer_watchdog_total counter',
+            f'python_explorer_watchdog_total{{result="timeout"}} {self.timeouts}',
+            f'python_explorer_watchdog_total{{result="partial"}} {self.partials}',
+            f'python_explorer_watchdog_total{{result="skipped"}} {self.skipped}',
+            '# HELP python_explorer_watchdog_stuck Introspection calls still running past their budget.',
+            '# TYPE python_explorer_watchdog_stuck gauge',
+            f'python_explorer_watchdog_stuck {self._stuck}',
+        ]
+
+
+def install_denylist(server, watchdog: Watchdog) -> None:
+    '''Add the /admin/denylist route to a Flask server, POST to clear it.
+
+    Opt-in (``python-explorer --denylist-admin``) since anyone who can reach
+    the server could use it.
+    '''
+    from flask import Response
+
+    @server.route('/admin/denylist', methods=['POST'])
+    def _clear_denylist():
+        watchdog.forget()
+        return Response('denylist cleared\n', mimetype='text/plain')
@@ -0,0 +1,186 @@
+'''Notices distributions being installed, upgraded or removed while serving.
+
+Every installed distribution has a .dist-info (or .egg-info) directory next to
+its packages, named after it and its version, and pip replaces that directory
+on every install, upgrade and removal. So watching the environment is
+watching those directories in the sys.path entries:
+
+* one os.stat per sys.path directory each poll. Adding or removing an entry
+  changes the directory's mtime.
+* directories whose mtime changed are listed again, and their dist-info
+  directories compared by name and mtime with the last listing.
+
+There's no thread. poll() is called from requests and returns right away
+until interval seconds have passed since the last poll, so each prefork
+worker watches for itself and nothing polls when nobody is looking. The
+generation pages compare is a digest of the listings, the same in every
+worker that has seen the same environment.
+'''
+
+__all__ = [
+    'EnvironmentWatcher',
+    'distribution_dirs',
+]
+
+import hashlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Union
+
+logger = logging.getLogger('python_explorer')
+
+_SUFFIXES = ('.dist-info', '.egg-info')
+
+
+def distribution_dirs(directory: str) -> dict:
+    '''Return {dist-info directory name: mtime} of a sys.path directory.'''
+    found = {}
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.endswith(_SUFFIXES):
+                    try:
+                        found[entry.name] = entry.stat().st_mtime_ns
+                    except OSError:
+                        pass
+    except OSError:
+        pass
+    return found
+
+
+def _distribution_name(dirname: str) -> str:
+    '''Internal helper function. Return the distribution name of a dist-info directory.'''
+    # name-version.dist-info, name-version-pyX.Y.egg-info or name.egg-info,
+    # names have their dashes escaped to underscores
+    return dirname.rsplit('.', 1)[0].partition('-')[0]
+
+
+class EnvironmentWatcher:
+    '''Polls sys.path directories for changed distributions.
+
+    Parameters
+    ----------
+    interval: float
+        Seconds between polls.
+    paths: list, optional
+        Directories to watch. Default is sys.path at the time of each poll.
+    '''
+
+    def __init__(self, interval: float = 5.0, paths: Union[list, None] = None) -> None:
+        self.interval = interval
+        self.paths = paths
+        # digest of the distributions seen, for pages to notice changes
+        self.generation = ''
+        self.polls = 0
+        self.changes = 0
+
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._last = None
+        # directory -> (mtime, {dist-info name: mtime})
+        self._dirs = {}
+
+    def subscribe(self, func: Callable[[set], None]) -> None:
+        '''Call func with the set of changed distribution names on every change.'''
+        self._listeners.append(func)
+
+    def _directories(self) -> list:
+        paths = self.paths if self.paths is not None else sys.path
+        return [p for p in paths if isinstance(p, str) and p and os.path.isdir(p)]
+
+    def _changed(self) -> set:
+        '''Internal helper method. Return names of distributions that changed.'''
+        names = set()
+        seen = set()
+        for directory in self._directories():
+            seen.add(directory)
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                continue
+            previous = self._dirs.get(directory)
+            if previous is not None and previous[0] == mtime:
+                continue
+            dists = distribution_dirs(directory)
+            self._dirs[directory] = (mtime, dists)
+            if previous is None:
+                # first look, or a directory added to sys.path: nothing to compare with
+                continue
+            old = previous[1]
+            for d in old.keys() ^ dists.keys():
+                names.add(_distribution_name(d))
+            for d in old.keys() & dists.keys():
+                if old[d] != dists[d]:
+                    names.add(_distribution_name(d))
+        # directories gone from sys.path (or disk) take their distributions along
+        for directory in list(self._dirs.keys() - seen):
+            names.update(_distribution_name(d) for d in self._dirs.pop(directory)[1])
+        return names
+
+    def _digest(self) -> str:
+        '''Internal helper method. Return a digest of the distributions seen.'''
+        h = hashlib.sha1()
+        for directory in sorted(self._dirs):
+            for name, mtime in sorted(self._dirs[directory][1].items()):
+                h.update(f'{directory}\x1f{name}\x1f{mtime}\n'.encode('utf-8', 'surrogateescape'))
+        return h.hexdigest()[:16]
+
+    def poll(self, force: bool = False) -> set:
+        '''Look for changes if it's time to, and tell the subscribers.
+
+        The first poll only takes stock.
+
+        Parameters
+        ----------
+        force: bool
+            Poll even if the interval isn't up yet.
+
+        Returns
+        -------
+        names: set
+            Distribution names that changed since the last poll.
+        '''
+        now = time.monotonic()
+        if not force and self._last is not None and now - self._last < self.interval:
+            return set()
+        # whoever polls at the same time gets nothing, one poll is enough
+        if not self._lock.acquire(blocking=False):
+            return set()
+        try:
+            first = self._last is None
+            self._last = now
+            self.polls += 1
+            names = self._changed()
+            if first:
+                self.generation = self._digest()
+            if first or not names:
+                return set()
+
+            logger.info('Environment changed: %s', ', '.join(sorted(names)))
+            for func in self._listeners:
+                try:
+                    func(names)
+                except Exception:
+                    logger.exception('Refreshing after environment change failed')
+            self.changes += len(names)
+            self.generation = self._digest()
+            return names
+        finally:
+            self._lock.release()
+
+    def metrics(self) -> list:
+        '''Return exposition lines for /metrics.'''
+        return [
+            '# HELP python_explorer_env_polls_total Environment polls for changed distributions.',
+            '# TYPE python_explorer_env_polls_total counter',
+            f'python_explorer_env_polls_total {self.polls}',
+            '# HELP python_explorer_env_changes_total Distributions installed, upgraded or removed while serving.',
+            '# TYPE python_explorer_env_changes_total counter',
+            f'python_explorer_env_changes_total {self.changes}',
+            '# HELP python_explorer_env_directories sys.path directories watched.',
+            '# TYPE python_explorer_env_directories gauge',
+            f'python_explorer_env_directories {len(self._dirs)}',
+        ]
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pytest
+
+from python_explorer.utils.admission import Busy, Scheduler, on_behalf_of
+from python_explorer.utils.explore import budget_state, time_budget
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timed out waiting'
+        time.sleep(0.005)
+
+
+def _hold(scheduler, release):
+    '''Start a thread holding a slot until release is set.'''
+    held = threading.Event()
+
+    def run():
+        with scheduler.expensive('import'):
+            held.set()
+            release.wait()
+
+    t = threading.Thread(target=run, daemon=True)
+    t.start()
+    held.wait()
+    return t
+
+
+def test_slots_are_handed_out_round_robin_per_session():
+    scheduler = Scheduler(slots=1, max_waiting=10)
+    release = threading.Event()
+    holder = _hold(scheduler, release)
+
+    order = []
+    threads = []
+    for session, job in [('a', 'a1'), ('a', 'a2'), ('b', 'b1')]:
+        def run(session=session, job=job):
+            with on_behalf_of(session), scheduler.expensive('classify'):
+                order.append(job)
+        t = threading.Thread(target=run, daemon=True)
+        t.start()
+        threads.append(t)
+        waiting = len(threads)
+        _wait_for(lambda: scheduler.waiting == waiting)
+
+    release.set()
+    for t in [holder] + threads:
+        t.join(5)
+
+    # a's second job waits for b's turn
+    assert order == ['a1', 'b1', 'a2']
+    assert scheduler.running == 0
+    assert scheduler.waiting == 0
+    assert scheduler.queued == 3
+
+
+def test_full_queue_rejects_new_work():
+    scheduler = Scheduler(slots=1, max_waiting=1)
+    release = threading.Event()
+    holder = _hold(scheduler, release)
+
+    def wait():
+        with scheduler.expensive('import'):
+            pass
+
+    waiter = threading.Thread(target=wait, daemon=True)
+    waiter.start()
+    _wait_for(lambda: scheduler.waiting == 1)
+
+    with pytest.raises(Busy):
+        with scheduler.expensive('import', reject=True):
+            pass
+    assert scheduler.rejected == 1
+
+    release.set()
+    holder.join(5)
+    waiter.join(5)
+    assert scheduler.running == 0
+
+
+def test_nested_work_does_not_take_another_slot():
+    scheduler = Scheduler(slots=1)
+    with scheduler.expensive('import'):
+        with scheduler.expensive('classify'):
+            assert scheduler.running == 1
+    assert scheduler.running == 0
+
+
+def test_waiting_for_a_slot_stops_the_budget_clock():
+    scheduler = Scheduler(slots=1)
+    release = threading.Event()
+    holder = _hold(scheduler, release)
+    threading.Timer(0.3, release.set).start()
+
+    with time_budget(1.0) as state:
+        deadline = state.deadline
+        with scheduler.expensive('classify'):
+            pass
+        assert budget_state() is state
+
+    holder.join(5)
+    assert state.paused >= 0.25
+    assert state.deadline - deadline == pytest.approx(state.paused)
+
+
+def test_waiting_too_long_gives_up():
+    scheduler = Scheduler(slots=1, max_wait=0.2)
+    release = threading.Event()
+    holder = _hold(scheduler, release)
+
+    with pytest.raises(Busy):
+        with scheduler.expensive('classify'):
+            pass
+    assert scheduler.gave_up == 1
+    assert scheduler.waiting == 0
+
+    release.set()
+    holder.join(5)
+    assert scheduler.running == 0
+
+
+def test_abandoned_holder_hands_its_slot_on():
+    scheduler = Scheduler(slots=1)
+    release = threading.Event()
+    held = threading.Event()
+    idents = []
+
+    def hold():
+        idents.append(threading.get_ident())
+        with scheduler.expensive('classify'):
+            held.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold, daemon=True)
+    holder.start()
+    held.wait()
+
+    assert scheduler.abandon(idents[0])
+    assert not scheduler.abandon(idents[0])
+    with scheduler.expensive('import'):
+        assert scheduler.running == 1
+
+    # finishing late doesn't give the slot back a second time
+    release.set()
+    holder.join(5)
+    assert scheduler.running == 0
+    with scheduler.expensive('import'):
+        assert scheduler.running == 1
+    assert scheduler.running == 0
@@ -0,0 +1,59 @@
+import io
+import sys
+
+import pytest
+
+import python_explorer.utils.agent as agent_module
+from python_explorer.utils.agent import (
+    OP_EXPLORE,
+    OP_INFO,
+    AgentClient,
+    RemoteError,
+    read_frame,
+    write_frame,
+)
+
+
+def test_frames_round_trip():
+    stream = io.BytesIO()
+    write_frame(stream, 7, 2, {'root': 'json', 'status': None})
+    write_frame(stream, 2**32 - 1, 255)
+    write_frame(stream, 8, 0, 'ünïcode')
+    stream.seek(0)
+
+    assert read_frame(stream) == (7, 2, {'root': 'json', 'status': None})
+    assert read_frame(stream) == (2**32 - 1, 255, None)
+    assert read_frame(stream) == (8, 0, 'ünïcode')
+    with pytest.raises(EOFError):
+        read_frame(stream)
+
+
+@pytest.fixture(scope='module')
+def agent():
+    client = AgentClient(sys.executable)
+    yield client
+    client.close()
+
+
+def test_handshake_reports_the_target_version(agent):
+    assert agent.version == sys.version
+
+
+def test_pipelined_requests_come_back_to_their_callers(agent):
+    futures = [
+        agent.submit(OP_EXPLORE, {'root': root, 'status': None, 'action': None, 'arg': None})
+        for root in ('json', 'email', 'collections')
+    ]
+    traces = [f.result(30)['status']['trace'] for f in futures]
+    assert traces == ['json', 'email', 'collections']
+
+
+def test_errors_come_back_as_remote_errors(agent):
+    with pytest.raises(RemoteError):
+        agent.call(OP_INFO, {'root': 'no_such_module_here', 'status': None, 'member': None}, 30)
+
+
+def test_interpreters_older_than_needed_are_refused(monkeypatch):
+    monkeypatch.setattr(agent_module, 'MIN_PYTHON', (99, 0))
+    with pytest.raises(RemoteError, match='needs python 99.0 or newer'):
+        AgentClient(sys.executable)
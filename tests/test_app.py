@@ -0,0 +1,41 @@
+import http.client
+import threading
+import time
+
+from waitress import create_server
+
+from python_explorer.utils.app import _close_when_recycled
+
+
+def _app(environ, start_response):
+    if environ['PATH_INFO'] == '/slow':
+        time.sleep(0.5)
+    start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '2')])
+    return [b'ok']
+
+
+def test_recycling_closes_keep_alive_connections():
+    srv = create_server(_app, host='127.0.0.1', port=0, threads=2)
+    port = srv.effective_port
+    recycle = threading.Event()
+    recycled = _close_when_recycled(srv, [recycle])
+    runner = threading.Thread(target=srv.run, daemon=True)
+    runner.start()
+
+    # a polling page keeps its connection open between requests
+    idle = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    idle.request('GET', '/')
+    assert idle.getresponse().read() == b'ok'
+
+    busy = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    busy.request('GET', '/slow')
+    time.sleep(0.1)
+    recycle.set()
+
+    # the request in flight still gets its answer
+    assert busy.getresponse().read() == b'ok'
+    runner.join(10)
+    assert recycled.is_set()
+    assert not runner.is_alive()
+    idle.close()
+    busy.close()
@@ -0,0 +1,75 @@
+import inspect
+import json
+
+import pytest
+
+from python_explorer.utils.catalog import (
+    Catalog,
+    CatalogExplore,
+    _CatalogWriter,
+    build_catalog,
+)
+from python_explorer.utils.explore import Explore
+
+
+@pytest.fixture(scope='module')
+def catalog(tmp_path_factory):
+    path = tmp_path_factory.mktemp('catalog') / 'json.pxc'
+    count = build_catalog(str(path), packages=['json'], max_depth=2)
+    cat = Catalog(str(path))
+    assert len(cat) == count
+    return cat
+
+
+def test_round_trip_matches_the_live_objects(catalog):
+    std, site, _ = catalog.envdata()
+    assert 'json' in std
+
+    lexp = CatalogExplore(catalog, 'json')
+    live = Explore(json)
+    assert [tuple(m) for m in lexp.flatmembers] == [tuple(m) for m in live.flatmembers]
+    assert lexp.getdoc('dumps') == (True, inspect.getdoc(json.dumps))
+
+    assert lexp.stepin('JSONDecoder')
+    assert lexp.trace == 'json.JSONDecoder'
+    ok, typ = lexp.gettype()
+    assert ok and typ == 'type'
+    lexp.stepout()
+    assert lexp.status == live.status
+
+
+def test_aliases_resolve_to_the_record_walked(catalog):
+    # json.decoder imports json.scanner, it's stored once under its own name
+    assert catalog._read('json.decoder.scanner') == {'alias': 'json.scanner'}
+    assert catalog.lookup('json.decoder.scanner') == catalog.lookup('json.scanner')
+    assert catalog.lookup('json.decoder.scanner.make_scanner') == catalog.lookup('json.scanner.make_scanner')
+    assert catalog.lookup('json.no_such_member') is None
+    assert 'json' in catalog and 'nothing' not in catalog
+
+
+def test_empty_catalog_and_empty_roots(tmp_path):
+    path = tmp_path / 'empty.pxc'
+    writer = _CatalogWriter(str(path))
+    writer.close()
+    cat = Catalog(str(path))
+    assert len(cat) == 0
+    assert cat.lookup('json') is None
+    with pytest.raises(ImportError):
+        CatalogExplore(cat, 'json')
+
+    path = tmp_path / 'roots.pxc'
+    writer = _CatalogWriter(str(path))
+    writer.add('hollow', {'members': {}, 'type': 'module'})
+    writer.close()
+    lexp = CatalogExplore(Catalog(str(path)), 'hollow')
+    assert lexp.flatmembers == []
+    assert lexp.membercounts.total == 0
+    assert lexp.trace == 'hollow'
+    assert lexp._error.kind == 'Exploration Complete'
+
+
+def test_files_of_other_versions_are_refused(tmp_path):
+    path = tmp_path / 'old.pxc'
+    path.write_bytes(b'PXCAT002' + bytes(16))
+    with pytest.raises(ValueError, match='--build-catalog'):
+        Catalog(str(path))
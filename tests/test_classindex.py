@@ -0,0 +1,38 @@
+from python_explorer.utils.cache import LocalCache
+from python_explorer.utils.classindex import ClassIndex, ClassIndexService
+
+
+class Base:
+    pass
+
+
+class Middle(Base):
+    pass
+
+
+class Leaf(Middle):
+    pass
+
+
+def test_queries_walk_the_graph():
+    index = ClassIndex.from_classes([Base, Middle, Leaf])
+    base = f'{__name__}.Base'
+    leaf = f'{__name__}.Leaf'
+    assert index.subclasses(base) == [f'{__name__}.Middle']
+    assert index.descendants(base) == [f'{__name__}.Middle', leaf]
+    assert index.ancestors(leaf) == [f'{__name__}.Middle', base, 'builtins.object']
+
+    again = ClassIndex.from_dict(index.to_dict())
+    assert again.descendants(base) == index.descendants(base)
+
+
+def test_builder_past_its_timeout_counts_as_failed(tmp_path):
+    service = ClassIndexService(LocalCache(), str(tmp_path), retry=600.0, timeout=0.01)
+    service.start()
+    service._thread.join(30)
+
+    assert 'stopped' in service.error
+    assert service.get() is None
+    # not tried again until retry passed
+    service.start()
+    assert not service.building
@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, jsonify
+
+from python_explorer.utils import compress
+from python_explorer.utils.compress import _choose_encoding, install_compression
+
+BIG = {'names': [f'member_{i}' for i in range(500)]}
+
+
+@pytest.fixture
+def client():
+    server = Flask(__name__)
+
+    @server.route('/data', methods=['GET', 'POST'])
+    def data():
+        return jsonify(BIG)
+
+    @server.route('/small')
+    def small():
+        return jsonify(ok=True)
+
+    @server.route('/_dash-component-suites/bundle.js')
+    def bundle():
+        return 'var x = 1;' * 200, 200, {'Content-Type': 'application/javascript'}
+
+    install_compression(server)
+    return server.test_client()
+
+
+def test_encoding_follows_accept_encoding(monkeypatch):
+    monkeypatch.setattr(compress, 'brotli', None)
+    assert _choose_encoding('gzip, deflate, br') == 'gzip'
+    assert _choose_encoding('gzip;q=0, br') == ''
+    assert _choose_encoding('identity') == ''
+
+
+def test_large_responses_are_gzipped(client, monkeypatch):
+    monkeypatch.setattr(compress, 'brotli', None)
+    r = client.get('/data', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in r.headers['Vary']
+    assert json.loads(gzip.decompress(r.data)) == BIG
+
+    r = client.post('/data', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert 'ETag' not in r.headers
+
+    r = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in r.headers
+    r = client.get('/data')
+    assert 'Content-Encoding' not in r.headers
+
+
+def test_matching_etags_get_304(client, monkeypatch):
+    monkeypatch.setattr(compress, 'brotli', None)
+    first = client.get('/data', headers={'Accept-Encoding': 'gzip'})
+    etag = first.headers['ETag']
+    assert etag.endswith('-gzip"')
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/data', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.data == b''
+
+    # the plain body has its own tag
+    plain = client.get('/data', headers={'If-None-Match': etag})
+    assert plain.status_code == 200
+    assert plain.headers['ETag'] != etag
+
+
+def test_fingerprinted_bundles_are_cached_for_good(client):
+    r = client.get('/_dash-component-suites/bundle.js')
+    assert r.headers['Cache-Control'] == compress.IMMUTABLE
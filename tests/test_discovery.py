@@ -0,0 +1,77 @@
+import email
+import json
+import os
+import pkgutil
+import xml
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from python_explorer.utils import discovery
+from python_explorer.utils.discovery import discover_tree, forget_listings, submodule_names
+
+
+def _pkgutil(path):
+    return {m.name for m in pkgutil.iter_modules(path)}
+
+
+@pytest.fixture
+def package(tmp_path):
+    root = tmp_path / 'pkg'
+    root.mkdir()
+    for name in ('__init__.py', 'plain.py', 'compiled.pyc', 'ext.cpython-311-x86_64-linux-gnu.so',
+                 'dotted.name.py', 'notes.txt'):
+        (root / name).write_text('')
+    (root / 'sub').mkdir()
+    (root / 'sub' / '__init__.py').write_text('')
+    (root / 'sub' / 'deep.py').write_text('')
+    # no __init__, not a subpackage as far as pkgutil is concerned
+    (root / 'data').mkdir()
+    (root / 'data' / 'thing.py').write_text('')
+    (root / 'dotted.dir').mkdir()
+    (root / 'dotted.dir' / '__init__.py').write_text('')
+    yield str(root)
+    forget_listings(str(tmp_path))
+
+
+def test_directories_match_pkgutil(package):
+    assert submodule_names([package]) == _pkgutil([package])
+    assert submodule_names([package]) >= {'plain', 'compiled', 'ext', 'sub'}
+
+
+def test_stdlib_packages_match_pkgutil():
+    for mod in (email, json, xml):
+        assert submodule_names(mod.__path__) == _pkgutil(mod.__path__)
+
+
+def test_zip_archives_match_pkgutil(tmp_path):
+    archive = tmp_path / 'bundle.zip'
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.writestr('zpkg/__init__.py', '')
+        zf.writestr('zpkg/one.py', '')
+        zf.writestr('zpkg/inner/__init__.py', '')
+        zf.writestr('zpkg/inner/two.py', '')
+        zf.writestr('zpkg/loose/three.py', '')
+    entry = os.path.join(str(archive), 'zpkg')
+    assert submodule_names([entry]) == _pkgutil([entry]) == {'one', 'inner'}
+
+
+def test_listings_are_kept_until_the_directory_changes(package):
+    submodule_names([package])
+    hits = discovery.hits
+    submodule_names([package])
+    assert discovery.hits > hits
+
+    Path(package, 'added.py').write_text('')
+    os.utime(package, ns=(0, os.stat(package).st_mtime_ns + 10**9))
+    assert 'added' in submodule_names([package])
+
+
+def test_discover_tree_reads_package_directories(package):
+    forget_listings(package)
+    # pkg, sub and data, not the dotted directory
+    assert discover_tree([package]) == 3
+    scans = discovery.scans
+    assert submodule_names([package]) == _pkgutil([package])
+    assert discovery.scans == scans
@@ -0,0 +1,42 @@
+import sys
+from importlib.metadata import version
+
+from python_explorer.utils.importcost import _MARKER, measure_import, parse_importtime
+
+
+STDERR = f'''import time: self [us] | cumulative | imported package
+import time:        50 |         50 | before_marker
+{_MARKER}
+import time: self [us] | cumulative | imported package
+import time:        10 |         10 |     pkg.c
+import time:        20 |         30 |   pkg.b
+import time:         5 |          5 |   pkg.d
+import time:       100 |        135 | pkg
+import time:         7 |          7 | other
+some warning printed by a package
+'''
+
+
+def test_tree_is_rebuilt_from_the_marker_on():
+    roots = parse_importtime(STDERR)
+
+    assert [r[0] for r in roots] == ['pkg', 'other']
+    pkg = roots[0]
+    assert pkg[1:3] == [100, 135]
+    assert [c[0] for c in pkg[3]] == ['pkg.b', 'pkg.d']
+    assert pkg[3][0][3] == [['pkg.c', 10, 10, []]]
+
+
+def test_without_marker_everything_counts():
+    roots = parse_importtime('import time:        50 |         50 | before_marker\n')
+    assert roots == [['before_marker', 50, 50, []]]
+
+
+def test_versions_come_from_the_measured_interpreter():
+    cost = measure_import('click')
+    assert cost['version'] == version('click')
+    assert cost['python'] == sys.version.split()[0]
+    assert cost['modules'] >= 1
+    assert cost['total_us'] > 0
+
+    assert measure_import('json')['version'] == sys.version.split()[0]
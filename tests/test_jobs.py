@@ -0,0 +1,70 @@
+import threading
+
+import pytest
+
+from python_explorer.utils.cache import LocalCache
+from python_explorer.utils.jobs import CachedJobs
+
+
+class Squares(CachedJobs):
+
+    def __init__(self, **kwargs):
+        super().__init__(LocalCache(), **kwargs)
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def _key(self, item):
+        return ('square', item)
+
+    def _compute(self, item):
+        self.calls.append(item)
+        self.gate.wait(5)
+        if item < 0:
+            raise ValueError('negative')
+        return item * item
+
+
+def _settle(jobs):
+    jobs._pool.submit(lambda: None).result(5)
+
+
+def test_subclasses_must_define_key_and_compute():
+    with pytest.raises(TypeError):
+        CachedJobs(LocalCache())
+
+    class KeyOnly(CachedJobs):
+        def _key(self, item):
+            return item
+
+    with pytest.raises(TypeError):
+        KeyOnly(LocalCache())
+
+
+def test_results_are_computed_once_and_kept():
+    jobs = Squares()
+    jobs.gate.clear()
+    assert jobs.request(3) is None
+    # asked again while it's running
+    assert jobs.request(3) is None
+    jobs.gate.set()
+    _settle(jobs)
+
+    assert jobs.request(3) == 9
+    assert jobs.calls == [3]
+
+
+def test_failures_are_left_alone_until_retry_passed():
+    jobs = Squares(retry=600.0)
+    jobs.request(-1)
+    _settle(jobs)
+    assert jobs.error(-1) == 'ValueError: negative'
+    jobs.request(-1)
+    _settle(jobs)
+    assert jobs.calls == [-1]
+
+    jobs.retry = 0.0
+    assert jobs.error(-1) is None
+    jobs.request(-1)
+    _settle(jobs)
+    assert jobs.calls == [-1, -1]
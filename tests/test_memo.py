@@ -0,0 +1,85 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+from python_explorer.utils import memo as memo_module
+from python_explorer.utils.cache import LocalCache
+from python_explorer.utils.explore import time_budget
+from python_explorer.utils.memo import MemberMemo, module_version
+
+
+@pytest.fixture
+def module(tmp_path, monkeypatch):
+    '''A freshly imported module, at version 1.0.'''
+    path = tmp_path / 'memo_target.py'
+    path.write_text('def first():\n    pass\n\nclass Thing:\n    value = 1\n')
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setitem(memo_module._versions, 'memo_target', '1.0')
+    mod = importlib.import_module('memo_target')
+    yield mod
+    sys.modules.pop('memo_target', None)
+
+
+def test_listings_are_kept(module):
+    memo = MemberMemo()
+    members, _ = memo.get(module)
+    assert members['functions'] == ['first']
+    assert memo.get(module)[0] is members
+    assert (memo.hits, memo.misses) == (1, 1)
+
+    memo.get(module.Thing)
+    memo.get(module.Thing)
+    assert memo.hits == 2
+
+
+def test_new_module_version_invalidates(module):
+    memo = MemberMemo()
+    memo.get(module)
+    memo_module._versions['memo_target'] = '2.0'
+    assert module_version('memo_target') == '2.0'
+
+    memo.get(module)
+    assert memo.invalidations == 1
+    assert memo.misses == 2
+
+
+def test_changed_source_file_invalidates(module):
+    memo = MemberMemo()
+    memo.get(module)
+    st = os.stat(module.__file__)
+    os.utime(module.__file__, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    memo.get(module)
+    assert memo.invalidations == 1
+
+
+def test_invalidate_by_prefix(module):
+    memo = MemberMemo()
+    memo.get(module)
+    memo.get(module.Thing)
+    memo.get(os)
+    assert memo.invalidate('memo_target') == 2
+    memo.get(os)
+    assert memo.hits == 1
+
+
+def test_shared_between_memos(module):
+    shared = LocalCache()
+    MemberMemo(shared=shared).get(module)
+    other = MemberMemo(shared=shared)
+    members, _ = other.get(module)
+    assert other.shared_hits == 1
+    assert members['classes'] == ['Thing']
+
+
+def test_partial_listings_are_not_kept(module):
+    memo = MemberMemo()
+    with time_budget(0.0) as state:
+        memo.get(module)
+    assert state.partial
+    assert memo.partials == 1
+
+    memo.get(module)
+    assert memo.hits == 0
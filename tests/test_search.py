@@ -0,0 +1,54 @@
+from python_explorer.utils.search import MemberIndex, get_member_index
+
+
+FLAT = [
+    ('functions', 'load'),
+    ('functions', 'loads'),
+    ('classes', 'JSONDecoder'),
+    ('others', 'decoder'),
+    ('functions', '_private_load'),
+]
+
+
+def test_same_names_with_other_kinds_get_their_own_index():
+    first = get_member_index([('functions', 'load'), ('classes', 'Thing')])
+    second = get_member_index([['others', 'load'], ['functions', 'Thing']])
+
+    assert second.flat == [('others', 'load'), ('functions', 'Thing')]
+    assert first.flat == [('functions', 'load'), ('classes', 'Thing')]
+
+
+def test_same_listing_reuses_the_index():
+    assert get_member_index(FLAT) is get_member_index([list(m) for m in FLAT])
+
+
+def test_prefix_and_contains_keep_listing_order():
+    index = MemberIndex(FLAT)
+    assert index.search('LOAD', 'startswith') == [('functions', 'load'), ('functions', 'loads')]
+    assert index.search('decoder', 'contains') == [('classes', 'JSONDecoder'), ('others', 'decoder')]
+    assert index.search('load', 'contains', privates=False) == [('functions', 'load'), ('functions', 'loads')]
+
+
+def test_fuzzy_ranks_exact_prefix_boundary_contains_subsequence():
+    index = MemberIndex([
+        ('others', 'xdecoderx'),
+        ('others', 'd_e_c'),
+        ('others', 'json_decoder'),
+        ('others', 'decoders'),
+        ('others', 'decoder'),
+    ])
+    assert [name for _, name in index.search('decoder', 'fuzzy')] == [
+        'decoder', 'decoders', 'json_decoder', 'xdecoderx',
+    ]
+    assert [name for _, name in index.search('dec', 'fuzzy')][-1] == 'd_e_c'
+
+
+def test_keyed_lookups_skip_the_listing():
+    index = get_member_index(FLAT, ['json', '3.11', False, len(FLAT)])
+    # the key alone finds it, the listing isn't looked at again
+    assert get_member_index(None, ('json', '3.11', False, len(FLAT))) is index
+    assert index.flat == FLAT
+
+    other = get_member_index(FLAT[:2], ['json', '3.12', False, 2])
+    assert other is not index
+    assert other.flat == FLAT[:2]
@@ -0,0 +1,55 @@
+import inspect
+
+from python_explorer.utils.explore import _get_signature, _sig_format
+
+
+def _code(sig: str) -> str:
+    prefix, suffix = '<pre class="signature"><code>', '</code></pre>'
+    assert sig.startswith(prefix) and sig.endswith(suffix)
+    return sig[len(prefix):-len(suffix)]
+
+
+def test_one_parameter_per_line_with_markers():
+    def f(a, b=1, /, c=2, *, d, e: 'list[int]' = None, **kw) -> dict:
+        pass
+
+    assert _code(_sig_format(inspect.signature(f))) == (
+        '(\n'
+        '    a,\n'
+        '    b=1,\n'
+        '    /,\n'
+        '    c=2,\n'
+        '    *,\n'
+        '    d,\n'
+        "    e: 'list[int]' = None,\n"
+        '    **kw\n'
+        ') -&gt; dict'
+    )
+
+
+def test_no_star_after_var_positional():
+    def f(*args, key=None):
+        pass
+
+    assert _code(_sig_format(inspect.signature(f))) == '(\n    *args,\n    key=None\n)'
+
+
+def test_self_is_left_out_and_html_escaped():
+    class Thing:
+        def method(self, x: 'a<b' = '<&>') -> 'A & B':
+            pass
+
+    code = _code(_sig_format(inspect.signature(Thing.method)))
+    assert 'self' not in code
+    assert "x: 'a&lt;b' = '&lt;&amp;&gt;'" in code
+    assert code.endswith("-&gt; 'A &amp; B'")
+
+
+def test_empty_and_missing_signatures():
+    def f():
+        pass
+
+    assert _code(_get_signature(f)) == '()'
+    # kept per object
+    assert _get_signature(f) is _get_signature(f)
+    assert _get_signature(42) is None
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from python_explorer.utils.singleflight import SingleFlight
+
+
+def _concurrent(flight, key, func, n):
+    '''Call flight.do from n threads at once, return their results or errors.'''
+    results = [None] * n
+    start = threading.Barrier(n)
+
+    def run(i):
+        start.wait()
+        try:
+            results[i] = flight.do(key, func)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return results
+
+
+def test_concurrent_calls_share_one_result():
+    flight = SingleFlight()
+    calls = []
+
+    def func():
+        calls.append(1)
+        time.sleep(0.2)
+        return object()
+
+    results = _concurrent(flight, ('members', 'json'), func, 4)
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    leaders, shared, saved = flight.counts()['members']
+    assert (leaders, shared) == (1, 3)
+    assert saved > 0
+    assert flight.inflight == 0
+
+
+def test_exceptions_are_shared_too():
+    flight = SingleFlight()
+    calls = []
+
+    def func():
+        calls.append(1)
+        time.sleep(0.2)
+        raise ValueError('broken')
+
+    results = _concurrent(flight, 'key', func, 3)
+
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert all(r is results[0] for r in results)
+    assert flight.inflight == 0
+
+
+def test_finished_calls_run_again():
+    flight = SingleFlight()
+    assert flight.do('key', lambda: 1) == 1
+    assert flight.do('key', lambda: 2) == 2
+    with pytest.raises(KeyError):
+        flight.do('key', lambda: {}['missing'])
+    assert flight.do('key', lambda: 3) == 3
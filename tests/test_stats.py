@@ -0,0 +1,35 @@
+import json
+
+from python_explorer.utils.explore import budget_state, getmembers_categorized
+from python_explorer.utils.stats import compute_stats
+
+
+def test_walks_the_package():
+    stats = compute_stats(json, 'json')
+    assert not stats['truncated']
+    assert stats['visited']['modules'] > 1
+    assert 'json.decoder' in dict(stats['largest'])
+
+
+def test_denied_traces_are_left_out():
+    stats = compute_stats(json, 'json', skip=lambda trace: trace == 'json.decoder')
+    assert 'json.decoder' not in dict(stats['largest'])
+
+    stats = compute_stats(json, 'json', skip=lambda trace: trace == 'json')
+    assert stats['truncated']
+    assert stats['visited'] == {'modules': 1, 'classes': 0}
+
+
+def test_listings_run_under_the_time_left():
+    budgets = []
+
+    def members(obj):
+        budgets.append(budget_state().deadline)
+        return getmembers_categorized(obj)
+
+    compute_stats(json, 'json', members=members, max_seconds=30.0)
+    assert budgets and all(d is not None for d in budgets)
+    assert budget_state() is None
+
+    stats = compute_stats(json, 'json', max_seconds=0.0)
+    assert stats['truncated']
@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+from python_explorer.utils.admission import Scheduler, current_session, on_behalf_of
+from python_explorer.utils.cache import LocalCache
+from python_explorer.utils.watchdog import Watchdog
+
+
+@pytest.fixture
+def hang():
+    '''A call that hangs until the test is done.'''
+    release = threading.Event()
+    calls = []
+
+    def func():
+        calls.append(1)
+        release.wait()
+        return 'late'
+
+    func.calls = calls
+    yield func
+    release.set()
+
+
+def test_timeout_returns_default_and_denies(hang):
+    wd = Watchdog({'doc': 0.2}, max_stuck=10)
+
+    start = time.monotonic()
+    assert wd.run('doc', 'pkg.thing', hang, default='none') == ('none', True)
+    assert time.monotonic() - start < 2
+    assert wd.timeouts == 1
+    assert wd.stuck == 1
+    assert wd.denied('doc', 'pkg.thing') is not None
+
+    # skipped right away from now on
+    assert wd.run('doc', 'pkg.thing', hang, default='none') == ('none', True)
+    assert len(hang.calls) == 1
+    assert wd.skipped == 1
+
+
+def test_too_many_stuck_calls_ask_for_recycling(hang):
+    wd = Watchdog({'doc': 0.1}, max_stuck=2)
+    wd.run('doc', 'a', hang)
+    assert not wd.recycle.is_set()
+    wd.run('doc', 'b', hang)
+    assert wd.recycle.is_set()
+
+
+def test_denylist_entries_expire(hang):
+    wd = Watchdog({'doc': 0.1}, expire=0.0)
+    wd.run('doc', 'pkg.thing', hang)
+    assert wd.denied('doc', 'pkg.thing') is None
+
+
+def test_forget_clears_a_shared_denylist(hang):
+    cache = LocalCache()
+    wd = Watchdog({'doc': 0.1}, denylist=cache)
+    wd.run('doc', 'pkg.thing', hang)
+    other = Watchdog({'doc': 0.1}, denylist=cache)
+    assert other.denied('doc', 'pkg.thing') is not None
+
+    wd.forget()
+    assert other.denied('doc', 'pkg.thing') is None
+
+
+def test_results_and_errors_come_back():
+    wd = Watchdog({'doc': 1.0})
+    assert wd.run('doc', 'x', lambda: 42) == (42, False)
+    with pytest.raises(ZeroDivisionError):
+        wd.run('doc', 'x', lambda: 1 / 0)
+    # no budget, runs right here
+    assert wd.run('members', 'x', threading.get_ident) == (threading.get_ident(), False)
+
+
+def test_helper_works_on_behalf_of_the_request():
+    wd = Watchdog({'doc': 1.0})
+    with on_behalf_of('alice'):
+        assert wd.run('doc', 'x', current_session) == ('alice', False)
+
+
+def test_waiting_for_a_slot_does_not_count():
+    scheduler = Scheduler(slots=1)
+    release = threading.Event()
+    held = threading.Event()
+
+    def hold():
+        with scheduler.expensive('import'):
+            held.set()
+            release.wait()
+
+    threading.Thread(target=hold, daemon=True).start()
+    held.wait()
+    threading.Timer(0.5, release.set).start()
+
+    def classify():
+        with scheduler.expensive('classify'):
+            return 'done'
+
+    wd = Watchdog({'doc': 0.2})
+    assert wd.run('doc', 'pkg', classify) == ('done', False)
+    assert wd.denied('doc', 'pkg') is None
+
+
+def test_call_left_behind_gives_its_slot_back():
+    scheduler = Scheduler(slots=1, max_wait=5.0)
+    release = threading.Event()
+
+    def classify():
+        with scheduler.expensive('classify'):
+            release.wait()
+
+    wd = Watchdog({'doc': 0.2}, scheduler=scheduler)
+    try:
+        assert wd.run('doc', 'pkg', classify, default='none') == ('none', True)
+        assert scheduler.abandoned == 1
+
+        start = time.monotonic()
+        with scheduler.expensive('import'):
+            pass
+        assert time.monotonic() - start < 1
+    finally:
+        release.set()
@@ -0,0 +1,93 @@
+import os
+import shutil
+
+import pytest
+
+from python_explorer.utils.watcher import EnvironmentWatcher
+
+
+def _touch(path):
+    '''Move a directory's mtime on, filesystems can be too coarse to notice.'''
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / 'alpha-1.0.dist-info').mkdir()
+    (tmp_path / 'beta_pkg-2.0.dist-info').mkdir()
+    (tmp_path / 'alpha').mkdir()
+    return tmp_path
+
+
+def test_first_poll_takes_stock(site):
+    watcher = EnvironmentWatcher(interval=0, paths=[str(site)])
+    assert watcher.poll() == set()
+    assert watcher.generation
+    assert watcher.poll() == set()
+
+
+def test_install_upgrade_and_removal_are_noticed(site):
+    watcher = EnvironmentWatcher(interval=0, paths=[str(site)])
+    seen = []
+    watcher.subscribe(seen.append)
+    watcher.poll()
+    generation = watcher.generation
+
+    (site / 'gamma-0.1.dist-info').mkdir()
+    _touch(site)
+    assert watcher.poll() == {'gamma'}
+
+    # pip replaces the directory on upgrade
+    shutil.rmtree(site / 'alpha-1.0.dist-info')
+    (site / 'alpha-1.1.dist-info').mkdir()
+    _touch(site)
+    assert watcher.poll() == {'alpha'}
+
+    shutil.rmtree(site / 'beta_pkg-2.0.dist-info')
+    _touch(site)
+    assert watcher.poll() == {'beta_pkg'}
+
+    assert seen == [{'gamma'}, {'alpha'}, {'beta_pkg'}]
+    assert watcher.changes == 3
+    assert watcher.generation != generation
+
+
+def test_other_files_do_not_count(site):
+    watcher = EnvironmentWatcher(interval=0, paths=[str(site)])
+    watcher.poll()
+    generation = watcher.generation
+
+    (site / 'alpha' / 'new_module.py').write_text('')
+    (site / 'notes.txt').write_text('')
+    _touch(site)
+    assert watcher.poll() == set()
+    assert watcher.generation == generation
+
+
+def test_same_environment_same_generation(site):
+    first = EnvironmentWatcher(paths=[str(site)])
+    second = EnvironmentWatcher(paths=[str(site)])
+    first.poll()
+    second.poll()
+    assert first.generation == second.generation
+
+
+def test_removed_path_entries_take_their_distributions(site, tmp_path_factory):
+    other = tmp_path_factory.mktemp('other')
+    (other / 'delta-1.0.dist-info').mkdir()
+    paths = [str(site), str(other)]
+    watcher = EnvironmentWatcher(interval=0, paths=paths)
+    watcher.poll()
+
+    paths.remove(str(other))
+    assert watcher.poll() == {'delta'}
+
+
+def test_polls_wait_for_the_interval(site):
+    watcher = EnvironmentWatcher(interval=3600, paths=[str(site)])
+    watcher.poll()
+    (site / 'gamma-0.1.dist-info').mkdir()
+    _touch(site)
+    assert watcher.poll() == set()
+    assert watcher.poll(force=True) == {'gamma'}